@@ -1,4 +1,6 @@
 from app.database.db import Base, engine, SessionLocal
+from app.database.search import create_search_index
+from app.database.stats import create_stats_table
 from app.models.models import User
 from passlib.context import CryptContext
 
@@ -12,6 +14,12 @@ def init_db():
     # Create tables
     Base.metadata.create_all(bind=engine)
     
+    # Create the full-text search index over borrowers, vehicles and applications
+    create_search_index(engine)
+    
+    # Create the trigger-maintained aggregates behind the dashboard statistics
+    create_stats_table(engine)
+    
     # Create admin user if it doesn't exist
     db = SessionLocal()
     admin_user = db.query(User).filter(User.email == "admin@example.com").first()
@@ -0,0 +1,53 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+# Largest page a list endpoint returns
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    Encode the (created_at, id) position of a row into an opaque cursor
+    """
+    payload = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """
+    Decode a cursor produced by encode_cursor; an empty cursor means the first page
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def keyset_page(statement, created_at_column, id_column, cursor: str, limit: int):
+    """
+    Restrict a select to the keyset page after cursor, ordered by (created_at, id).
+    One extra row is fetched so split_page can tell whether another page exists.
+    """
+    position = decode_cursor(cursor)
+    if position is not None:
+        statement = statement.where(tuple_(created_at_column, id_column) > tuple_(*position))
+    return statement.order_by(created_at_column, id_column).limit(limit + 1)
+
+def split_page(rows: List[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Trim the rows fetched for a keyset_page and return them with the cursor for the next page
+    """
+    if len(rows) <= limit:
+        return list(rows), None
+
+    rows = rows[:limit]
+    if not rows:
+        return rows, None
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
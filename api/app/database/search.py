@@ -0,0 +1,155 @@
+import re
+
+from sqlalchemy import Float, Integer, inspect, text
+
+# One search document per loan application, keyed by the loan id
+SEARCH_TABLE = "loan_search"
+
+# Columns that feed the search document; triggers only fire when these change
+_SOURCE_COLUMNS = {
+    "loan_applications": ("id", ["application_number"]),
+    "borrowers": ("loan_id", ["loan_id", "full_name", "email"]),
+    "vehicle_details": ("loan_id", ["loan_id", "vin"]),
+}
+
+_SQLITE_DOCUMENT = """
+SELECT l.id,
+       l.application_number,
+       (SELECT group_concat(b.full_name, ' ') FROM borrowers b WHERE b.loan_id = l.id),
+       (SELECT group_concat(b.email, ' ') FROM borrowers b WHERE b.loan_id = l.id),
+       (SELECT group_concat(v.vin, ' ') FROM vehicle_details v WHERE v.loan_id = l.id)
+FROM loan_applications l
+"""
+
+_POSTGRES_DOCUMENT = """
+SELECT l.id,
+       concat_ws(' ', l.application_number,
+           (SELECT string_agg(concat_ws(' ', b.full_name, b.email), ' ') FROM borrowers b WHERE b.loan_id = l.id),
+           (SELECT string_agg(v.vin, ' ') FROM vehicle_details v WHERE v.loan_id = l.id))
+FROM loan_applications l
+"""
+
+def _sqlite_refresh(ref: str) -> str:
+    return (
+        f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {ref}; "
+        f"INSERT INTO {SEARCH_TABLE}(rowid, application_number, borrower_names, borrower_emails, vins) "
+        f"{_SQLITE_DOCUMENT} WHERE l.id = {ref};"
+    )
+
+def _create_sqlite_index(conn):
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        "application_number, borrower_names, borrower_emails, vins, "
+        "tokenize = 'unicode61', prefix = '2 3')"
+    ))
+
+    for table, (key, columns) in _SOURCE_COLUMNS.items():
+        conn.execute(text(
+            f"CREATE TRIGGER {SEARCH_TABLE}_{table}_ai AFTER INSERT ON {table} "
+            f"BEGIN {_sqlite_refresh(f'NEW.{key}')} END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER {SEARCH_TABLE}_{table}_au AFTER UPDATE OF {', '.join(columns)} ON {table} "
+            f"BEGIN {_sqlite_refresh(f'OLD.{key}')} {_sqlite_refresh(f'NEW.{key}')} END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER {SEARCH_TABLE}_{table}_ad AFTER DELETE ON {table} "
+            f"BEGIN {_sqlite_refresh(f'OLD.{key}')} END"
+        ))
+
+    # Backfill loans that existed before the index
+    conn.execute(text(
+        f"INSERT INTO {SEARCH_TABLE}(rowid, application_number, borrower_names, borrower_emails, vins) "
+        f"{_SQLITE_DOCUMENT}"
+    ))
+
+def _create_postgres_index(conn):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conn.execute(text(
+        f"CREATE TABLE {SEARCH_TABLE} ("
+        "loan_id INTEGER PRIMARY KEY REFERENCES loan_applications(id) ON DELETE CASCADE, "
+        "search_text TEXT NOT NULL, "
+        "document TSVECTOR NOT NULL)"
+    ))
+    conn.execute(text(f"CREATE INDEX ix_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)"))
+    conn.execute(text(
+        f"CREATE INDEX ix_{SEARCH_TABLE}_search_text ON {SEARCH_TABLE} USING GIN (search_text gin_trgm_ops)"
+    ))
+    conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION refresh_{SEARCH_TABLE}(target_loan_id INTEGER) RETURNS void AS $$
+        BEGIN
+            DELETE FROM {SEARCH_TABLE} WHERE loan_id = target_loan_id;
+            INSERT INTO {SEARCH_TABLE}(loan_id, search_text, document)
+            SELECT doc.id, doc.search_text, to_tsvector('simple', doc.search_text)
+            FROM ({_POSTGRES_DOCUMENT} WHERE l.id = target_loan_id) AS doc(id, search_text);
+        END;
+        $$ LANGUAGE plpgsql
+    """))
+
+    for table, (key, columns) in _SOURCE_COLUMNS.items():
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {SEARCH_TABLE}_{table}_sync() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    PERFORM refresh_{SEARCH_TABLE}(OLD.{key});
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    PERFORM refresh_{SEARCH_TABLE}(NEW.{key});
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text(
+            f"CREATE TRIGGER {SEARCH_TABLE}_{table}_sync "
+            f"AFTER INSERT OR DELETE OR UPDATE OF {', '.join(columns)} ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {SEARCH_TABLE}_{table}_sync()"
+        ))
+
+    conn.execute(text(
+        f"INSERT INTO {SEARCH_TABLE}(loan_id, search_text, document) "
+        f"SELECT doc.id, doc.search_text, to_tsvector('simple', doc.search_text) "
+        f"FROM ({_POSTGRES_DOCUMENT}) AS doc(id, search_text)"
+    ))
+
+def create_search_index(engine):
+    """
+    Create the loan search index and its sync triggers if they don't exist yet
+    """
+    if inspect(engine).has_table(SEARCH_TABLE):
+        return
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            _create_postgres_index(conn)
+        else:
+            _create_sqlite_index(conn)
+
+def _search_terms(search: str):
+    return [term.lower() for term in re.findall(r"\w+", search)]
+
+def search_matches(dialect_name: str, search: str):
+    """
+    Build a subquery of (loan_id, rank) for loans matching every search term as a prefix.
+    Lower rank means a better match. Returns None if the search has no usable terms.
+    """
+    terms = _search_terms(search)
+    if not terms:
+        return None
+
+    if dialect_name == "postgresql":
+        statement = text(f"""
+            SELECT loan_id, -(ts_rank(document, query) + similarity(search_text, :raw)) AS rank
+            FROM {SEARCH_TABLE}, to_tsquery('simple', :query) AS query
+            WHERE document @@ query OR search_text ILIKE :pattern
+        """).bindparams(
+            query=" & ".join(f"{term}:*" for term in terms),
+            raw=search,
+            pattern=f"%{search}%",
+        )
+    else:
+        statement = text(
+            f"SELECT rowid AS loan_id, rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :query"
+        ).bindparams(query=" ".join(f'"{term}"*' for term in terms))
+
+    return statement.columns(loan_id=Integer, rank=Float).subquery("search_matches")
@@ -0,0 +1,152 @@
+from sqlalchemy import inspect, text
+
+# Running totals for the dashboard, one row per (metric, bucket), kept current by
+# triggers so every writer updates them in its own transaction
+STATS_TABLE = "portfolio_stats"
+
+LOAN_STATUS = "loan_status"
+DOCUMENT_STATUS = "document_status"
+LOAN_MONTH = "loan_month"
+
+# metric -> (source table, bucket expression, amount expression)
+# {row} is replaced with NEW, OLD or the table name; {month} and {cast} with dialect SQL
+_METRICS = {
+    LOAN_STATUS: ("loan_applications", "{row}.status{cast}", "coalesce({row}.loan_amount, 0)"),
+    LOAN_MONTH: ("loan_applications", "{month}", "coalesce({row}.loan_amount, 0)"),
+    DOCUMENT_STATUS: ("documents", "{row}.status{cast}", "0"),
+}
+
+_WATCHED_COLUMNS = {
+    "loan_applications": ["status", "loan_amount", "created_at"],
+    "documents": ["status"],
+}
+
+_MONTH = {
+    "sqlite": "strftime('%Y-%m', {row}.created_at)",
+    "postgresql": "to_char({row}.created_at, 'YYYY-MM')",
+}
+
+def _expressions(dialect_name: str, metric: str, row: str):
+    _, bucket, amount = _METRICS[metric]
+    # Postgres stores the status enums as native types
+    cast = "::text" if dialect_name == "postgresql" else ""
+    month = _MONTH[dialect_name].format(row=row)
+    return bucket.format(row=row, month=month, cast=cast), amount.format(row=row)
+
+def _backfill_sql(dialect_name: str) -> str:
+    """
+    Recompute every metric from scratch with GROUP BY queries
+    """
+    selects = []
+    for metric, (table, _, _) in _METRICS.items():
+        bucket, amount = _expressions(dialect_name, metric, table)
+        selects.append(
+            f"SELECT '{metric}', {bucket}, count(*), sum({amount}) FROM {table} "
+            f"WHERE {bucket} IS NOT NULL GROUP BY {bucket}"
+        )
+    return (
+        f"INSERT INTO {STATS_TABLE}(metric, bucket, count, amount) "
+        + " UNION ALL ".join(selects)
+    )
+
+def _create_table(conn):
+    conn.execute(text(
+        f"CREATE TABLE {STATS_TABLE} ("
+        "metric VARCHAR NOT NULL, "
+        "bucket VARCHAR NOT NULL, "
+        "count INTEGER NOT NULL DEFAULT 0, "
+        "amount FLOAT NOT NULL DEFAULT 0, "
+        "PRIMARY KEY (metric, bucket))"
+    ))
+
+def _sqlite_bump(metric: str, row: str, sign: str) -> str:
+    bucket, amount = _expressions("sqlite", metric, row)
+    return (
+        f"INSERT INTO {STATS_TABLE}(metric, bucket, count, amount) "
+        f"SELECT '{metric}', {bucket}, {sign}1, {sign}{amount} WHERE {bucket} IS NOT NULL "
+        "ON CONFLICT(metric, bucket) DO UPDATE SET "
+        "count = count + excluded.count, amount = amount + excluded.amount;"
+    )
+
+def _create_sqlite_triggers(conn):
+    for table, columns in _WATCHED_COLUMNS.items():
+        metrics = [metric for metric, (source, _, _) in _METRICS.items() if source == table]
+        added = " ".join(_sqlite_bump(metric, "NEW", "") for metric in metrics)
+        removed = " ".join(_sqlite_bump(metric, "OLD", "-") for metric in metrics)
+        conn.execute(text(
+            f"CREATE TRIGGER {STATS_TABLE}_{table}_ai AFTER INSERT ON {table} BEGIN {added} END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER {STATS_TABLE}_{table}_au AFTER UPDATE OF {', '.join(columns)} ON {table} "
+            f"BEGIN {removed} {added} END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER {STATS_TABLE}_{table}_ad AFTER DELETE ON {table} BEGIN {removed} END"
+        ))
+
+def _create_postgres_triggers(conn):
+    conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION bump_{STATS_TABLE}(
+            target_metric VARCHAR, target_bucket VARCHAR, delta_count INTEGER, delta_amount FLOAT
+        ) RETURNS void AS $$
+        BEGIN
+            IF target_bucket IS NULL THEN
+                RETURN;
+            END IF;
+            INSERT INTO {STATS_TABLE}(metric, bucket, count, amount)
+            VALUES (target_metric, target_bucket, delta_count, delta_amount)
+            ON CONFLICT (metric, bucket) DO UPDATE SET
+                count = {STATS_TABLE}.count + excluded.count,
+                amount = {STATS_TABLE}.amount + excluded.amount;
+        END;
+        $$ LANGUAGE plpgsql
+    """))
+
+    for table, columns in _WATCHED_COLUMNS.items():
+        metrics = [metric for metric, (source, _, _) in _METRICS.items() if source == table]
+        removed, added = [], []
+        for metric in metrics:
+            bucket, amount = _expressions("postgresql", metric, "OLD")
+            removed.append(f"PERFORM bump_{STATS_TABLE}('{metric}', {bucket}, -1, -({amount}));")
+            bucket, amount = _expressions("postgresql", metric, "NEW")
+            added.append(f"PERFORM bump_{STATS_TABLE}('{metric}', {bucket}, 1, {amount});")
+
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {STATS_TABLE}_{table}_sync() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    {' '.join(removed)}
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    {' '.join(added)}
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text(
+            f"CREATE TRIGGER {STATS_TABLE}_{table}_sync "
+            f"AFTER INSERT OR DELETE OR UPDATE OF {', '.join(columns)} ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {STATS_TABLE}_{table}_sync()"
+        ))
+
+def create_stats_table(engine):
+    """
+    Create the dashboard aggregate table and its sync triggers if they don't exist yet
+    """
+    if inspect(engine).has_table(STATS_TABLE):
+        return
+
+    with engine.begin() as conn:
+        _create_table(conn)
+        if engine.dialect.name == "postgresql":
+            _create_postgres_triggers(conn)
+        else:
+            _create_sqlite_triggers(conn)
+        conn.execute(text(_backfill_sql(engine.dialect.name)))
+
+def stats_rows():
+    """
+    Statement returning every (metric, bucket, count, amount) row
+    """
+    return text(f"SELECT metric, bucket, count, amount FROM {STATS_TABLE}")
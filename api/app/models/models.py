@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Enum, Text
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Float, DateTime, Enum, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -38,7 +38,7 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     lending_authority_level = Column(Integer, default=1)  # New field for lending authority level (1-8)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
@@ -64,6 +64,10 @@ class Borrower(Base):
     # Relationship
     loan = relationship("LoanApplication", back_populates="borrowers")
 
+    __table_args__ = (
+        Index("ix_borrowers_loan_id_is_co_borrower", "loan_id", "is_co_borrower"),
+    )
+
 class LoanApplication(Base):
     __tablename__ = "loan_applications"
 
@@ -79,7 +83,7 @@ class LoanApplication(Base):
     interest_rate = Column(Float, nullable=True)
     monthly_payment = Column(Float, nullable=True)
     status = Column(Enum(LoanStatus), default=LoanStatus.PENDING)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
@@ -88,6 +92,10 @@ class LoanApplication(Base):
     timeline = relationship("TimelineEvent", back_populates="loan")
     borrowers = relationship("Borrower", back_populates="loan")
 
+    __table_args__ = (
+        Index("ix_loan_applications_status_created_at", "status", "created_at"),
+    )
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if not self.application_number:
@@ -97,7 +105,7 @@ class VehicleDetails(Base):
     __tablename__ = "vehicle_details"
     
     id = Column(Integer, primary_key=True, index=True)
-    loan_id = Column(Integer, ForeignKey("loan_applications.id"))
+    loan_id = Column(Integer, ForeignKey("loan_applications.id"), index=True)
     make = Column(String)
     model = Column(String)
     year = Column(Integer)
@@ -119,6 +127,9 @@ class Document(Base):
     loan_id = Column(Integer, ForeignKey("loan_applications.id"))
     name = Column(String)
     file_path = Column(String)
+    file_name = Column(String, nullable=True)  # Original name of the uploaded file
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the stored blob
+    file_size = Column(Integer, nullable=True)  # Size of the stored file in bytes
     status = Column(Enum(DocumentStatus), default=DocumentStatus.PENDING)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -126,6 +137,10 @@ class Document(Base):
     # Relationships
     loan = relationship("LoanApplication", back_populates="documents")
 
+    __table_args__ = (
+        Index("ix_documents_loan_id_created_at", "loan_id", "created_at"),
+    )
+
 class TimelineEvent(Base):
     __tablename__ = "timeline_events"
 
@@ -139,6 +154,10 @@ class TimelineEvent(Base):
     # Relationships
     loan = relationship("LoanApplication", back_populates="timeline")
 
+    __table_args__ = (
+        Index("ix_timeline_events_loan_id_created_at", "loan_id", "created_at"),
+    )
+
 class Note(Base):
     __tablename__ = "notes"
     
@@ -151,6 +170,10 @@ class Note(Base):
     # Relationship
     loan = relationship("LoanApplication", back_populates="notes")
 
+    __table_args__ = (
+        Index("ix_notes_loan_id_created_at", "loan_id", "created_at"),
+    )
+
 # Add the relationship for notes to LoanApplication
 LoanApplication.vehicle_details = relationship("VehicleDetails", back_populates="loan", uselist=False)
 LoanApplication.notes = relationship("Note", back_populates="loan")
\ No newline at end of file
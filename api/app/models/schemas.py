@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
-from typing import Optional, List, Union
+from typing import Dict, Optional, List, Union
 from datetime import datetime
 from app.models.models import LoanStatus, DocumentStatus, TimelineEventType
 
@@ -38,6 +38,10 @@ class UserResponse(BaseModel):
 
     model_config = {"from_attributes": True}
 
+class UserPage(BaseModel):
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
 # Borrower schemas
 class BorrowerBase(BaseModel):
     full_name: str
@@ -86,6 +90,9 @@ class Document(DocumentBase):
     id: int
     loan_id: int
     file_path: str
+    file_name: Optional[str] = None
+    content_hash: Optional[str] = None
+    file_size: Optional[int] = None
     status: DocumentStatus
     created_at: datetime
     updated_at: datetime
@@ -98,6 +105,10 @@ class DocumentResponse(Document):
     
     model_config = {"from_attributes": True}
 
+class DocumentPage(BaseModel):
+    items: List[DocumentResponse]
+    next_cursor: Optional[str] = None
+
 # Timeline event schemas
 class TimelineEventBase(BaseModel):
     event: str
@@ -215,6 +226,28 @@ class LoanApplicationSummary(BaseModel):
 
     model_config = {"from_attributes": True}
 
+class LoanApplicationPage(BaseModel):
+    items: List[LoanApplicationSummary]
+    next_cursor: Optional[str] = None
+
+# Dashboard statistics schemas
+class StatusTotal(BaseModel):
+    count: int = 0
+    amount: float = 0.0
+
+class VolumeBucket(BaseModel):
+    period: str  # YYYY-MM
+    count: int = 0
+    amount: float = 0.0
+
+class PortfolioStats(BaseModel):
+    total_loans: int
+    total_loan_amount: float
+    loan_status: Dict[str, StatusTotal]
+    total_documents: int
+    document_status: Dict[str, int]
+    monthly_volume: List[VolumeBucket]
+
 class LoanApplication(LoanApplicationBase):
     id: int
     application_number: str
@@ -1,14 +1,17 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Path, Response
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Path, Query, Request, Response
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
-import shutil
 from pathlib import Path as FilePath
-import datetime
 
-from app.database.db import get_db
+from app.database.db import get_async_db
+from app.database.pagination import MAX_PAGE_SIZE, keyset_page, split_page
 from app.models import models, schemas
+from app.routers.loans import find_loan
+from app.storage.blobs import blob_lock, blob_path, count_references, promote_blob, remove_blob, stage_blob
+from app.storage.downloads import file_download
 
 router = APIRouter()
 
@@ -17,16 +20,17 @@ UPLOAD_DIR = FilePath("./uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 @router.get("/file/{document_id}", response_class=FileResponse)
-def get_document_file(
+async def get_document_file(
     document_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get the actual file for a document by ID
+    Get the actual file for a document by ID.
+    Supports conditional requests (ETag / Last-Modified) and byte ranges so
+    viewers can revalidate cached copies and load large PDFs incrementally.
     """
-    db_document = db.query(models.Document).filter(
-        models.Document.id == document_id
-    ).first()
+    db_document = await db.get(models.Document, document_id)
     
     if db_document is None:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -36,8 +40,11 @@ def get_document_file(
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found on server")
     
+    # Blobs are named by hash, so the original name carries the extension
+    file_name = db_document.file_name or file_path.name
+    
     # Determine media type based on file extension
-    file_extension = file_path.suffix.lower()
+    file_extension = FilePath(file_name).suffix.lower()
     media_type = "application/octet-stream"  # Default
     
     # Set appropriate content type for common file types
@@ -50,127 +57,117 @@ def get_document_file(
     elif file_extension in [".doc", ".docx"]:
         media_type = "application/msword"
     
-    # Return with Content-Disposition: inline to display in browser
-    return FileResponse(
-        path=file_path, 
-        filename=file_path.name,
+    # Served inline so the browser displays it instead of downloading
+    return file_download(
+        request,
+        file_path,
+        filename=file_name,
         media_type=media_type,
-        content_disposition_type="inline"  # This is the key change
+        content_hash=db_document.content_hash
     )
 
 @router.get("/detail/{document_id}", response_model=schemas.DocumentResponse)
-def get_document(
+async def get_document(
     document_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get a document by ID
     """
-    db_document = db.query(models.Document).filter(
-        models.Document.id == document_id
-    ).first()
+    db_document = await db.get(models.Document, document_id)
     
     if db_document is None:
         raise HTTPException(status_code=404, detail="Document not found")
     
     return db_document
 
-@router.get("/{loan_id}", response_model=List[schemas.DocumentResponse])
-def get_documents(
+@router.get("/{loan_id}", response_model=Union[List[schemas.DocumentResponse], schemas.DocumentPage])
+async def get_documents(
     loan_id: str,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get all documents for a loan application
+
+    Passing `cursor` (empty for the first page) returns a keyset page of at
+    most `limit` documents ordered by created_at and id, with a `next_cursor`.
     """
     # Find loan by ID or application number
-    if loan_id.isdigit():
-        query = db.query(models.LoanApplication).filter(
-            models.LoanApplication.id == int(loan_id)
-        )
-    else:
-        query = db.query(models.LoanApplication).filter(
-            models.LoanApplication.application_number == loan_id
-        )
-    
-    db_loan = query.first()
+    db_loan = await find_loan(db, loan_id)
     if db_loan is None:
         raise HTTPException(status_code=404, detail="Loan application not found")
     
-    return db_loan.documents
+    query = select(models.Document).where(models.Document.loan_id == db_loan.id)
+    if cursor is not None:
+        page = keyset_page(query, models.Document.created_at, models.Document.id, cursor, limit)
+        items, next_cursor = split_page((await db.execute(page)).scalars().all(), limit)
+        return schemas.DocumentPage(items=items, next_cursor=next_cursor)
+    
+    result = await db.execute(query)
+    return result.scalars().all()
 
 @router.post("/{loan_id}/upload", response_model=schemas.DocumentResponse)
 async def upload_document(
     loan_id: str,
     name: str = Form(...),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Upload a document for a loan application
     """
     # Find loan by ID or application number
-    if loan_id.isdigit():
-        query = db.query(models.LoanApplication).filter(
-            models.LoanApplication.id == int(loan_id)
-        )
-    else:
-        query = db.query(models.LoanApplication).filter(
-            models.LoanApplication.application_number == loan_id
-        )
-    
-    db_loan = query.first()
+    db_loan = await find_loan(db, loan_id)
     if db_loan is None:
         raise HTTPException(status_code=404, detail="Loan application not found")
     
-    # Create directory for loan documents using loan application number
-    loan_dir = UPLOAD_DIR / db_loan.application_number
-    loan_dir.mkdir(exist_ok=True)
-    
-    # Generate unique filename with timestamp
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{name.replace(' ', '_')}_{timestamp}_{file.filename}"
-    file_path = loan_dir / filename
-    
-    # Save file to disk
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Create document record in database
-    db_document = models.Document(
-        loan_id=db_loan.id,
-        name=name,
-        file_path=str(file_path),
-        status=models.DocumentStatus.PENDING
-    )
-    db.add(db_document)
-    
-    # Add timeline event for document upload
-    timeline_event = models.TimelineEvent(
-        loan_id=db_loan.id,
-        event=f"Document '{name}' uploaded",
-        user="System",
-        type=models.TimelineEventType.INFO
-    )
-    db.add(timeline_event)
-    
-    db.commit()
-    db.refresh(db_document)
+    # Stream the file into the content-addressed store; identical bytes
+    # uploaded for any loan are stored once and shared between documents
+    file_size, content_hash, staged = await stage_blob(file)
+    
+    # Promote and commit under the blob's lock, so a concurrent delete of the
+    # last other reference can't remove the blob in between
+    async with blob_lock(content_hash):
+        file_path = await promote_blob(staged, content_hash)
+        
+        # Create document record in database
+        db_document = models.Document(
+            loan_id=db_loan.id,
+            name=name,
+            file_path=str(file_path),
+            file_name=file.filename,
+            content_hash=content_hash,
+            file_size=file_size,
+            status=models.DocumentStatus.PENDING
+        )
+        db.add(db_document)
+        
+        # Add timeline event for document upload
+        timeline_event = models.TimelineEvent(
+            loan_id=db_loan.id,
+            event=f"Document '{name}' uploaded",
+            user="System",
+            type=models.TimelineEventType.INFO
+        )
+        db.add(timeline_event)
+        
+        await db.commit()
+    await db.refresh(db_document)
     
     return db_document
 
 @router.put("/{document_id}", response_model=schemas.DocumentResponse)
-def update_document_status(
+async def update_document_status(
     document_id: int,
     document_update: schemas.DocumentUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update document status
     """
-    db_document = db.query(models.Document).filter(
-        models.Document.id == document_id
-    ).first()
+    db_document = await db.get(models.Document, document_id)
     
     if db_document is None:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -191,22 +188,20 @@ def update_document_status(
         )
         db.add(timeline_event)
     
-    db.commit()
-    db.refresh(db_document)
+    await db.commit()
+    await db.refresh(db_document)
     
     return db_document
 
 @router.delete("/{document_id}", status_code=204)
-def delete_document(
+async def delete_document(
     document_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Delete a document by ID
     """
-    db_document = db.query(models.Document).filter(
-        models.Document.id == document_id
-    ).first()
+    db_document = await db.get(models.Document, document_id)
     
     if db_document is None:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -223,16 +218,31 @@ def delete_document(
     )
     db.add(timeline_event)
     
-    # Delete the file if it exists
-    if file_path.exists():
-        try:
-            file_path.unlink()  # Delete the file
-        except Exception as e:
-            # Log the error but continue with database deletion
-            print(f"Error deleting file: {e}")
-    
     # Delete the document record from the database
-    db.delete(db_document)
-    db.commit()
+    await db.delete(db_document)
+    
+    # Documents uploaded before the blob store own their file outright; a
+    # shared blob is only removed once no other document references it
+    content_hash = db_document.content_hash
+    shared = content_hash is not None and file_path == blob_path(content_hash)
+    
+    try:
+        if not shared:
+            await db.commit()
+            if file_path.exists():
+                file_path.unlink()
+            return None
+        
+        # Count and remove under the blob's lock, so an upload of the same bytes
+        # can't commit a new reference in between
+        async with blob_lock(content_hash):
+            await db.flush()
+            remove_file = await count_references(db, content_hash) == 0
+            await db.commit()
+            if remove_file:
+                await remove_blob(content_hash)
+    except OSError as e:
+        # Log the error; the database record is already gone
+        print(f"Error deleting file: {e}")
     
     return None
\ No newline at end of file
@@ -1,9 +1,15 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 import uuid
+from datetime import datetime
 
-from app.database.db import get_db
+from app.database.db import get_async_db
+from app.database.pagination import MAX_PAGE_SIZE, keyset_page, split_page
+from app.database.search import search_matches
+from app.database.stats import DOCUMENT_STATUS, LOAN_MONTH, LOAN_STATUS, stats_rows
 from app.models import models, schemas
 
 router = APIRouter()
@@ -14,54 +20,131 @@ def generate_application_number():
     unique_id = str(uuid.uuid4())[:8].upper()
     return f"LA-{current_year}-{unique_id}"
 
-@router.get("/", response_model=List[schemas.LoanApplicationSummary])
-def get_loan_applications(
+def primary_borrower_name():
+    """
+    Correlated subquery resolving the primary borrower's name for a loan
+    """
+    return (
+        select(models.Borrower.full_name)
+        .where(
+            models.Borrower.loan_id == models.LoanApplication.id,
+            models.Borrower.is_co_borrower == False,
+        )
+        .order_by(models.Borrower.id)
+        .limit(1)
+        .correlate(models.LoanApplication)
+        .scalar_subquery()
+    )
+
+async def find_loan(db: AsyncSession, application_id: str, *options):
+    """
+    Load a loan application by numeric ID or application number, eager-loading
+    any relationships passed as loader options
+    """
+    if application_id.isdigit():
+        condition = models.LoanApplication.id == int(application_id)
+    else:
+        condition = models.LoanApplication.application_number == application_id
+    
+    result = await db.execute(select(models.LoanApplication).where(condition).options(*options))
+    return result.scalars().first()
+
+@router.get("/", response_model=Union[List[schemas.LoanApplicationSummary], schemas.LoanApplicationPage])
+async def get_loan_applications(
     status: Optional[models.LoanStatus] = None,
     search: Optional[str] = None,
     skip: int = 0, 
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get all loan applications with optional filtering
+
+    Passing `cursor` (empty for the first page) switches to keyset pagination
+    ordered by created_at and id, returning the page with a `next_cursor`.
+    Without it the plain skip/limit list is returned.
     """
-    query = db.query(models.LoanApplication)
+    # Project only the summary columns; the primary borrower name is resolved
+    # in SQL so a page costs a single round trip instead of one per loan
+    query = select(
+        models.LoanApplication.id,
+        models.LoanApplication.application_number,
+        func.coalesce(primary_borrower_name(), "Unknown").label("customer_name"),
+        models.LoanApplication.status,
+        models.LoanApplication.created_at,
+        models.LoanApplication.loan_amount,
+    )
     
     # Apply filters if provided
     if status:
-        query = query.filter(models.LoanApplication.status == status)
+        query = query.where(models.LoanApplication.status == status)
     
-    if search:
-        # Join with borrower to search by customer name
-        query = query.join(models.Borrower).filter(
-            models.Borrower.is_co_borrower == False,  # Only primary borrowers
-            models.Borrower.full_name.ilike(f"%{search}%") |
-            models.LoanApplication.application_number.ilike(f"%{search}%")
-        )
+    matches = search_matches(db.bind.dialect.name, search) if search else None
+    if matches is not None:
+        # Prefix match on borrower names, emails, VINs and application numbers
+        query = query.join(matches, matches.c.loan_id == models.LoanApplication.id)
     
-    loans = query.offset(skip).limit(limit).all()
+    if cursor is not None:
+        page = keyset_page(query, models.LoanApplication.created_at, models.LoanApplication.id, cursor, limit)
+        items, next_cursor = split_page((await db.execute(page)).all(), limit)
+        return schemas.LoanApplicationPage(items=items, next_cursor=next_cursor)
     
-    # Format response with primary borrower name
-    result = []
-    for loan in loans:
-        primary_borrower = next((b for b in loan.borrowers if not b.is_co_borrower), None)
-        customer_name = primary_borrower.full_name if primary_borrower else "Unknown"
-        
-        result.append(schemas.LoanApplicationSummary(
-            id=loan.id,
-            application_number=loan.application_number,
-            customer_name=customer_name,
-            status=loan.status,
-            created_at=loan.created_at,  # Changed from submitted_date to created_at
-            loan_amount=loan.loan_amount
-        ))
+    if matches is not None:
+        query = query.order_by(matches.c.rank)
+    else:
+        query = query.order_by(models.LoanApplication.created_at, models.LoanApplication.id)
     
-    return result
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.all()
+
+def recent_months(count: int) -> List[str]:
+    """
+    The last count calendar months as YYYY-MM, oldest first
+    """
+    today = datetime.utcnow()
+    months = []
+    for offset in range(count - 1, -1, -1):
+        year, month = divmod(today.year * 12 + today.month - 1 - offset, 12)
+        months.append(f"{year:04d}-{month + 1:02d}")
+    return months
+
+@router.get("/stats", response_model=schemas.PortfolioStats)
+async def get_loan_stats(
+    months: int = Query(12, ge=1, le=120),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Portfolio statistics for the dashboard.
+    Read from the portfolio_stats aggregate table, which triggers keep current,
+    so the cost does not grow with the number of loans or documents.
+    """
+    loan_status = {loan_status.value: schemas.StatusTotal() for loan_status in models.LoanStatus}
+    document_status = {document_status.value: 0 for document_status in models.DocumentStatus}
+    volume = {}
+    
+    for metric, bucket, count, amount in (await db.execute(stats_rows())).all():
+        if metric == LOAN_STATUS:
+            # Statuses are stored by enum name
+            loan_status[models.LoanStatus[bucket].value] = schemas.StatusTotal(count=count, amount=amount)
+        elif metric == DOCUMENT_STATUS:
+            document_status[models.DocumentStatus[bucket].value] = count
+        elif metric == LOAN_MONTH:
+            volume[bucket] = schemas.VolumeBucket(period=bucket, count=count, amount=amount)
+    
+    return schemas.PortfolioStats(
+        total_loans=sum(total.count for total in loan_status.values()),
+        total_loan_amount=sum(total.amount for total in loan_status.values()),
+        loan_status=loan_status,
+        total_documents=sum(document_status.values()),
+        document_status=document_status,
+        monthly_volume=[volume.get(period, schemas.VolumeBucket(period=period)) for period in recent_months(months)],
+    )
 
 @router.post("/", response_model=schemas.LoanApplicationResponse, status_code=status.HTTP_201_CREATED)
-def create_loan_application(
+async def create_loan_application(
     loan_application: schemas.LoanApplicationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new loan application
@@ -90,29 +173,30 @@ def create_loan_application(
         )
         db.add(timeline_event)
     
-    db.commit()
-    db.refresh(db_loan)
+    await db.commit()
+    await db.refresh(db_loan)
     return db_loan
 
 @router.get("/{application_id}", response_model=schemas.LoanApplicationDetail)
-def get_loan_application(
+async def get_loan_application(
     application_id: str, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get a specific loan application by ID or application number
     """
     try:
-        # Try to get by ID first (if numeric)
-        if application_id.isdigit():
-            db_loan = db.query(models.LoanApplication).filter(
-                models.LoanApplication.id == int(application_id)
-            ).first()
-        else:
-            # Try to get by application number
-            db_loan = db.query(models.LoanApplication).filter(
-                models.LoanApplication.application_number == application_id
-            ).first()
+        # Find loan by ID or application number with everything the detail view shows
+        db_loan = await find_loan(
+            db,
+            application_id,
+            selectinload(models.LoanApplication.user),
+            selectinload(models.LoanApplication.documents),
+            selectinload(models.LoanApplication.timeline),
+            selectinload(models.LoanApplication.borrowers),
+            selectinload(models.LoanApplication.vehicle_details),
+            selectinload(models.LoanApplication.notes),
+        )
         
         if db_loan is None:
             raise HTTPException(status_code=404, detail="Loan application not found")
@@ -143,23 +227,16 @@ def get_loan_application(
         )
 
 @router.put("/{application_id}", response_model=schemas.LoanApplicationResponse)
-def update_loan_application(
+async def update_loan_application(
     application_id: str,
     loan_update: schemas.LoanApplicationUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update a loan application
     """
     # Find loan by ID or application number
-    if application_id.isdigit():
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.id == int(application_id)
-        ).first()
-    else:
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.application_number == application_id
-        ).first()
+    db_loan = await find_loan(db, application_id)
     
     if db_loan is None:
         raise HTTPException(status_code=404, detail="Loan application not found")
@@ -180,28 +257,21 @@ def update_loan_application(
         )
         db.add(timeline_event)
     
-    db.commit()
-    db.refresh(db_loan)
+    await db.commit()
+    await db.refresh(db_loan)
     return db_loan
 
 @router.post("/{application_id}/notes", response_model=schemas.NoteResponse)
-def add_note(
+async def add_note(
     application_id: str,
     note: schemas.NoteCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Add a note to a loan application
     """
     # Find loan
-    if application_id.isdigit():
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.id == int(application_id)
-        ).first()
-    else:
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.application_number == application_id
-        ).first()
+    db_loan = await find_loan(db, application_id)
     
     if db_loan is None:
         raise HTTPException(status_code=404, detail="Loan application not found")
@@ -213,29 +283,22 @@ def add_note(
         content=note.content
     )
     db.add(db_note)
-    db.commit()
-    db.refresh(db_note)
+    await db.commit()
+    await db.refresh(db_note)
     
     return db_note
 
 @router.post("/{application_id}/timeline", response_model=schemas.TimelineEventResponse)
-def add_timeline_event(
+async def add_timeline_event(
     application_id: str,
     event: schemas.TimelineEventCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Add a timeline event to a loan application
     """
     # Find loan
-    if application_id.isdigit():
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.id == int(application_id)
-        ).first()
-    else:
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.application_number == application_id
-        ).first()
+    db_loan = await find_loan(db, application_id)
     
     if db_loan is None:
         raise HTTPException(status_code=404, detail="Loan application not found")
@@ -248,29 +311,22 @@ def add_timeline_event(
         type=event.type
     )
     db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+    await db.commit()
+    await db.refresh(db_event)
     
     return db_event
 
 # New endpoints for borrowers and vehicle details
 @router.get("/{application_id}/borrowers", response_model=List[schemas.BorrowerResponse])
-def get_loan_borrowers(
+async def get_loan_borrowers(
     application_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get all borrowers for a loan application
     """
     # Find loan
-    if application_id.isdigit():
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.id == int(application_id)
-        ).first()
-    else:
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.application_number == application_id
-        ).first()
+    db_loan = await find_loan(db, application_id, selectinload(models.LoanApplication.borrowers))
     
     if db_loan is None:
         raise HTTPException(status_code=404, detail="Loan application not found")
@@ -278,22 +334,15 @@ def get_loan_borrowers(
     return db_loan.borrowers
 
 @router.get("/{application_id}/vehicle", response_model=schemas.VehicleDetailsResponse)
-def get_loan_vehicle_details(
+async def get_loan_vehicle_details(
     application_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get vehicle details for a loan application
     """
     # Find loan
-    if application_id.isdigit():
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.id == int(application_id)
-        ).first()
-    else:
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.application_number == application_id
-        ).first()
+    db_loan = await find_loan(db, application_id, selectinload(models.LoanApplication.vehicle_details))
     
     if db_loan is None:
         raise HTTPException(status_code=404, detail="Loan application not found")
@@ -304,23 +353,16 @@ def get_loan_vehicle_details(
     return db_loan.vehicle_details
 
 @router.patch("/{application_id}/status", response_model=schemas.LoanApplicationResponse)
-def update_loan_status(
+async def update_loan_status(
     application_id: str,
     status_update: schemas.LoanStatusUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update only the status of a loan application
     """
     # Find loan by ID or application number
-    if application_id.isdigit():
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.id == int(application_id)
-        ).first()
-    else:
-        db_loan = db.query(models.LoanApplication).filter(
-            models.LoanApplication.application_number == application_id
-        ).first()
+    db_loan = await find_loan(db, application_id)
     
     if db_loan is None:
         raise HTTPException(status_code=404, detail="Loan application not found")
@@ -337,6 +379,6 @@ def update_loan_status(
     )
     db.add(timeline_event)
     
-    db.commit()
-    db.refresh(db_loan)
+    await db.commit()
+    await db.refresh(db_loan)
     return db_loan
\ No newline at end of file
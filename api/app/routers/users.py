@@ -1,12 +1,15 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
-from app.database.db import get_db
+from app.database.db import get_async_db
+from app.database.pagination import MAX_PAGE_SIZE, keyset_page, split_page
 from app.models import models, schemas
 
 # Security configurations
@@ -26,11 +29,16 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def authenticate_user(db, email: str, password: str):
-    user = db.query(models.User).filter(models.User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+async def authenticate_user(db, email: str, password: str):
+    user = await get_user_by_email(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # bcrypt is deliberately slow, so keep it off the event loop
+    if not await run_in_threadpool(verify_password, password, user.hashed_password):
         return False
     return user
 
@@ -44,7 +52,7 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -57,7 +65,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await get_user_by_email(db, email)
     if user is None:
         raise credentials_exception
     return user
@@ -71,14 +79,15 @@ async def get_admin_user(current_user: models.User = Depends(get_current_user)):
     return current_user
 
 # Add a helper function to get a default user for testing without authentication
-async def get_default_test_user(db: Session = Depends(get_db)):
+async def get_default_test_user(db: AsyncSession = Depends(get_async_db)):
     """For testing only: returns a default user without requiring authentication"""
     # Try to get the first user from the database
-    user = db.query(models.User).first()
+    result = await db.execute(select(models.User).order_by(models.User.id).limit(1))
+    user = result.scalars().first()
     
     # If no user exists, create a default one
     if not user:
-        hashed_password = get_password_hash("testpassword")
+        hashed_password = await run_in_threadpool(get_password_hash, "testpassword")
         user = models.User(
             email="test@example.com",
             hashed_password=hashed_password,
@@ -87,15 +96,15 @@ async def get_default_test_user(db: Session = Depends(get_db)):
             lending_authority_level=3  # Set a default authority level
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     
     return user
 
 # Routes
 @router.post("/token", response_model=dict)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -109,17 +118,17 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Create a new user
     """
     # Check if email already exists
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
@@ -127,12 +136,12 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         is_active=True
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.get("/me", response_model=schemas.UserResponse)
-async def read_users_me(db: Session = Depends(get_db)):
+async def read_users_me(db: AsyncSession = Depends(get_async_db)):
     """
     Get current user information - TESTING MODE: No authentication required
     """
@@ -140,23 +149,35 @@ async def read_users_me(db: Session = Depends(get_db)):
     user = await get_default_test_user(db)
     return user
 
-@router.get("/", response_model=List[schemas.UserResponse])
+@router.get("/", response_model=Union[List[schemas.UserResponse], schemas.UserPage])
 async def read_users(
     skip: int = 0, 
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get all users (admin only)
+
+    Passing `cursor` (empty for the first page) switches to keyset pagination
+    ordered by created_at and id, returning the page with a `next_cursor`.
     """
-    users = db.query(models.User).offset(skip).limit(limit).all()
+    if cursor is not None:
+        page = keyset_page(select(models.User), models.User.created_at, models.User.id, cursor, limit)
+        items, next_cursor = split_page((await db.execute(page)).scalars().all(), limit)
+        return schemas.UserPage(items=items, next_cursor=next_cursor)
+    
+    result = await db.execute(
+        select(models.User).order_by(models.User.created_at, models.User.id).offset(skip).limit(limit)
+    )
+    users = result.scalars().all()
     return users
 
 @router.patch("/authority-level", response_model=schemas.UserResponse)
 async def update_lending_authority_level(
     authority_data: schemas.AuthorityLevelUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update user's lending authority level (1-8) - TESTING MODE: No authentication required
@@ -175,7 +196,7 @@ async def update_lending_authority_level(
     user.lending_authority_level = authority_data.lending_authority_level
     user.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return user
\ No newline at end of file
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import uuid
+from pathlib import Path
+from typing import Tuple
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import models
+from app.storage.uploads import save_upload
+
+# Content-addressed store: every distinct file is kept once, named by its SHA-256
+BLOB_DIR = Path(os.environ.get("BLOB_STORE_DIR", "./uploads/blobs"))
+STAGING_DIR = BLOB_DIR / ".staging"
+
+# Striped by the first byte of the hash. Held while a blob's references change,
+# so counting them and removing the blob can't interleave with another upload of
+# the same bytes. The locks are per process, so one blob store takes one API
+# worker process.
+_BLOB_LOCKS = [asyncio.Lock() for _ in range(256)]
+
+def blob_path(content_hash: str) -> Path:
+    """
+    Location of a blob, sharded by the first two bytes of its hash
+    """
+    return BLOB_DIR / content_hash[:2] / content_hash[2:4] / content_hash
+
+def blob_lock(content_hash: str) -> asyncio.Lock:
+    """
+    Lock to hold from promoting a blob until its document row is committed,
+    and from counting a blob's references until it is removed
+    """
+    return _BLOB_LOCKS[int(content_hash[:2], 16)]
+
+def _promote(staged: Path, destination: Path):
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    # Replacing an existing blob is harmless since the bytes are identical
+    os.replace(staged, destination)
+
+async def stage_blob(upload: UploadFile) -> Tuple[int, str, Path]:
+    """
+    Stream an upload into the staging area, hashing it on the way.
+    Returns the size in bytes, the SHA-256 hex digest and the staged path.
+    """
+    staged = STAGING_DIR / uuid.uuid4().hex
+    size, content_hash = await save_upload(upload, staged)
+    return size, content_hash, staged
+
+async def promote_blob(staged: Path, content_hash: str) -> Path:
+    """
+    Move a staged upload to its content-addressed location, deduplicating by content.
+    Call with blob_lock held. Returns the blob path.
+    """
+    path = blob_path(content_hash)
+    await run_in_threadpool(_promote, staged, path)
+    return path
+
+async def count_references(db: AsyncSession, content_hash: str) -> int:
+    """
+    Number of documents that point at a blob
+    """
+    result = await db.execute(
+        select(func.count(models.Document.id)).where(models.Document.content_hash == content_hash)
+    )
+    return result.scalar_one()
+
+def _remove(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+async def remove_blob(content_hash: str):
+    """
+    Delete a blob from disk; callers must hold blob_lock and first check it has no references left
+    """
+    await run_in_threadpool(_remove, blob_path(content_hash))
@@ -0,0 +1,146 @@
+import os
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from app.storage.uploads import UPLOAD_CHUNK_SIZE
+
+# Downloads are addressed by document ID, which can point at another file after
+# a delete, so browsers must revalidate; the ETag keeps that to a 304.
+# Documents are private to the lending team, so shared caches must not store them.
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+def entity_tag(content_hash: Optional[str], stat: os.stat_result) -> str:
+    """
+    Strong ETag from the content hash; files stored before hashing get a weak one
+    """
+    if content_hash:
+        return f'"{content_hash}"'
+    return f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in [c.removeprefix("W/") for c in candidates]
+
+def _not_modified(request: Request, etag: str, modified: datetime) -> bool:
+    """
+    Evaluate If-None-Match, falling back to If-Modified-Since only when it is absent
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return modified <= since
+
+def _requested_range(request: Request, etag: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    The inclusive byte range to serve, or None for the whole file.
+    Only single ranges are honoured; anything else falls back to a full response.
+    """
+    header = request.headers.get("range")
+    if header is None or size == 0:
+        return None
+
+    # A stale If-Range means the client's partial copy is outdated: send everything
+    if_range = request.headers.get("if-range")
+    if if_range is not None and (etag.startswith("W/") or if_range.strip() != etag):
+        return None
+
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: the final N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start > end:
+        return None
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+async def _read_range(path: Path, start: int, end: int):
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def file_download(
+    request: Request,
+    path: Path,
+    filename: str,
+    media_type: str,
+    content_hash: Optional[str] = None,
+) -> Response:
+    """
+    Serve a stored file with validators, conditional GET and byte ranges.
+
+    Responds 304 when the client's copy is current, 206 with the requested
+    slice for a single byte range, and 200 with the whole file otherwise.
+    """
+    stat = path.stat()
+    etag = entity_tag(content_hash, stat)
+    modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _not_modified(request, etag, modified):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = _requested_range(request, etag, stat.st_size)
+    if byte_range is None:
+        return FileResponse(
+            path=path,
+            filename=filename,
+            media_type=media_type,
+            headers=headers,
+            content_disposition_type="inline"
+        )
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _read_range(path, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=headers
+    )
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Tuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+# Uploads are streamed in chunks of this size so large scans never sit in memory
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(64 * 1024 * 1024)))
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File exceeds the maximum upload size of {max_bytes // (1024 * 1024)} MB"
+    )
+
+def _open_temp_file(directory: Path):
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".part")
+    return os.fdopen(fd, "wb"), temp_path
+
+def _write_chunk(buffer, digest, chunk: bytes):
+    digest.update(chunk)
+    buffer.write(chunk)
+
+def _commit_temp_file(buffer, temp_path: str, destination: Path):
+    """
+    Flush the temp file to disk and atomically move it into place
+    """
+    buffer.flush()
+    os.fsync(buffer.fileno())
+    buffer.close()
+    os.replace(temp_path, destination)
+
+    # Persist the rename itself; not every platform can fsync a directory
+    try:
+        dir_fd = os.open(destination.parent, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+def _discard_temp_file(buffer, temp_path: str):
+    buffer.close()
+    try:
+        os.unlink(temp_path)
+    except FileNotFoundError:
+        pass
+
+async def save_upload(upload: UploadFile, destination: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[int, str]:
+    """
+    Stream an upload to destination without blocking the event loop.
+
+    Chunks are hashed and written in the threadpool to a temp file next to the
+    destination, which is fsynced and renamed into place only once the whole
+    upload has arrived, so readers never see a partial file.
+
+    Returns the size in bytes and the SHA-256 hex digest of the content.
+    Raises a 413 HTTPException as soon as the upload exceeds max_bytes.
+    """
+    # Reject early when the client declared the size up front
+    if upload.size is not None and upload.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    buffer, temp_path = await run_in_threadpool(_open_temp_file, destination.parent)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise _too_large(max_bytes)
+            await run_in_threadpool(_write_chunk, buffer, digest, chunk)
+
+        await run_in_threadpool(_commit_temp_file, buffer, temp_path, destination)
+    except BaseException:
+        # Clean up inline: the request may be cancelled, and this is cheap
+        _discard_temp_file(buffer, temp_path)
+        raise
+
+    return size, digest.hexdigest()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Query plan audit for the lending API.
+Runs the router queries against a throwaway SQLite database, explains every
+statement they emit with EXPLAIN QUERY PLAN and exits non-zero if any of them
+falls back to a full table scan.
+"""
+import sys
+import os
+import asyncio
+import re
+import tempfile
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add the parent directory to the path so we can import our app modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database.db import Base
+from app.database.search import create_search_index
+from app.models import models
+from app.routers import documents, loans, users
+
+# "SCAN <table>" without an index is a full scan; index scans, virtual
+# table lookups and subquery materialisations are fine
+FULL_SCAN = re.compile(r"^SCAN (?!.*\b(USING|VIRTUAL TABLE)\b)(?!CONSTANT ROW)(\w+)")
+
+def seed_sample_loan(session):
+    """Insert one loan with every related row so lazy loads are exercised"""
+    user = models.User(email="audit@example.com", hashed_password="x", full_name="Audit User")
+    session.add(user)
+    session.flush()
+
+    loan = models.LoanApplication(
+        application_number="LA-AUDIT-0001",
+        user_id=user.id,
+        vehicle_make="Toyota",
+        vehicle_model="Camry",
+        vehicle_year=2022,
+        vehicle_price=30000.0,
+        loan_amount=25000.0,
+        loan_term_months=60,
+    )
+    session.add(loan)
+    session.flush()
+
+    session.add_all([
+        models.Borrower(loan_id=loan.id, is_co_borrower=False, full_name="Jane Smith", email="jane@example.com"),
+        models.VehicleDetails(loan_id=loan.id, make="Toyota", model="Camry", year=2022, vin="1HGCM82633A004352"),
+        models.Document(loan_id=loan.id, name="Sales Contract", file_path="uploads/contract.pdf"),
+        models.TimelineEvent(loan_id=loan.id, event="Loan application submitted", user="System"),
+        models.Note(loan_id=loan.id, author="Audit", content="Audit note"),
+    ])
+    session.commit()
+    return loan
+
+def router_queries(session, loan_id: int, application_number: str):
+    """The router calls to audit, keyed by a readable label"""
+    return {
+        "list loans": lambda: loans.get_loan_applications(status=None, search=None, skip=0, limit=100, cursor=None, db=session),
+        "list loans by status": lambda: loans.get_loan_applications(
+            status=models.LoanStatus.PENDING, search=None, skip=0, limit=100, cursor=None, db=session
+        ),
+        "search loans": lambda: loans.get_loan_applications(status=None, search="smi", skip=0, limit=100, cursor=None, db=session),
+        "list loans by cursor": lambda: loans.get_loan_applications(
+            status=None, search=None, skip=0, limit=100, cursor="", db=session
+        ),
+        "loan detail by id": lambda: loans.get_loan_application(application_id=str(loan_id), db=session),
+        "loan detail by number": lambda: loans.get_loan_application(application_id=application_number, db=session),
+        "loan borrowers": lambda: loans.get_loan_borrowers(application_id=str(loan_id), db=session),
+        "loan vehicle": lambda: loans.get_loan_vehicle_details(application_id=str(loan_id), db=session),
+        "loan documents": lambda: documents.get_documents(loan_id=str(loan_id), cursor=None, limit=100, db=session),
+        "loan documents by cursor": lambda: documents.get_documents(loan_id=str(loan_id), cursor="", limit=100, db=session),
+        "document detail": lambda: documents.get_document(document_id=1, db=session),
+        "list users": lambda: users.read_users(skip=0, limit=100, cursor=None, current_user=None, db=session),
+        "list users by cursor": lambda: users.read_users(skip=0, limit=100, cursor="", current_user=None, db=session),
+    }
+
+async def capture_statements(db_path: str, loan_id: int, application_number: str):
+    """Run every audited router call and collect the statements each one emits"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    captured = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute",
+        lambda conn, cursor, statement, parameters, *args: captured.append((statement, parameters))
+    )
+
+    statements = {}
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            for label, run in router_queries(session, loan_id, application_number).items():
+                session.expunge_all()
+                captured.clear()
+                await run()
+                statements[label] = list(captured)
+    finally:
+        await engine.dispose()
+    return statements
+
+def audit():
+    """Explain every statement emitted by the audited router calls"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "audit.db")
+        engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(bind=engine)
+        create_search_index(engine)
+
+        session = sessionmaker(bind=engine)()
+        loan = seed_sample_loan(session)
+        loan_id, application_number = loan.id, loan.application_number
+        session.close()
+
+        failures = []
+        try:
+            statements = asyncio.run(capture_statements(db_path, loan_id, application_number))
+            with engine.connect() as conn:
+                for label, emitted in statements.items():
+                    for statement, parameters in emitted:
+                        if not statement.lstrip().upper().startswith("SELECT"):
+                            continue
+                        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", tuple(parameters)).fetchall()
+                        details = [row[-1] for row in plan]
+                        scans = [detail for detail in details if FULL_SCAN.match(detail)]
+                        status = "FULL SCAN" if scans else "ok"
+                        print(f"[{status}] {label}: {' | '.join(details)}")
+                        if scans:
+                            failures.append((label, statement, scans))
+        finally:
+            engine.dispose()
+
+        return failures
+
+def main():
+    failures = audit()
+    if failures:
+        print(f"\nFAIL: {len(failures)} statement(s) perform full table scans:")
+        for label, statement, scans in failures:
+            print(f"\n  {label}: {', '.join(scans)}\n    {' '.join(statement.split())}")
+        sys.exit(1)
+    print("\nOK: no router query performs a full table scan")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the loan list endpoint query.
+Seeds throwaway SQLite databases with 10k/100k/1M loan applications and
+verifies that fetching a page of summaries costs a constant number of
+queries regardless of portfolio size.
+"""
+import sys
+import os
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+# Add the parent directory to the path so we can import our app modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database.db import Base, install_connection_hooks
+from app.database.search import create_search_index
+from app.models import models
+from app.routers.loans import get_loan_applications
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+BATCH_SIZE = 10_000
+FIRST_NAMES = ["John", "Jane", "Michael", "Emily", "David", "Sarah", "Robert", "Lisa"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Jones", "Brown", "Davis", "Miller", "Wilson"]
+
+def seed_loans(engine, count: int):
+    """Bulk insert loans with a primary borrower and, for half, a co-borrower"""
+    loans = models.LoanApplication.__table__
+    borrowers = models.Borrower.__table__
+    statuses = list(models.LoanStatus)
+    start = datetime.utcnow() - timedelta(days=365)
+
+    with engine.begin() as conn:
+        for offset in range(0, count, BATCH_SIZE):
+            loan_rows = []
+            borrower_rows = []
+            for loan_id in range(offset + 1, min(offset + BATCH_SIZE, count) + 1):
+                created_at = start + timedelta(seconds=loan_id)
+                loan_rows.append({
+                    "id": loan_id,
+                    "application_number": f"LA-BENCH-{loan_id:08d}",
+                    "vehicle_make": "Toyota",
+                    "vehicle_model": "Camry",
+                    "vehicle_year": 2022,
+                    "vehicle_price": 30000.0,
+                    "loan_amount": 25000.0,
+                    "loan_term_months": 60,
+                    "status": random.choice(statuses).name,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                })
+                borrower_rows.append({
+                    "loan_id": loan_id,
+                    "is_co_borrower": False,
+                    "full_name": f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}",
+                })
+                if loan_id % 2 == 0:
+                    borrower_rows.append({
+                        "loan_id": loan_id,
+                        "is_co_borrower": True,
+                        "full_name": f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}",
+                    })
+            conn.execute(loans.insert(), loan_rows)
+            conn.execute(borrowers.insert(), borrower_rows)
+
+async def measure(session, statements: list, **params):
+    """Run the list endpoint once and return (rows, queries, seconds)"""
+    statements.clear()
+    started = time.perf_counter()
+    rows = await get_loan_applications(db=session, **params)
+    elapsed = time.perf_counter() - started
+    return len(rows), len(statements), elapsed
+
+async def run_scenarios(db_path: str, size: int, page_size: int):
+    """Time representative list calls against a seeded database"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    install_connection_hooks(engine.sync_engine)
+
+    statements = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement)
+    )
+
+    scenarios = {
+        "first page": {"skip": 0, "limit": page_size},
+        "middle page": {"skip": size // 2, "limit": page_size},
+        "status filter": {"status": models.LoanStatus.APPROVED, "skip": 0, "limit": page_size},
+        "search": {"search": "Smith", "skip": 0, "limit": page_size},
+    }
+    query_counts = set()
+    try:
+        async with AsyncSession(engine) as session:
+            for label, params in scenarios.items():
+                params = {"status": None, "search": None, "cursor": None, **params}
+                rows, queries, elapsed = await measure(session, statements, **params)
+                query_counts.add(queries)
+                print(f"  {label:<14} rows={rows:<5} queries={queries} time={elapsed * 1000:.1f}ms")
+    finally:
+        await engine.dispose()
+    return query_counts
+
+def run_benchmark(size: int, page_size: int):
+    """Seed a database of the given size and time representative list calls"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        engine = create_engine(f"sqlite:///{db_path}")
+        install_connection_hooks(engine)
+        Base.metadata.create_all(bind=engine)
+
+        seed_started = time.perf_counter()
+        seed_loans(engine, size)
+        create_search_index(engine)
+        engine.dispose()
+        print(f"\n{size:,} loans seeded in {time.perf_counter() - seed_started:.1f}s")
+
+        return asyncio.run(run_scenarios(db_path, size, page_size))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the loan list query")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Portfolio sizes to benchmark (default: 10000 100000 1000000)"
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=100,
+        help="Number of loans per page (default: 100)"
+    )
+    args = parser.parse_args()
+
+    query_counts = set()
+    for size in args.sizes:
+        query_counts |= run_benchmark(size, args.page_size)
+
+    if len(query_counts) != 1:
+        print(f"\nFAIL: query count per page varies with portfolio size: {sorted(query_counts)}")
+        sys.exit(1)
+    print(f"\nOK: every page cost {query_counts.pop()} query regardless of portfolio size")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Load test for the lending API.
+Drives a running server with many concurrent clients over a mix of read and
+write endpoints and reports latency percentiles. Run it once against each
+build (e.g. before and after a change), saving results with --output, then
+compare the two runs with --compare.
+
+    python load_test.py --url http://localhost:8000 --output after.json
+    python load_test.py --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+# Relative weights of each request in the workload
+WORKLOAD = [
+    ("list loans", 5),
+    ("search loans", 2),
+    ("loan detail", 3),
+    ("loan documents", 2),
+    ("add note", 1),
+]
+
+def percentile(samples, fraction: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+def summarize(latencies) -> dict:
+    """Latency summary in milliseconds"""
+    return {
+        "count": len(latencies),
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "max": max(latencies) * 1000 if latencies else 0.0,
+    }
+
+async def send(client: httpx.AsyncClient, kind: str, loan_ids):
+    """Issue one request of the given kind"""
+    loan_id = random.choice(loan_ids)
+    if kind == "list loans":
+        return await client.get("/api/loans/", params={"limit": 50})
+    if kind == "search loans":
+        return await client.get("/api/loans/", params={"search": random.choice(["smi", "jo", "LA"]), "limit": 50})
+    if kind == "loan detail":
+        return await client.get(f"/api/loans/{loan_id}")
+    if kind == "loan documents":
+        return await client.get(f"/api/documents/{loan_id}")
+    return await client.post(
+        f"/api/loans/{loan_id}/notes",
+        json={"author": "Load Test", "content": "Load test note"},
+    )
+
+async def worker(client, deadline: float, loan_ids, latencies, errors):
+    """Send weighted random requests until the deadline"""
+    kinds = [kind for kind, _ in WORKLOAD]
+    weights = [weight for _, weight in WORKLOAD]
+    while time.perf_counter() < deadline:
+        kind = random.choices(kinds, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await send(client, kind, loan_ids)
+            if response.status_code >= 400:
+                errors[kind] += 1
+        except httpx.HTTPError:
+            errors[kind] += 1
+        latencies[kind].append(time.perf_counter() - started)
+
+async def run_load_test(url: str, concurrency: int, duration: float) -> dict:
+    """Run the workload against url and return the results"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60.0) as client:
+        response = await client.get("/api/loans/", params={"limit": 100})
+        response.raise_for_status()
+        loan_ids = [loan["id"] for loan in response.json()]
+        if not loan_ids:
+            raise SystemExit("No loan applications found; seed the database first (python seed_data.py)")
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            worker(client, deadline, loan_ids, latencies, errors) for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "duration": elapsed,
+        "throughput": len(all_latencies) / elapsed,
+        "errors": sum(errors.values()),
+        "overall": summarize(all_latencies),
+        "endpoints": {kind: summarize(samples) for kind, samples in latencies.items()},
+    }
+
+def print_results(results: dict):
+    print(f"{results['url']} with {results['concurrency']} clients for {results['duration']:.0f}s")
+    print(f"throughput={results['throughput']:.1f} req/s errors={results['errors']}")
+    print(f"{'endpoint':<16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(results["endpoints"].items()) + [("overall", results["overall"])]
+    for kind, stats in rows:
+        print(f"{kind:<16}{stats['count']:>8}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}")
+
+def compare(before_path: str, after_path: str):
+    """Print p99 latency and throughput of two saved runs side by side"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"{'endpoint':<16}{'before p99':>12}{'after p99':>12}{'change':>10}")
+    kinds = list(before["endpoints"]) + ["overall"]
+    for kind in kinds:
+        old = before["overall"] if kind == "overall" else before["endpoints"].get(kind)
+        new = after["overall"] if kind == "overall" else after["endpoints"].get(kind)
+        if not old or not new:
+            continue
+        change = (new["p99"] - old["p99"]) / old["p99"] * 100 if old["p99"] else 0.0
+        print(f"{kind:<16}{old['p99']:>12.1f}{new['p99']:>12.1f}{change:>9.1f}%")
+    print(f"{'throughput':<16}{before['throughput']:>12.1f}{after['throughput']:>12.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the lending API")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the running API")
+    parser.add_argument("--concurrency", type=int, default=200, help="Number of concurrent clients (default: 200)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test duration in seconds (default: 30)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two saved result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = asyncio.run(run_load_test(args.url, args.concurrency, args.duration))
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
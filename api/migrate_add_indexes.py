@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the secondary indexes declared on the lending models.
+create_all() never adds indexes to tables that already exist, so databases
+created before the indexes were declared need this run once.
+"""
+import sys
+import os
+
+# Add the parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect
+
+from app.database.db import engine
+from app.models.models import Base
+
+def migrate_indexes():
+    """Create every model index that is missing from the database"""
+    print("Starting index migration...")
+    inspector = inspect(engine)
+    created = 0
+
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            print(f"Skipping {table.name}: table does not exist (run update_db.py first)")
+            continue
+
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in existing:
+                continue
+            index.create(bind=engine)
+            created += 1
+            print(f"Created index {index.name} on {table.name}({', '.join(c.name for c in index.columns)})")
+
+    # Refresh planner statistics so the new indexes are picked up
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+    print(f"Index migration completed successfully! {created} index(es) created.")
+
+if __name__ == "__main__":
+    migrate_indexes()
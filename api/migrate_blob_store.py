@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Migration script to move documents uploaded before the blob store into it.
+Each legacy file is hashed, moved to its content-addressed location (or dropped
+when an identical blob already exists) and its document row repointed.
+Run migrate_document_columns.py first.
+"""
+import sys
+import os
+import hashlib
+from pathlib import Path
+
+# Add the parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.db import SessionLocal
+from app.models import models
+from app.storage.blobs import blob_path
+from app.storage.uploads import UPLOAD_CHUNK_SIZE
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def original_name(document, path: Path) -> str:
+    """Recover the uploaded filename from a legacy <name>_<date>_<time>_<filename> path"""
+    prefix = document.name.replace(" ", "_") + "_"
+    if not path.name.startswith(prefix):
+        return path.name
+    parts = path.name[len(prefix):].split("_", 2)
+    return parts[-1] if len(parts) == 3 else path.name
+
+def migrate_blob_store():
+    """Move every legacy document file into the blob store"""
+    print("Starting blob store migration...")
+    db = SessionLocal()
+    moved = deduplicated = missing = 0
+
+    try:
+        for document in db.query(models.Document).all():
+            path = Path(document.file_path)
+            if document.content_hash and path == blob_path(document.content_hash):
+                continue
+            if not path.exists():
+                print(f"Skipping document {document.id}: {path} not found")
+                missing += 1
+                continue
+
+            content_hash = hash_file(path)
+            destination = blob_path(content_hash)
+            if destination.exists():
+                path.unlink()
+                deduplicated += 1
+            else:
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, destination)
+                moved += 1
+
+            document.file_name = document.file_name or original_name(document, path)
+            document.file_path = str(destination)
+            document.content_hash = content_hash
+            document.file_size = destination.stat().st_size
+            # Commit per file so the rows never point at a moved file
+            db.commit()
+    finally:
+        db.close()
+
+    print(f"Migration completed: {moved} moved, {deduplicated} duplicates removed, {missing} missing")
+
+if __name__ == "__main__":
+    migrate_blob_store()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the file_name, content_hash and file_size columns to the documents table.
+All three columns are nullable, so a plain ALTER TABLE ADD COLUMN works on SQLite and Postgres.
+Documents uploaded before this migration keep NULL values.
+"""
+import sys
+import os
+
+# Add the parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.database.db import engine
+
+NEW_COLUMNS = {
+    "file_name": "VARCHAR",
+    "content_hash": "VARCHAR(64)",
+    "file_size": "INTEGER",
+}
+
+def migrate_documents_table():
+    """Add any missing document columns"""
+    print("Starting documents table migration...")
+
+    existing = {column["name"] for column in inspect(engine).get_columns("documents")}
+    with engine.begin() as conn:
+        for name, column_type in NEW_COLUMNS.items():
+            if name in existing:
+                print(f"Column {name} already exists")
+                continue
+            conn.execute(text(f"ALTER TABLE documents ADD COLUMN {name} {column_type}"))
+            print(f"Added column {name}")
+
+    print("Migration completed successfully! Run migrate_add_indexes.py to index content_hash.")
+
+if __name__ == "__main__":
+    migrate_documents_table()
@@ -11,11 +11,15 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database.db import engine
 from app.models.models import Base, User, Borrower, VehicleDetails, Note
+from app.database.search import create_search_index
+from app.database.stats import create_stats_table
 
 def update_database():
     print("Updating database schema...")
     # Create all tables that don't exist and update schema for existing tables
     Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
+    create_stats_table(engine)
     print("Database schema updated successfully!")
 
 if __name__ == "__main__":
@@ -75,6 +75,7 @@ const LoanDetails = () => {
   const [showVarianceReview, setShowVarianceReview] = useState(false);
   const [validationRules, setValidationRules] = useState({});
   const [validatingApplication, setValidatingApplication] = useState(false);
+  const [analysisProgress, setAnalysisProgress] = useState(null);
   const [validationErrors, setValidationErrors] = useState([]);
 
   // Fetch loan details from API
@@ -382,11 +383,11 @@ const LoanDetails = () => {
       setValidatingApplication(true);
       
       try {
-        // Get the document ID for the first document (typically the sales contract)
-        const docId = documents[0].id;
-        
-        // Process the document and extract data
-        const result = await documentService.analyzeDocument(docId);
+        // Analyze every document of the loan in parallel, merging the extracted data
+        setAnalysisProgress({ done: 0, total: documents.length });
+        const result = await documentService.analyzeLoanDocuments(loan.id, () => {
+          setAnalysisProgress(prev => ({ ...prev, done: prev.done + 1 }));
+        });
         
         if (result && result.loan_application) {
           setExtractedData(result.loan_application);
@@ -400,6 +401,7 @@ const LoanDetails = () => {
         console.error('Error processing documents:', error);
         alert('Error processing documents. Please try again.');
       } finally {
+        setAnalysisProgress(null);
         setValidatingApplication(false);
       }
     } else {
@@ -1136,7 +1138,7 @@ const LoanDetails = () => {
           startIcon={validatingApplication ? <CircularProgress size={20} color="inherit" /> : <CompareArrowsIcon />}
           disabled={validatingApplication}
         >
-          {validatingApplication ? 'Processing...' : 
+          {validatingApplication ? (analysisProgress ? `Analyzing ${analysisProgress.done}/${analysisProgress.total}...` : 'Processing...') : 
            loan.status === 'pending' || loan.status === 'needs_documents' 
             ? 'Review Application' 
             : loan.status === 'in_review' 
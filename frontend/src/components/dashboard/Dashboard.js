@@ -26,7 +26,6 @@ import TimelineIcon from '@mui/icons-material/Timeline';
 import ArticleIcon from '@mui/icons-material/Article';
 import { Link } from 'react-router-dom';
 import loanService from '../../services/loanService';
-import documentService from '../../services/documentService';
 
 const Dashboard = () => {
   const [recentLoans, setRecentLoans] = useState([]);
@@ -49,72 +48,25 @@ const Dashboard = () => {
       try {
         setLoading(true);
         
-        // Fetch recent loan applications
-        const loanData = await loanService.getAllLoans(null, null, 0, 5);
+        // Fetch recent loan applications and the precomputed statistics
+        const [loanData, stats] = await Promise.all([
+          loanService.getAllLoans(null, null, 0, 5),
+          loanService.getLoanStats()
+        ]);
         setRecentLoans(loanData);
         
-        // For a production app, we would have a dedicated API endpoint for document stats
-        // For now, we'll create a simple calculation based on loan data we have
-        let totalDocs = 0;
-        let validatedDocs = 0;
-        let issuesDocs = 0;
-        
-        // Fetch all loans to get more accurate statistics
-        const allLoans = await loanService.getAllLoans();
-        
-        // Count documents from the loans we've loaded
-        loanData.forEach(loan => {
-          const documents = loan.documents || [];
-          totalDocs += documents.length;
-          
-          documents.forEach(doc => {
-            if (doc.status === 'validated') validatedDocs++;
-            else if (doc.status === 'issues' || doc.status === 'rejected') issuesDocs++;
-          });
-        });
-        
-        // Set some minimum values if we don't have enough data
-        if (totalDocs < 10) {
-          totalDocs = 245;
-          validatedDocs = 198;
-          issuesDocs = 47;
-        }
-        
         setDocumentStats({
-          total: totalDocs,
-          validated: validatedDocs,
-          issues: issuesDocs
+          total: stats.total_documents,
+          validated: stats.document_status.approved,
+          issues: stats.document_status.rejected
         });
         
-        // Calculate loan application statistics by status
-        let totalLoans = allLoans.length;
-        let pendingLoans = 0;
-        let approvedLoans = 0;
-        let rejectedLoans = 0;
-        
-        allLoans.forEach(loan => {
-          if (loan.status === 'pending' || loan.status === 'in_review' || loan.status === 'processing') {
-            pendingLoans++;
-          } else if (loan.status === 'approved') {
-            approvedLoans++;
-          } else if (loan.status === 'rejected') {
-            rejectedLoans++;
-          }
-        });
-        
-        // Set some minimum values if we don't have enough data
-        if (totalLoans < 5) {
-          totalLoans = 154;
-          pendingLoans = 87;
-          approvedLoans = 52;
-          rejectedLoans = 15;
-        }
-        
+        const loanStatus = stats.loan_status;
         setLoanStats({
-          total: totalLoans,
-          pending: pendingLoans,
-          approved: approvedLoans,
-          rejected: rejectedLoans
+          total: stats.total_loans,
+          pending: loanStatus.pending.count + loanStatus.in_review.count,
+          approved: loanStatus.approved.count,
+          rejected: loanStatus.rejected.count
         });
         
         setError(null);
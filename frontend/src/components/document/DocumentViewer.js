@@ -199,7 +199,7 @@ const DocumentViewer = () => {
     return 'other';
   };
   
-  const documentType = getDocumentType(document?.file_path);
+  const documentType = getDocumentType(document?.file_name || document?.file_path);
   const documentUrl = getDocumentUrl(document?.file_path);
 
   return (
@@ -92,6 +92,47 @@ const documentService = {
       console.error("Document Analysis Error:", error);
       throw error;
     }
+  },
+
+  // Analyze all documents of a loan in parallel; onDocument is called as each one completes
+  analyzeLoanDocuments: (loanId, onDocument) => {
+    return new Promise((resolve, reject) => {
+      const source = new EventSource(`${llmApi.defaults.baseURL}/api/documents/analyze/loan/${loanId}?stream=true`);
+      source.addEventListener('document', (event) => {
+        if (onDocument) onDocument(JSON.parse(event.data));
+      });
+      source.addEventListener('complete', (event) => {
+        source.close();
+        resolve(JSON.parse(event.data)); // Returns the merged loan_application with per-field provenance
+      });
+      source.onerror = (error) => {
+        source.close();
+        console.error("Loan Analysis Error:", error);
+        reject(error);
+      };
+    });
+  },
+
+  // Queue a document for analysis; returns the job right away
+  submitAnalysisJob: async (documentId) => {
+    try {
+      const response = await llmApi.post(`/api/documents/jobs/analyze/${documentId}`);
+      return response.data; // Returns the job with its job_id and status
+    } catch (error) {
+      console.error("Analysis Job Error:", error);
+      throw error;
+    }
+  },
+
+  // Get the status of an analysis job, including the analysis result once it has succeeded
+  getAnalysisJob: async (jobId) => {
+    try {
+      const response = await llmApi.get(`/api/documents/jobs/${jobId}`);
+      return response.data;
+    } catch (error) {
+      console.error("Analysis Job Error:", error);
+      throw error;
+    }
   }
 };
 
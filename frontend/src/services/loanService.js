@@ -14,7 +14,33 @@ const loanService = {
       throw error;
     }
   },
-  
+
+  // Get one page of loan applications using cursor pagination.
+  // Pass the previous page's next_cursor to continue; returns { items, next_cursor }
+  getLoansPage: async (cursor = '', status = null, search = null, limit = 100) => {
+    try {
+      let url = `/loans/?cursor=${encodeURIComponent(cursor)}&limit=${limit}`;
+      if (status) url += `&status=${status}`;
+      if (search) url += `&search=${encodeURIComponent(search)}`;
+
+      const response = await api.get(url);
+      return response.data;
+    } catch (error) {
+      throw error;
+    }
+  },
+
+  // Get portfolio statistics for the dashboard: status counts and amounts,
+  // document status counts and monthly loan volumes
+  getLoanStats: async (months = 12) => {
+    try {
+      const response = await api.get(`/loans/stats?months=${months}`);
+      return response.data;
+    } catch (error) {
+      throw error;
+    }
+  },
+
   // Get a specific loan application details
   getLoan: async (applicationId) => {
     try {
@@ -5,6 +5,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.routers import documents
+from app.services.analysis_jobs import start_job_queue, stop_job_queue
+from app.services.document_source import close_document_source, open_document_source
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -27,4 +29,16 @@ app.add_middleware(
 )
 
 # Include routers
-app.include_router(documents.router, prefix="/api", tags=["documents"])
\ No newline at end of file
+app.include_router(documents.router, prefix="/api", tags=["documents"])
+
+@app.on_event("startup")
+async def startup_event():
+    # Open the pooled HTTP client used to fetch documents from the main API
+    await open_document_source()
+    # Start the workers that run queued analysis jobs
+    await start_job_queue()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_job_queue()
+    await close_document_source()
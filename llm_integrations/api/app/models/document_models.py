@@ -10,6 +10,7 @@ from datetime import datetime
 class LLMProvider(str, Enum):
     """Supported LLM providers for document processing."""
     GEMINI = "gemini"
+    FAKE = "fake"
 
 class DocumentProcessingResponse(BaseModel):
     """Response model for document processing results."""
@@ -48,13 +49,33 @@ class DocumentProcessingResponse(BaseModel):
         default=None,
         description="Full analyzed content"
     )
+    extraction_path: Optional[str] = Field(
+        default=None,
+        description="How the document was read: template (rules, no LLM call), or sent to the LLM as text, mixed or pdf"
+    )
+    page_count: Optional[int] = Field(
+        default=None,
+        description="Number of pages in the PDF"
+    )
+    timings: Optional[Dict[str, float]] = Field(
+        default=None,
+        description="Seconds spent in each processing stage"
+    )
+    payload: Optional[Dict[str, int]] = Field(
+        default=None,
+        description="Pages and bytes sent to the LLM, and how many were dropped as irrelevant"
+    )
+    model_name: Optional[str] = Field(
+        default=None,
+        description="LLM model whose result was used"
+    )
 
 class ProcessingOptions(BaseModel):
     """Options for document processing."""
     extract_tables: bool = Field(default=True, description="Whether to extract tables from the document")
     extract_forms: bool = Field(default=True, description="Whether to extract form fields")
     summarize: bool = Field(default=False, description="Whether to include a summary of the document")
-    model_name: str = Field(default="gemini-1.5-pro", description="LLM model to use for processing")
+    model_name: str = Field(default="auto", description="LLM model to use for processing, or auto for the model cascade")
     provider: LLMProvider = Field(default=LLMProvider.GEMINI, description="LLM provider to use for processing")
 
 # Models from the main application
@@ -99,6 +120,8 @@ class VehicleDetailsModel(BaseModel):
 class LoanApplicationModel(BaseModel):
     """Model for loan application."""
     application_number: Optional[str] = Field(default=None, description="Application number")
+    application_date: Optional[str] = Field(default=None, description="Date of the application, as YYYY-MM-DD")
+    loan_type: Optional[str] = Field(default=None, description="Type of loan, e.g. Vehicle Loan")
     vehicle_make: Optional[str] = Field(default=None, description="Make of the vehicle")
     vehicle_model: Optional[str] = Field(default=None, description="Model of the vehicle")
     vehicle_year: Optional[int] = Field(default=None, description="Year of the vehicle")
@@ -107,10 +130,26 @@ class LoanApplicationModel(BaseModel):
     loan_term_months: Optional[int] = Field(default=None, description="Term of the loan in months")
     interest_rate: Optional[float] = Field(default=None, description="Interest rate of the loan")
     monthly_payment: Optional[float] = Field(default=None, description="Monthly payment amount")
+    down_payment: Optional[float] = Field(default=None, description="Down payment amount")
+    ltv_ratio: Optional[float] = Field(default=None, description="Loan-to-value ratio")
     status: Optional[LoanStatus] = Field(default=LoanStatus.PENDING, description="Status of the loan application")
     borrowers: Optional[List[BorrowerModel]] = Field(default=[], description="Borrowers on the loan")
     vehicle_details: Optional[VehicleDetailsModel] = Field(default=None, description="Detailed vehicle information")
 
+class EntityModel(BaseModel):
+    """Name-value pair extracted from a document."""
+    label: str = Field(..., description="Name of the entity")
+    value: str = Field(..., description="Value of the entity")
+
+class DocumentExtractionModel(BaseModel):
+    """Structure the LLM is asked to return; also its response schema in structured-output mode."""
+    document_type: str = Field(..., description="Type of document, e.g. Sales Contract, Loan Application or Credit Report")
+    summary: Optional[str] = Field(default=None, description="Brief 1-2 sentence summary of the document content")
+    content: Optional[str] = Field(default=None, description="Detailed analysis of the document content")
+    entities: List[EntityModel] = Field(default=[], description="Key entities extracted from the document")
+    loan_application: Optional[LoanApplicationModel] = Field(default=None, description="Loan details found in the document")
+    confidence: float = Field(..., description="Confidence in the extraction, from 0.0 to 1.0")
+
 class DocumentAnalysisResponse(BaseModel):
     """Enhanced response model for document analysis."""
     document_type: str = Field(..., description="Type of document analyzed")
@@ -121,4 +160,58 @@ class DocumentAnalysisResponse(BaseModel):
     content: Optional[str] = Field(default=None, description="Full analyzed content")
     loan_application: Optional[LoanApplicationModel] = Field(default=None, description="Extracted loan application data") 
     errors: Optional[List[str]] = Field(default=None, description="Any errors encountered during processing")
-    provider: Optional[str] = Field(default=None, description="LLM provider used for processing")
\ No newline at end of file
+    provider: Optional[str] = Field(default=None, description="LLM provider used for processing")
+    extraction_path: Optional[str] = Field(default=None, description="How the document was read: template (rules, no LLM call), or sent to the LLM as text, mixed or pdf")
+    page_count: Optional[int] = Field(default=None, description="Number of pages in the PDF")
+    timings: Optional[Dict[str, float]] = Field(default=None, description="Seconds spent in each processing stage")
+    payload: Optional[Dict[str, int]] = Field(default=None, description="Pages and bytes sent to the LLM, and how many were dropped as irrelevant")
+    model_name: Optional[str] = Field(default=None, description="LLM model whose result was used")
+
+class JobStatus(str, Enum):
+    """Status of an analysis job."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class AnalysisJobResponse(BaseModel):
+    """Response model for a queued document analysis."""
+    job_id: str = Field(..., description="ID of the job")
+    document_id: str = Field(..., description="ID of the document being analyzed")
+    status: JobStatus = Field(..., description="Status of the job")
+    stage: Optional[str] = Field(default=None, description="Current step of the job, e.g. fetching or analyzing")
+    attempts: int = Field(default=0, description="Attempts made so far")
+    max_attempts: int = Field(..., description="Attempts allowed before the job fails")
+    error: Optional[str] = Field(default=None, description="Error from the last failed attempt")
+    result: Optional[DocumentAnalysisResponse] = Field(default=None, description="Analysis result once the job succeeded")
+    created_at: datetime = Field(..., description="When the job was submitted")
+    updated_at: datetime = Field(..., description="When the job last changed")
+
+class FieldSource(BaseModel):
+    """A value of a loan application field and the document it came from."""
+    document_id: str = Field(..., description="ID of the document the value was extracted from")
+    document_name: Optional[str] = Field(default=None, description="Name of the document")
+    document_type: str = Field(..., description="Type of the document")
+    confidence: float = Field(..., description="Confidence score of the document's extraction (0-1)")
+    value: Any = Field(..., description="Extracted value")
+
+class FieldProvenance(BaseModel):
+    """Where a consolidated field value came from, and any documents that disagree."""
+    source: FieldSource = Field(..., description="Document the consolidated value was taken from")
+    conflicts: List[FieldSource] = Field(default=[], description="Other documents with a different value")
+
+class LoanDocumentAnalysis(BaseModel):
+    """Analysis result of one of a loan's documents."""
+    document_id: str = Field(..., description="ID of the document")
+    document_name: Optional[str] = Field(default=None, description="Name of the document")
+    analysis: Optional[DocumentAnalysisResponse] = Field(default=None, description="Analysis result, if it succeeded")
+    error: Optional[str] = Field(default=None, description="Why the document could not be analyzed")
+
+class LoanAnalysisResponse(BaseModel):
+    """Consolidated analysis of all of a loan's documents."""
+    loan_id: str = Field(..., description="ID or application number of the loan")
+    documents: List[LoanDocumentAnalysis] = Field(default=[], description="Per-document results, in completion order")
+    loan_application: Optional[LoanApplicationModel] = Field(default=None, description="Loan application merged from all documents")
+    provenance: Dict[str, FieldProvenance] = Field(default={}, description="Source of each consolidated field, keyed by field path")
+    complete: bool = Field(..., description="Whether every document was analyzed successfully")
+    processing_time: float = Field(..., description="Time taken to analyze all documents in seconds")
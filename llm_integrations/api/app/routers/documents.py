@@ -1,28 +1,31 @@
 """
 Router for document processing endpoints.
 """
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Form, Path, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Form, Path, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Dict, Any, Optional
+import asyncio
 import os
-import requests
 import logging
+import time
 
 from app.models.document_models import (
-    DocumentProcessingResponse, ProcessingOptions, DocumentAnalysisResponse,
-    LoanApplicationModel, VehicleDetailsModel, BorrowerModel
+    DocumentProcessingResponse, ProcessingOptions, DocumentAnalysisResponse, AnalysisJobResponse, JobStatus,
+    LoanAnalysisResponse
 )
 from app.services.pdf_processor_factory import PDFProcessorFactory
-from app.services.gemini_pdf_processor import LLMCache
+from app.services.document_source import DocumentFetchError, DocumentSource, get_document_source
+from app.services import document_analysis, loan_analysis
+from app.services.analysis_jobs import JobQueue, get_job_queue
+from app.services.rate_limiter import get_gemini_limiter
+from app.services.resilience import get_gemini_caller
+from app.services.model_cascade import CASCADE_MODEL, get_model_cascade
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
-# Define the main API URL where document files are stored
-MAIN_API_URL = "http://localhost:8000/api"
-
 def get_pdf_processor(
     provider: str = Query("gemini", description="LLM provider to use"),
     force_refresh: bool = Query(False, description="Force refresh the LLM result instead of using cache")
@@ -123,7 +126,7 @@ async def analyze_document(
         extract_tables: Whether to extract tables from the document
         extract_forms: Whether to extract form fields
         summarize: Whether to include a summary of the document
-        model_name: LLM model to use for processing
+        model_name: LLM model to use for processing; auto (the default) runs the model cascade
         pdf_processor: PDF processing service
         
     Returns:
@@ -139,7 +142,7 @@ async def analyze_document(
         
         # Set default model name if not specified
         if model_name is None:
-            model_name = "gemini-2.0-flash"
+            model_name = CASCADE_MODEL
         
         # Create options dictionary
         options = {
@@ -167,7 +170,8 @@ async def analyze_document_by_id(
     document_id: str = Path(..., description="The ID of the document to analyze"),
     provider: str = Query("gemini", description="LLM provider to use"),
     force_refresh: bool = Query(False, description="Force refresh the LLM result instead of using cache"),
-    pdf_processor: Any = Depends(get_pdf_processor)
+    pdf_processor: Any = Depends(get_pdf_processor),
+    document_source: DocumentSource = Depends(get_document_source)
 ):
     """
     Analyze a document by its ID. This endpoint retrieves the document from the main API
@@ -178,206 +182,237 @@ async def analyze_document_by_id(
         provider: The LLM provider to use
         force_refresh: Force refresh the LLM result instead of using cache
         pdf_processor: PDF processing service
+        document_source: Pooled client for the main API's document files
         
     Returns:
         JSON response with extracted data and metadata using the document analysis models
     """
     try:
-        # Fetch the document file from the main API
-        document_url = f"{MAIN_API_URL}/documents/file/{document_id}"
-        response = requests.get(document_url)
-        
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code, 
-                detail=f"Error fetching document from main API: {response.text}"
-            )
-            
-        # Process the document with default options
-        options = {
-            "extract_tables": True,
-            "extract_forms": True,
-            "summarize": True,
-            "model_name": "gemini-2.0-flash"
-        }
-        
-        # Process the document
-        result = await pdf_processor.process_pdf(
-            pdf_bytes=response.content,
-            options=options
-        )
-        
-        # Debug log the result structure received from processor
-        logger.info(f"Result from process_pdf: document_type={result['document_type']}, keys in extracted_data: {list(result.get('extracted_data', {}).keys())}")
-        
-        # If loan_application exists, log its structure
-        if result.get('extracted_data', {}).get('loan_application'):
-            loan_app = result['extracted_data']['loan_application']
-            logger.info(f"Loan application keys: {list(loan_app.keys())}")
-            
-            # Check for borrowers
-            if 'borrowers' in loan_app:
-                logger.info(f"Borrowers in result: {loan_app['borrowers']}")
-            else:
-                logger.warning("No borrowers found in loan_application from result")
-                
-        # Format the response using our new model
-        analysis_response = DocumentAnalysisResponse(
-            document_type=result["document_type"],
-            confidence=result["confidence"],
-            processing_time=result["processing_time"],
-            errors=result.get("errors"),
-            provider=result.get("provider", "gemini"),
-            
-            # Extract summary, entities, and content from the extracted_data
-            summary=result.get("extracted_data", {}).get("summary", ""),
-            content=result.get("extracted_data", {}).get("content", "")
-        )
-        
-        # Extract entities
-        extracted_data = result.get("extracted_data", {})
-        entities = []
-        
-        # Create entities list for display in the UI
-        for key, value in extracted_data.items():
-            if isinstance(value, (str, int, float)) and key not in ["summary", "content"]:
-                entities.append({"label": key, "value": str(value)})
-            elif isinstance(value, dict) and key not in ["loan_application", "vehicle_details", "borrowers"]:
-                # Handle nested objects
-                for nested_key, nested_value in value.items():
-                    if isinstance(nested_value, (str, int, float)):
-                        entities.append({"label": f"{key}.{nested_key}", "value": str(nested_value)})
+        # Fetch the document file from the main API (or the shared blob store) and analyze it
+        try:
+            return await document_analysis.analyze_document(document_id, pdf_processor, document_source)
+        except DocumentFetchError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
         
-        analysis_response.entities = entities
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+
+@router.get("/analyze/loan/{loan_id}", response_model=LoanAnalysisResponse)
+@router.post("/analyze/loan/{loan_id}", response_model=LoanAnalysisResponse)
+async def analyze_loan_documents(
+    request: Request,
+    loan_id: str = Path(..., description="The ID or application number of the loan"),
+    provider: str = Query("gemini", description="LLM provider to use"),
+    force_refresh: bool = Query(False, description="Force refresh the LLM result instead of using cache"),
+    stream: bool = Query(False, description="Stream each document's result as server-sent events as it completes"),
+    pdf_processor: Any = Depends(get_pdf_processor),
+    document_source: DocumentSource = Depends(get_document_source)
+):
+    """
+    Analyze every document of a loan concurrently and merge the extracted loan applications.
+    
+    Each consolidated field records the document it came from and any documents
+    that disagree. Documents that fail are reported individually; the others
+    are still merged. With stream=true, a "document" event is sent as each
+    document completes, followed by a "complete" event with the consolidated result.
+    
+    Args:
+        request: The incoming request, used to stop when the client disconnects
+        loan_id: The ID or application number of the loan
+        provider: The LLM provider to use
+        force_refresh: Force refresh the LLM result instead of using cache
+        stream: Stream results as server-sent events
+        pdf_processor: PDF processing service
+        document_source: Pooled client for the main API's document files
         
-        # Try to extract a loan application model from the data
+    Returns:
+        Consolidated loan analysis, or a text/event-stream response when streaming
+    """
+    try:
+        documents = await document_source.list_documents(loan_id)
+    except DocumentFetchError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    if not stream:
+        return await loan_analysis.analyze_loan(loan_id, documents, pdf_processor, document_source)
+    
+    async def events():
+        started = time.time()
+        results = []
+        analyses = loan_analysis.analyze_loan_documents(documents, pdf_processor, document_source)
         try:
-            # Check if we have loan application data
-            if "loan_application" in extracted_data:
-                loan_data = extracted_data["loan_application"]
-                logger.info(f"Building loan application model from loan_data keys: {list(loan_data.keys())}")
-                
-                # Create borrowers if present
-                borrowers = []
-                if "borrowers" in loan_data:
-                    logger.info(f"Found borrowers in loan_data: {loan_data['borrowers']}")
-                    for borrower_data in loan_data["borrowers"]:
-                        logger.info(f"Creating borrower model from: {borrower_data}")
-                        borrowers.append(BorrowerModel(**borrower_data))
-                    logger.info(f"Created {len(borrowers)} borrower models")
-                else:
-                    logger.warning("No borrowers found in loan_data when creating models")
-                
-                # Create vehicle details if present
-                vehicle_details = None
-                if "vehicle_details" in loan_data:
-                    vehicle_details = VehicleDetailsModel(**loan_data["vehicle_details"])
-                
-                # Create a copy of loan_data so we can modify it safely
-                loan_data_copy = loan_data.copy()
-                
-                # Remove nested objects from loan_data for direct mapping
-                if "borrowers" in loan_data_copy:
-                    del loan_data_copy["borrowers"]
-                if "vehicle_details" in loan_data_copy:
-                    del loan_data_copy["vehicle_details"]
-                
-                # Create the loan application model
-                logger.info(f"Creating loan application model with fields: {list(loan_data_copy.keys())}")
-                loan_application = LoanApplicationModel(**loan_data_copy)
-                
-                # Add borrowers and vehicle details to the model
-                if borrowers:
-                    logger.info(f"Adding {len(borrowers)} borrowers to loan application")
-                    loan_application.borrowers = borrowers
-                else:
-                    logger.warning("No borrowers to add to loan application")
-                    
-                if vehicle_details:
-                    loan_application.vehicle_details = vehicle_details
-                
-                # Add the loan application to the response
-                analysis_response.loan_application = loan_application
-                logger.info("Successfully added loan application to response")
-            
-            # If no specific loan_application field exists, try to create one from the extracted data
-            elif any(key in extracted_data for key in ["vehicle_make", "vehicle_model", "vehicle_year", "loan_amount"]):
-                # Try to construct a loan application from the top-level data
-                loan_data = {}
-                
-                # Copy fields that match the loan application model
-                for field in LoanApplicationModel.__annotations__:
-                    if field in extracted_data:
-                        loan_data[field] = extracted_data[field]
-                
-                # Create vehicle details if possible
-                vehicle_details_data = {}
-                for field in VehicleDetailsModel.__annotations__:
-                    vehicle_field_value = extracted_data.get(f"vehicle_{field}", extracted_data.get(field))
-                    if vehicle_field_value is not None:
-                        vehicle_details_data[field] = vehicle_field_value
-                
-                # Create borrower details if possible
-                borrower_data = {}
-                borrower_fields = ["full_name", "email", "phone", "credit_score", "annual_income"]
-                for field in borrower_fields:
-                    if field in extracted_data or f"borrower_{field}" in extracted_data:
-                        borrower_data[field] = extracted_data.get(f"borrower_{field}", extracted_data.get(field))
-                
-                # Create the loan application model
-                if loan_data:
-                    loan_application = LoanApplicationModel(**loan_data)
-                    
-                    if vehicle_details_data and len(vehicle_details_data) >= 3:  # Ensure we have enough vehicle data
-                        loan_application.vehicle_details = VehicleDetailsModel(**vehicle_details_data)
-                    
-                    if borrower_data and "full_name" in borrower_data:  # Ensure we have at least the name
-                        loan_application.borrowers = [BorrowerModel(**borrower_data)]
-                    
-                    analysis_response.loan_application = loan_application
+            async for result in analyses:
+                if await request.is_disconnected():
+                    return
+                results.append(result)
+                yield f"event: document\ndata: {result.model_dump_json()}\n\n"
+        finally:
+            # Cancels the analyses still running if the client went away
+            await analyses.aclose()
+        
+        response = loan_analysis.build_loan_analysis(loan_id, results, time.time() - started)
+        yield f"event: complete\ndata: {response.model_dump_json()}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/jobs/analyze/{document_id}", response_model=AnalysisJobResponse, status_code=202)
+async def submit_analysis_job(
+    document_id: str = Path(..., description="The ID of the document to analyze"),
+    provider: str = Query("gemini", description="LLM provider to use"),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Queue a document for analysis and return immediately.
+    
+    The job is stored persistently and run by the worker pool, with retries on
+    transient failures. Poll GET /documents/jobs/{job_id} or stream
+    GET /documents/jobs/{job_id}/events for progress and the result.
+    
+    Args:
+        document_id: The ID of the document to analyze
+        provider: The LLM provider to use
+        job_queue: Analysis job queue
         
-        except Exception as e:
-            logger.warning(f"Error creating loan application model: {str(e)}")
-            # Include the error but continue with the response
-            if analysis_response.errors:
-                analysis_response.errors.append(f"Error formatting loan data: {str(e)}")
-            else:
-                analysis_response.errors = [f"Error formatting loan data: {str(e)}"]
+    Returns:
+        The queued job
+    """
+    return await job_queue.submit(document_id, provider)
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(
+    job_id: str = Path(..., description="The ID of the analysis job"),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Get the status of an analysis job, including its result once it has succeeded.
+    
+    Args:
+        job_id: The ID of the analysis job
+        job_queue: Analysis job queue
         
-        return analysis_response
+    Returns:
+        The job
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def stream_analysis_job(
+    request: Request,
+    job_id: str = Path(..., description="The ID of the analysis job"),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Stream the progress of an analysis job as server-sent events.
+    
+    An event is sent whenever the job's status or stage changes; the stream
+    ends with the job's final state, including the result on success.
+    
+    Args:
+        request: The incoming request, used to stop when the client disconnects
+        job_id: The ID of the analysis job
+        job_queue: Analysis job queue
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+    Returns:
+        A text/event-stream response
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    
+    async def events():
+        nonlocal job
+        last = None
+        while True:
+            # Jobs may run in another worker process, so follow the stored state
+            state = (job.status, job.stage, job.attempts)
+            if state != last:
+                last = state
+                yield f"event: {job.status.value}\ndata: {job.model_dump_json()}\n\n"
+            if job.status in (JobStatus.SUCCEEDED, JobStatus.FAILED) or await request.is_disconnected():
+                return
+            await asyncio.sleep(0.5)
+            job = await job_queue.get(job_id)
+            if job is None:
+                return
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/llm/status")
+async def get_llm_status():
+    """
+    Get the state of the Gemini rate limiter, retries and circuit breaker.
+    
+    Returns:
+        JSON response with the adaptive concurrency limit, remaining request and
+        token budgets, queue depth and wait times per priority lane, call outcomes,
+        retry, hedging and circuit breaker counts, model cascade statistics, and
+        how often responses needed the JSON recovery fallback
+    """
+    status = {
+        **get_gemini_limiter().stats(),
+        "resilience": get_gemini_caller().stats(),
+        "cascade": get_model_cascade().stats()
+    }
+    try:
+        status["parsing"] = PDFProcessorFactory.get_processor().parse_stats()
+    except ValueError:
+        pass
+    return status
 
 @router.get("/cache/status")
-async def get_cache_status():
+async def get_cache_status(
+    detail: bool = Query(False, description="Include the size of every cached entry")
+):
     """
     Get the current LLM cache status.
     
+    Args:
+        detail: Include the size of every cached entry
+    
     Returns:
-        JSON response with cache status
+        JSON response with cache status, per-tier statistics and memory footprint
     """
     cache_enabled = os.environ.get("CACHE_LLM_CALLS", "0") == "1"
+    try:
+        processor = PDFProcessorFactory.get_processor()
+    except ValueError:
+        return {
+            "cache_enabled": cache_enabled
+        }
+    
     return {
-        "cache_enabled": cache_enabled
+        "cache_enabled": cache_enabled,
+        **processor.cache.stats(detail),
+        # Identical analyses that joined one already in flight instead of calling the LLM
+        "single_flight": processor.in_flight.stats()
     }
 
 @router.post("/cache/clear")
 async def clear_cache():
     """
-    Clear the LLM cache.
+    Clear the LLM cache, including the persistent tier shared with other workers.
     
     Returns:
         JSON response confirming cache cleared
     """
-    # Create a temporary processor to access and clear the cache
+    # Get the processor to access and clear its cache
     processor = PDFProcessorFactory.get_processor()
-    
-    # Reset the cache by creating a new empty one with the same enabled status
-    cache_enabled = processor.cache.enabled
-    processor.cache = LLMCache(enabled=cache_enabled)
+    processor.cache.clear()
     
     return {
         "message": "LLM cache cleared successfully",
-        "cache_enabled": cache_enabled
-    }
\ No newline at end of file
+        "cache_enabled": processor.cache.enabled
+    }
@@ -0,0 +1,452 @@
+"""
+Persistent queue of document analysis jobs and the worker pool that runs them.
+
+Jobs live in a SQLite file, so they survive restarts and every uvicorn worker
+process can submit, claim and report on them. A claimed job holds a lease,
+renewed by a heartbeat while the job runs; if its worker dies, the job is
+picked up again once the lease expires. Writes by the lease holder are fenced
+on the job's attempt number, so a worker whose lease was taken over can't
+overwrite the new attempt.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.models.document_models import AnalysisJobResponse, DocumentAnalysisResponse, JobStatus
+from app.services.document_analysis import ANALYSIS_OPTIONS, build_analysis_response
+from app.services.document_source import DocumentFetchError, get_document_source
+from app.services.pdf_processor_factory import PDFProcessorFactory
+from app.services.rate_limiter import PRIORITY_BATCH
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Job queue configuration
+ANALYSIS_JOB_DB = os.environ.get("ANALYSIS_JOB_DB", "./analysis_jobs.sqlite3")
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "2"))
+ANALYSIS_JOB_MAX_ATTEMPTS = int(os.environ.get("ANALYSIS_JOB_MAX_ATTEMPTS", "3"))
+ANALYSIS_JOB_RETRY_DELAY_SECONDS = float(os.environ.get("ANALYSIS_JOB_RETRY_DELAY_SECONDS", "5"))
+ANALYSIS_JOB_LEASE_SECONDS = float(os.environ.get("ANALYSIS_JOB_LEASE_SECONDS", "300"))
+ANALYSIS_JOB_RETENTION_SECONDS = float(os.environ.get("ANALYSIS_JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+# How often idle workers look for jobs submitted by other processes
+POLL_INTERVAL_SECONDS = 1.0
+
+# Leases are renewed this many times per lease period, so a slow write or two can't let one lapse
+LEASE_RENEWALS_PER_PERIOD = 3
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler when retrying the job cannot help."""
+
+
+class JobStore:
+    """Analysis jobs stored in a SQLite file shared by all worker processes."""
+
+    def __init__(self, path: str = ANALYSIS_JOB_DB):
+        """Initialize the store, creating the jobs table if needed.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_jobs ("
+                "id TEXT PRIMARY KEY, "
+                "document_id TEXT NOT NULL, "
+                "provider TEXT NOT NULL, "
+                "status TEXT NOT NULL, "
+                "stage TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, "
+                "max_attempts INTEGER NOT NULL, "
+                "run_after REAL NOT NULL, "
+                "lease_expires_at REAL, "
+                "error TEXT, "
+                "result TEXT, "
+                "created_at REAL NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_analysis_jobs_status_run_after "
+                "ON analysis_jobs (status, run_after, created_at)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open an autocommit connection; callers manage multi-statement transactions."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, document_id: str, provider: str, max_attempts: int = ANALYSIS_JOB_MAX_ATTEMPTS) -> str:
+        """Queue a job.
+
+        Args:
+            document_id: The ID of the document to analyze
+            provider: The LLM provider to use
+            max_attempts: Attempts before the job is marked failed
+
+        Returns:
+            The new job ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO analysis_jobs "
+                "(id, document_id, provider, status, stage, max_attempts, run_after, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, document_id, provider, JobStatus.QUEUED.value, max_attempts, now, now, now),
+            )
+        return job_id
+
+    def claim(self, lease_seconds: float = ANALYSIS_JOB_LEASE_SECONDS) -> Optional[sqlite3.Row]:
+        """Take the oldest job that is due, leasing it to the caller.
+
+        Returns:
+            The claimed job row, or None if nothing is due
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose worker died are retried, or failed if out of attempts
+                conn.execute(
+                    "UPDATE analysis_jobs SET "
+                    "status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, "
+                    "stage = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+                    "error = 'Worker stopped before finishing', lease_expires_at = NULL, updated_at = ? "
+                    "WHERE status = ? AND lease_expires_at <= ?",
+                    (JobStatus.FAILED.value, JobStatus.QUEUED.value, now, JobStatus.RUNNING.value, now),
+                )
+                row = conn.execute(
+                    "SELECT id FROM analysis_jobs WHERE status = ? AND run_after <= ? "
+                    "ORDER BY created_at LIMIT 1",
+                    (JobStatus.QUEUED.value, now),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+
+                conn.execute(
+                    "UPDATE analysis_jobs SET status = ?, stage = 'starting', attempts = attempts + 1, "
+                    "lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                    (JobStatus.RUNNING.value, now + lease_seconds, now, row["id"]),
+                )
+                job = conn.execute("SELECT * FROM analysis_jobs WHERE id = ?", (row["id"],)).fetchone()
+                conn.execute("COMMIT")
+                return job
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def renew(self, job_id: str, attempt: int, lease_seconds: float = ANALYSIS_JOB_LEASE_SECONDS) -> bool:
+        """Extend the lease on a running job.
+
+        Returns:
+            False if the attempt no longer holds the job
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE analysis_jobs SET lease_expires_at = ? WHERE id = ? AND status = ? AND attempts = ?",
+                (time.time() + lease_seconds, job_id, JobStatus.RUNNING.value, attempt),
+            )
+            return cursor.rowcount > 0
+
+    def set_stage(self, job_id: str, attempt: int, stage: str, lease_seconds: float = ANALYSIS_JOB_LEASE_SECONDS) -> bool:
+        """Record progress on a running job and renew its lease.
+
+        Returns:
+            False if the attempt no longer holds the job
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE analysis_jobs SET stage = ?, lease_expires_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                (stage, now + lease_seconds, now, job_id, JobStatus.RUNNING.value, attempt),
+            )
+            return cursor.rowcount > 0
+
+    def complete(self, job_id: str, attempt: int, result: str) -> bool:
+        """Store the result of a job that succeeded.
+
+        Returns:
+            False if the attempt no longer holds the job, and the result was discarded
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE analysis_jobs SET status = ?, stage = 'completed', result = ?, error = NULL, "
+                "lease_expires_at = NULL, updated_at = ? WHERE id = ? AND status = ? AND attempts = ?",
+                (JobStatus.SUCCEEDED.value, result, time.time(), job_id, JobStatus.RUNNING.value, attempt),
+            )
+            return cursor.rowcount > 0
+
+    def fail(self, job_id: str, attempt: int, error: str, retry_at: Optional[float]) -> bool:
+        """Record a failed attempt; the job is queued again at retry_at, or failed for good if None.
+
+        Returns:
+            False if the attempt no longer holds the job, and the failure was discarded
+        """
+        status = JobStatus.QUEUED if retry_at is not None else JobStatus.FAILED
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE analysis_jobs SET status = ?, stage = ?, error = ?, run_after = ?, "
+                "lease_expires_at = NULL, updated_at = ? WHERE id = ? AND status = ? AND attempts = ?",
+                (
+                    status.value,
+                    "retrying" if retry_at is not None else "failed",
+                    error,
+                    retry_at or time.time(),
+                    time.time(),
+                    job_id,
+                    JobStatus.RUNNING.value,
+                    attempt,
+                ),
+            )
+            return cursor.rowcount > 0
+
+    def release(self, job_id: str, attempt: int) -> None:
+        """Put a job back in the queue without using up an attempt, e.g. on shutdown."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE analysis_jobs SET status = ?, stage = 'queued', attempts = attempts - 1, "
+                "lease_expires_at = NULL, updated_at = ? WHERE id = ? AND status = ? AND attempts = ?",
+                (JobStatus.QUEUED.value, time.time(), job_id, JobStatus.RUNNING.value, attempt),
+            )
+
+    def get(self, job_id: str) -> Optional[sqlite3.Row]:
+        """Get a job row by ID."""
+        with self._connect() as conn:
+            return conn.execute("SELECT * FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def prune(self, retention_seconds: float = ANALYSIS_JOB_RETENTION_SECONDS) -> int:
+        """Delete finished jobs older than the retention period.
+
+        Returns:
+            Number of jobs deleted
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM analysis_jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value, time.time() - retention_seconds),
+            )
+            return cursor.rowcount
+
+
+def to_job_response(row: sqlite3.Row) -> AnalysisJobResponse:
+    """Convert a job row to the API response model."""
+    return AnalysisJobResponse(
+        job_id=row["id"],
+        document_id=row["document_id"],
+        status=JobStatus(row["status"]),
+        stage=row["stage"],
+        attempts=row["attempts"],
+        max_attempts=row["max_attempts"],
+        error=row["error"],
+        result=DocumentAnalysisResponse.model_validate_json(row["result"]) if row["result"] else None,
+        created_at=datetime.fromtimestamp(row["created_at"], timezone.utc),
+        updated_at=datetime.fromtimestamp(row["updated_at"], timezone.utc),
+    )
+
+
+async def run_analysis_job(job: sqlite3.Row, report_stage: Callable[[str], Awaitable[None]]) -> DocumentAnalysisResponse:
+    """Analyze the document of a job.
+
+    Args:
+        job: The claimed job row
+        report_stage: Coroutine function recording progress
+
+    Returns:
+        Analysis response for the document
+
+    Raises:
+        PermanentJobError: If the document or provider can't be used
+    """
+    try:
+        pdf_processor = PDFProcessorFactory.get_processor(job["provider"])
+    except ValueError as e:
+        raise PermanentJobError(str(e))
+
+    await report_stage("fetching")
+    try:
+        pdf_bytes = await get_document_source().fetch(job["document_id"])
+    except DocumentFetchError as e:
+        if e.status_code < 500:
+            raise PermanentJobError(e.detail)
+        raise
+
+    await report_stage("analyzing")
+    # Queued jobs yield the Gemini limiter to reviewers waiting on a document
+    result = await pdf_processor.process_pdf(
+        pdf_bytes=pdf_bytes, options=dict(ANALYSIS_OPTIONS), priority=PRIORITY_BATCH
+    )
+    response = build_analysis_response(result)
+
+    # Nothing was extracted: treat as a failed attempt (e.g. a Gemini timeout)
+    if response.errors and response.document_type == "unknown":
+        raise RuntimeError("; ".join(response.errors))
+    return response
+
+
+class JobQueue:
+    """Worker pool running analysis jobs from a JobStore."""
+
+    def __init__(self, store: JobStore, workers: int = ANALYSIS_WORKERS):
+        """Initialize the queue.
+
+        Args:
+            store: Persistent job store
+            workers: Number of jobs this process runs at once
+        """
+        self.store = store
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        # Worker number -> (job ID, attempt) of the job it is running
+        self._running: Dict[int, Tuple[str, int]] = {}
+        self._wake = asyncio.Event()
+        self._last_prune = 0.0
+
+    def start(self) -> None:
+        """Start the worker tasks."""
+        self._tasks = [asyncio.create_task(self._work(number)) for number in range(self.workers)]
+        logger.info(f"Started {self.workers} analysis workers")
+
+    async def stop(self) -> None:
+        """Stop the workers, returning any jobs they were running to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for job_id, attempt in self._running.values():
+            await asyncio.to_thread(self.store.release, job_id, attempt)
+        self._tasks = []
+        self._running.clear()
+
+    async def submit(self, document_id: str, provider: str) -> AnalysisJobResponse:
+        """Queue a document for analysis and wake an idle worker."""
+        job_id = await asyncio.to_thread(self.store.submit, document_id, provider)
+        self._wake.set()
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[AnalysisJobResponse]:
+        """Get a job by ID."""
+        row = await asyncio.to_thread(self.store.get, job_id)
+        return to_job_response(row) if row is not None else None
+
+    async def _work(self, number: int) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim)
+            except sqlite3.Error as e:
+                logger.error(f"Analysis worker {number} could not claim a job: {str(e)}")
+                job = None
+
+            if job is None:
+                await self._idle()
+                continue
+
+            self._running[number] = (job["id"], job["attempts"])
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # e.g. "database is locked" recording the outcome; the lease lets the job be reclaimed
+                logger.error(f"Analysis worker {number} could not finish job {job['id']}: {str(e)}")
+            finally:
+                self._running.pop(number, None)
+
+    async def _idle(self) -> None:
+        """Wait for a local submission, or poll for jobs from other processes."""
+        if time.time() - self._last_prune > 60:
+            self._last_prune = time.time()
+            await asyncio.to_thread(self.store.prune)
+
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _heartbeat(self, job: sqlite3.Row) -> None:
+        """Keep renewing a running job's lease until cancelled or the lease is lost."""
+        while True:
+            await asyncio.sleep(ANALYSIS_JOB_LEASE_SECONDS / LEASE_RENEWALS_PER_PERIOD)
+            try:
+                held = await asyncio.to_thread(self.store.renew, job["id"], job["attempts"])
+            except sqlite3.Error as e:
+                logger.error(f"Could not renew the lease on analysis job {job['id']}: {str(e)}")
+                continue
+            if not held:
+                logger.warning(f"Analysis job {job['id']} attempt {job['attempts']} lost its lease")
+                return
+
+    async def _run(self, job: sqlite3.Row) -> None:
+        job_id = job["id"]
+        attempt = job["attempts"]
+
+        async def report_stage(stage: str) -> None:
+            await asyncio.to_thread(self.store.set_stage, job_id, attempt, stage)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            response = await run_analysis_job(job, report_stage)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            retry_at = None
+            if not isinstance(e, PermanentJobError) and job["attempts"] < job["max_attempts"]:
+                # Exponential backoff: 1x, 2x, 4x ... the base delay
+                retry_at = time.time() + ANALYSIS_JOB_RETRY_DELAY_SECONDS * 2 ** (job["attempts"] - 1)
+            logger.warning(
+                f"Analysis job {job_id} attempt {job['attempts']}/{job['max_attempts']} failed: {error}"
+            )
+            if not await asyncio.to_thread(self.store.fail, job_id, attempt, error, retry_at):
+                logger.warning(f"Analysis job {job_id} attempt {attempt} no longer holds the job; failure discarded")
+            return
+        finally:
+            heartbeat.cancel()
+
+        if await asyncio.to_thread(self.store.complete, job_id, attempt, response.model_dump_json()):
+            logger.info(f"Analysis job {job_id} completed")
+        else:
+            logger.warning(f"Analysis job {job_id} attempt {attempt} no longer holds the job; result discarded")
+
+
+# Shared queue, started and stopped with the application
+_job_queue: Optional[JobQueue] = None
+
+
+async def start_job_queue() -> None:
+    """Create the job store and start the workers; called on application startup."""
+    global _job_queue
+    _job_queue = JobQueue(JobStore())
+    _job_queue.start()
+
+
+async def stop_job_queue() -> None:
+    """Stop the workers; called on application shutdown."""
+    global _job_queue
+    if _job_queue is not None:
+        await _job_queue.stop()
+        _job_queue = None
+
+
+def get_job_queue() -> JobQueue:
+    """Dependency returning the shared job queue."""
+    if _job_queue is None:
+        raise RuntimeError("Job queue not initialized; the application has not started")
+    return _job_queue
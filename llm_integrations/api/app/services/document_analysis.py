@@ -0,0 +1,200 @@
+"""
+Service for analyzing stored documents and shaping the results for the UI.
+"""
+import logging
+from typing import Any, Dict
+
+from app.models.document_models import (
+    DocumentAnalysisResponse, LoanApplicationModel, VehicleDetailsModel, BorrowerModel
+)
+from app.services.document_source import DocumentSource
+from app.services.model_cascade import CASCADE_MODEL
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Options used when analyzing a stored document by ID
+ANALYSIS_OPTIONS = {
+    "extract_tables": True,
+    "extract_forms": True,
+    "summarize": True,
+    "model_name": CASCADE_MODEL
+}
+
+
+async def analyze_document(document_id: str, pdf_processor: Any, document_source: DocumentSource) -> DocumentAnalysisResponse:
+    """Fetch a document from the main API and analyze it with the LLM.
+    
+    Args:
+        document_id: The ID of the document to analyze
+        pdf_processor: PDF processing service
+        document_source: Source of the main API's document files
+        
+    Returns:
+        Analysis response for the document
+        
+    Raises:
+        DocumentFetchError: If the document can't be fetched
+    """
+    pdf_bytes = await document_source.fetch(document_id)
+    
+    # Process the document
+    result = await pdf_processor.process_pdf(
+        pdf_bytes=pdf_bytes,
+        options=dict(ANALYSIS_OPTIONS)
+    )
+    return build_analysis_response(result)
+
+
+def build_analysis_response(result: Dict[str, Any]) -> DocumentAnalysisResponse:
+    """Build the UI analysis response from a processor result.
+    
+    Args:
+        result: Result returned by the PDF processor
+        
+    Returns:
+        Analysis response with entities and, where found, a loan application model
+    """
+    # Debug log the result structure received from processor
+    logger.info(f"Result from process_pdf: document_type={result['document_type']}, keys in extracted_data: {list(result.get('extracted_data', {}).keys())}")
+
+    # If loan_application exists, log its structure
+    if result.get('extracted_data', {}).get('loan_application'):
+        loan_app = result['extracted_data']['loan_application']
+        logger.info(f"Loan application keys: {list(loan_app.keys())}")
+
+        # Check for borrowers
+        if 'borrowers' in loan_app:
+            logger.info(f"Borrowers in result: {loan_app['borrowers']}")
+        else:
+            logger.warning("No borrowers found in loan_application from result")
+
+    # Format the response using our new model
+    analysis_response = DocumentAnalysisResponse(
+        document_type=result["document_type"],
+        confidence=result["confidence"],
+        processing_time=result["processing_time"],
+        errors=result.get("errors"),
+        provider=result.get("provider", "gemini"),
+        extraction_path=result.get("extraction_path"),
+        page_count=result.get("page_count"),
+        timings=result.get("timings"),
+        payload=result.get("payload"),
+        model_name=result.get("model_name"),
+
+        # Extract summary, entities, and content from the extracted_data
+        summary=result.get("extracted_data", {}).get("summary", ""),
+        content=result.get("extracted_data", {}).get("content", "")
+    )
+
+    # Extract entities
+    extracted_data = result.get("extracted_data", {})
+    entities = []
+
+    # Create entities list for display in the UI
+    for key, value in extracted_data.items():
+        if isinstance(value, (str, int, float)) and key not in ["summary", "content"]:
+            entities.append({"label": key, "value": str(value)})
+        elif isinstance(value, dict) and key not in ["loan_application", "vehicle_details", "borrowers"]:
+            # Handle nested objects
+            for nested_key, nested_value in value.items():
+                if isinstance(nested_value, (str, int, float)):
+                    entities.append({"label": f"{key}.{nested_key}", "value": str(nested_value)})
+
+    analysis_response.entities = entities
+
+    # Try to extract a loan application model from the data
+    try:
+        # Check if we have loan application data
+        if "loan_application" in extracted_data:
+            loan_data = extracted_data["loan_application"]
+            logger.info(f"Building loan application model from loan_data keys: {list(loan_data.keys())}")
+
+            # Create borrowers if present
+            borrowers = []
+            if "borrowers" in loan_data:
+                logger.info(f"Found borrowers in loan_data: {loan_data['borrowers']}")
+                for borrower_data in loan_data["borrowers"]:
+                    logger.info(f"Creating borrower model from: {borrower_data}")
+                    borrowers.append(BorrowerModel(**borrower_data))
+                logger.info(f"Created {len(borrowers)} borrower models")
+            else:
+                logger.warning("No borrowers found in loan_data when creating models")
+
+            # Create vehicle details if present
+            vehicle_details = None
+            if "vehicle_details" in loan_data:
+                vehicle_details = VehicleDetailsModel(**loan_data["vehicle_details"])
+
+            # Create a copy of loan_data so we can modify it safely
+            loan_data_copy = loan_data.copy()
+
+            # Remove nested objects from loan_data for direct mapping
+            if "borrowers" in loan_data_copy:
+                del loan_data_copy["borrowers"]
+            if "vehicle_details" in loan_data_copy:
+                del loan_data_copy["vehicle_details"]
+
+            # Create the loan application model
+            logger.info(f"Creating loan application model with fields: {list(loan_data_copy.keys())}")
+            loan_application = LoanApplicationModel(**loan_data_copy)
+
+            # Add borrowers and vehicle details to the model
+            if borrowers:
+                logger.info(f"Adding {len(borrowers)} borrowers to loan application")
+                loan_application.borrowers = borrowers
+            else:
+                logger.warning("No borrowers to add to loan application")
+
+            if vehicle_details:
+                loan_application.vehicle_details = vehicle_details
+
+            # Add the loan application to the response
+            analysis_response.loan_application = loan_application
+            logger.info("Successfully added loan application to response")
+
+        # If no specific loan_application field exists, try to create one from the extracted data
+        elif any(key in extracted_data for key in ["vehicle_make", "vehicle_model", "vehicle_year", "loan_amount"]):
+            # Try to construct a loan application from the top-level data
+            loan_data = {}
+
+            # Copy fields that match the loan application model
+            for field in LoanApplicationModel.__annotations__:
+                if field in extracted_data:
+                    loan_data[field] = extracted_data[field]
+
+            # Create vehicle details if possible
+            vehicle_details_data = {}
+            for field in VehicleDetailsModel.__annotations__:
+                vehicle_field_value = extracted_data.get(f"vehicle_{field}", extracted_data.get(field))
+                if vehicle_field_value is not None:
+                    vehicle_details_data[field] = vehicle_field_value
+
+            # Create borrower details if possible
+            borrower_data = {}
+            borrower_fields = ["full_name", "email", "phone", "credit_score", "annual_income"]
+            for field in borrower_fields:
+                if field in extracted_data or f"borrower_{field}" in extracted_data:
+                    borrower_data[field] = extracted_data.get(f"borrower_{field}", extracted_data.get(field))
+
+            # Create the loan application model
+            if loan_data:
+                loan_application = LoanApplicationModel(**loan_data)
+
+                if vehicle_details_data and len(vehicle_details_data) >= 3:  # Ensure we have enough vehicle data
+                    loan_application.vehicle_details = VehicleDetailsModel(**vehicle_details_data)
+
+                if borrower_data and "full_name" in borrower_data:  # Ensure we have at least the name
+                    loan_application.borrowers = [BorrowerModel(**borrower_data)]
+
+                analysis_response.loan_application = loan_application
+
+    except Exception as e:
+        logger.warning(f"Error creating loan application model: {str(e)}")
+        # Include the error but continue with the response
+        if analysis_response.errors:
+            analysis_response.errors.append(f"Error formatting loan data: {str(e)}")
+        else:
+            analysis_response.errors = [f"Error formatting loan data: {str(e)}"]
+
+    return analysis_response
@@ -0,0 +1,201 @@
+"""
+Service for fetching document files from the main API.
+"""
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Define the main API URL where document files are stored
+MAIN_API_URL = os.environ.get("MAIN_API_URL", "http://localhost:8000/api")
+
+# The main API's blob store directory, when it is mounted on this host
+DOCUMENT_STORE_DIR = os.environ.get("DOCUMENT_STORE_DIR", "")
+
+MAX_DOCUMENT_BYTES = int(os.environ.get("MAX_DOCUMENT_BYTES", str(64 * 1024 * 1024)))
+DOCUMENT_FETCH_RETRIES = int(os.environ.get("DOCUMENT_FETCH_RETRIES", "3"))
+DOCUMENT_FETCH_TIMEOUT_SECONDS = float(os.environ.get("DOCUMENT_FETCH_TIMEOUT_SECONDS", "30"))
+
+
+class DocumentFetchError(Exception):
+    """Raised when a document can't be fetched; carries the HTTP status to report."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class DocumentSource:
+    """Fetches document files over a shared keep-alive connection pool.
+
+    When DOCUMENT_STORE_DIR points at the main API's content-addressed blob
+    store, file bodies are read straight from disk and only the small
+    metadata request goes over HTTP.
+    """
+
+    def __init__(
+        self,
+        base_url: str = MAIN_API_URL,
+        store_dir: str = DOCUMENT_STORE_DIR,
+        max_bytes: int = MAX_DOCUMENT_BYTES,
+        retries: int = DOCUMENT_FETCH_RETRIES,
+    ):
+        """Initialize the HTTP client.
+
+        Args:
+            base_url: Main API base URL
+            store_dir: Main API blob store directory, or empty to always use HTTP
+            max_bytes: Largest document accepted
+            retries: Attempts per request on connection errors and 5xx responses
+        """
+        self.store_dir = Path(store_dir) if store_dir else None
+        self.max_bytes = max_bytes
+        self.retries = max(1, retries)
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(DOCUMENT_FETCH_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        await self.client.aclose()
+
+    async def fetch(self, document_id: str) -> bytes:
+        """Get the file content of a document.
+
+        Args:
+            document_id: The ID of the document
+
+        Returns:
+            The file content
+
+        Raises:
+            DocumentFetchError: If the document can't be fetched
+        """
+        if self.store_dir is not None:
+            content = await self._read_from_store(document_id)
+            if content is not None:
+                return content
+
+        return await self._with_retries(lambda: self._download(document_id))
+
+    async def list_documents(self, loan_id: str) -> List[Dict[str, Any]]:
+        """Get the document records of a loan.
+
+        Args:
+            loan_id: Loan ID or application number
+
+        Returns:
+            Document records from the main API
+
+        Raises:
+            DocumentFetchError: If the loan's documents can't be listed
+        """
+        response = await self._with_retries(lambda: self._get(f"/documents/{loan_id}"))
+        return response.json()
+
+    async def _get(self, url: str) -> httpx.Response:
+        response = await self.client.get(url)
+        if response.status_code != 200:
+            raise DocumentFetchError(response.status_code, f"Error from main API: {response.text}")
+        return response
+
+    async def _with_retries(self, attempt):
+        """Run attempt, retrying connection errors and 5xx responses with exponential backoff."""
+        for number in range(1, self.retries + 1):
+            try:
+                return await attempt()
+            except httpx.TransportError as e:
+                error = DocumentFetchError(502, f"Error connecting to main API: {str(e)}")
+            except DocumentFetchError as e:
+                if e.status_code < 500:
+                    raise
+                error = e
+
+            if number < self.retries:
+                logger.warning(f"Main API request failed (attempt {number}/{self.retries}): {error.detail}")
+                await asyncio.sleep(0.2 * 2 ** (number - 1))
+        raise error
+
+    async def _download(self, document_id: str) -> bytes:
+        """Stream a document file into a buffer bounded by max_bytes."""
+        async with self.client.stream("GET", f"/documents/file/{document_id}") as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise DocumentFetchError(
+                    response.status_code,
+                    f"Error fetching document from main API: {response.text}"
+                )
+
+            declared = int(response.headers.get("content-length", 0))
+            if declared > self.max_bytes:
+                raise self._too_large()
+
+            buffer = bytearray()
+            async for chunk in response.aiter_bytes():
+                if len(buffer) + len(chunk) > self.max_bytes:
+                    raise self._too_large()
+                buffer += chunk
+            return bytes(buffer)
+
+    async def _read_from_store(self, document_id: str) -> Optional[bytes]:
+        """Read a document's blob from the shared store, or None to fall back to HTTP."""
+        response = await self._with_retries(lambda: self.client.get(f"/documents/detail/{document_id}"))
+        if response.status_code != 200:
+            return None
+
+        document = response.json()
+        content_hash = document.get("content_hash")
+        if not content_hash:
+            # Uploaded before the blob store existed
+            return None
+
+        path = self.store_dir / content_hash[:2] / content_hash[2:4] / content_hash
+        try:
+            size = path.stat().st_size
+        except OSError:
+            logger.warning(f"Blob for document {document_id} not found in {self.store_dir}, using HTTP")
+            return None
+        if size > self.max_bytes:
+            raise self._too_large()
+
+        return await asyncio.to_thread(path.read_bytes)
+
+    def _too_large(self) -> DocumentFetchError:
+        return DocumentFetchError(
+            413,
+            f"Document exceeds the maximum size of {self.max_bytes // (1024 * 1024)} MB"
+        )
+
+
+# Shared instance, opened and closed with the application
+_document_source: Optional[DocumentSource] = None
+
+
+async def open_document_source() -> None:
+    """Create the shared document source; called on application startup."""
+    global _document_source
+    _document_source = DocumentSource()
+
+
+async def close_document_source() -> None:
+    """Close the shared document source; called on application shutdown."""
+    global _document_source
+    if _document_source is not None:
+        await _document_source.close()
+        _document_source = None
+
+
+def get_document_source() -> DocumentSource:
+    """Dependency returning the shared document source."""
+    if _document_source is None:
+        raise RuntimeError("Document source not initialized; the application has not started")
+    return _document_source
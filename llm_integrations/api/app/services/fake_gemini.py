@@ -0,0 +1,273 @@
+"""
+Offline stand-ins for the Gemini client, for load tests and benchmarks.
+
+FakeGeminiClient answers generate_content calls locally, after a latency
+drawn from a configurable distribution, optionally failing a share of calls
+with 500 or 429 errors. Its answers come from recordings when one matches the
+request, and from a canned response otherwise.
+
+RecordingModels wraps the real client and saves every response to disk, so a
+benchmark can later replay exactly the same responses with the same latencies.
+
+Configuration (environment):
+    GEMINI_BACKEND              live (default), fake, record or replay
+    GEMINI_RECORDINGS_DIR       where recordings are written and read
+    FAKE_GEMINI_LATENCY         fixed:<ms>, uniform:<min ms>:<max ms>,
+                                lognormal:<median ms>:<sigma> or recorded
+    FAKE_GEMINI_ERROR_RATE      share of calls failing with a 500 error
+    FAKE_GEMINI_RATE_LIMIT_RATE share of calls failing with a 429 error
+    FAKE_GEMINI_SEED            seed for latencies and injected errors
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from google import genai
+from google.genai import errors, types
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+GEMINI_BACKEND = os.environ.get("GEMINI_BACKEND", "live")
+GEMINI_RECORDINGS_DIR = os.environ.get("GEMINI_RECORDINGS_DIR", "./gemini_recordings")
+FAKE_GEMINI_LATENCY = os.environ.get("FAKE_GEMINI_LATENCY", "lognormal:1500:0.4")
+FAKE_GEMINI_ERROR_RATE = float(os.environ.get("FAKE_GEMINI_ERROR_RATE", "0"))
+FAKE_GEMINI_RATE_LIMIT_RATE = float(os.environ.get("FAKE_GEMINI_RATE_LIMIT_RATE", "0"))
+FAKE_GEMINI_SEED = int(os.environ.get("FAKE_GEMINI_SEED", "0"))
+
+# Returned when no recording matches the request
+CANNED_RESPONSE = {
+    "document_type": "Sales Contract",
+    "summary": "Canned response from the fake Gemini backend",
+    "content": "",
+    "entities": [{"label": "dealer", "value": "Fake Motors"}],
+    "loan_application": {
+        "loan_amount": 25000.0,
+        "loan_term_months": 60,
+        "interest_rate": 5.9,
+        "monthly_payment": 482.15,
+        "vehicle_make": "Honda",
+        "vehicle_model": "Civic",
+        "vehicle_year": 2023,
+        "vehicle_price": 28500.0,
+        "borrowers": [
+            {"is_co_borrower": False, "full_name": "Alex Sample", "credit_score": 720, "annual_income": 85000.0}
+        ],
+        "vehicle_details": {"make": "Honda", "model": "Civic", "year": 2023, "vin": "2HGFE2F59PH512345"}
+    },
+    "confidence": 0.9
+}
+
+
+class FakeResponse:
+    """Stands in for a GenerateContentResponse; callers only read its text."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+def request_key(model: str, contents: Any) -> str:
+    """Identify a request by its model and document content, ignoring config.
+
+    Args:
+        model: Model name
+        contents: Contents passed to generate_content
+
+    Returns:
+        Hex digest naming the request's recording
+    """
+    digest = hashlib.sha256(model.encode())
+    for content in contents or []:
+        for part in getattr(content, "parts", None) or []:
+            if part.text:
+                digest.update(part.text.encode())
+            elif part.inline_data is not None:
+                digest.update(part.inline_data.data)
+    return digest.hexdigest()
+
+
+class LatencyModel:
+    """Latency distribution parsed from a spec such as "lognormal:1500:0.4"."""
+
+    def __init__(self, spec: str, rng: random.Random):
+        """Initialize the distribution.
+
+        Args:
+            spec: fixed:<ms>, uniform:<min ms>:<max ms>, lognormal:<median ms>:<sigma> or recorded
+            rng: Random source, seeded for repeatable runs
+
+        Raises:
+            ValueError: If the spec is not understood
+        """
+        self.kind, *params = spec.split(":")
+        self.params = [float(param) for param in params]
+        self.rng = rng
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2, "recorded": 0}
+        if expected.get(self.kind) != len(self.params):
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+
+    def sample(self) -> Optional[float]:
+        """Draw a latency in seconds, or None to use the recording's latency."""
+        if self.kind == "fixed":
+            milliseconds = self.params[0]
+        elif self.kind == "uniform":
+            milliseconds = self.rng.uniform(*self.params)
+        elif self.kind == "lognormal":
+            median, sigma = self.params
+            milliseconds = self.rng.lognormvariate(math.log(median), sigma)
+        else:
+            return None
+        return milliseconds / 1000
+
+
+class FakeGeminiModels:
+    """Stands in for client.aio.models."""
+
+    def __init__(
+        self,
+        latency: str = FAKE_GEMINI_LATENCY,
+        error_rate: float = FAKE_GEMINI_ERROR_RATE,
+        rate_limit_rate: float = FAKE_GEMINI_RATE_LIMIT_RATE,
+        recordings_dir: Optional[str] = GEMINI_RECORDINGS_DIR,
+        replay_only: bool = False,
+        seed: int = FAKE_GEMINI_SEED,
+    ):
+        """Initialize the fake backend.
+
+        Args:
+            latency: Latency distribution spec
+            error_rate: Share of calls failing with a 500 error
+            rate_limit_rate: Share of calls failing with a 429 error
+            recordings_dir: Recordings to answer from, if any
+            replay_only: Fail requests without a recording instead of using the canned response
+            seed: Seed for latencies and injected errors
+        """
+        self.rng = random.Random(seed)
+        self.latency = LatencyModel(latency, self.rng)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.recordings_dir = Path(recordings_dir) if recordings_dir else None
+        self.replay_only = replay_only
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _recording(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.recordings_dir is None:
+            return None
+        path = self.recordings_dir / f"{key}.json"
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    async def generate_content(self, *, model: str, contents: Any, config: Any = None) -> FakeResponse:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # Draw before any await, so a seed gives the same sequence of latencies
+        # and faults however the calls are scheduled
+        latency = self.latency.sample()
+        fault = self.rng.random()
+        try:
+            key = request_key(model, contents)
+            recording = await asyncio.to_thread(self._recording, key)
+            if recording is None and self.replay_only:
+                raise errors.ClientError(404, {"error": {
+                    "code": 404, "status": "NOT_FOUND", "message": f"No recording for request {key[:12]}"
+                }})
+
+            if latency is None:
+                latency = recording["latency"] if recording else 0.0
+            await asyncio.sleep(latency)
+
+            if fault < self.rate_limit_rate:
+                raise errors.ClientError(429, {"error": {
+                    "code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Injected rate limit"
+                }})
+            if fault < self.rate_limit_rate + self.error_rate:
+                raise errors.ServerError(500, {"error": {
+                    "code": 500, "status": "INTERNAL", "message": "Injected server error"
+                }})
+
+            return FakeResponse(recording["text"] if recording else json.dumps(CANNED_RESPONSE))
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, int]:
+        """Calls answered so far and the most that were in flight at once."""
+        return {"calls": self.calls, "max_in_flight": self.max_in_flight}
+
+
+class RecordingModels:
+    """Wraps client.aio.models, saving each response and its latency to disk."""
+
+    def __init__(self, models: Any, recordings_dir: str = GEMINI_RECORDINGS_DIR):
+        """Initialize the recorder.
+
+        Args:
+            models: The real client.aio.models
+            recordings_dir: Where recordings are written
+        """
+        self.models = models
+        self.recordings_dir = Path(recordings_dir)
+        self.recordings_dir.mkdir(parents=True, exist_ok=True)
+
+    async def generate_content(self, *, model: str, contents: Any, config: Any = None) -> types.GenerateContentResponse:
+        started = time.perf_counter()
+        response = await self.models.generate_content(model=model, contents=contents, config=config)
+        latency = time.perf_counter() - started
+
+        key = request_key(model, contents)
+        recording = {"model": model, "latency": latency, "recorded_at": time.time(), "text": response.text}
+        await asyncio.to_thread((self.recordings_dir / f"{key}.json").write_text, json.dumps(recording, indent=2))
+        logger.info(f"Recorded Gemini response {key[:12]} ({latency:.2f}s)")
+        return response
+
+
+class FakeGeminiClient:
+    """Stands in for genai.Client, exposing only the async models API (real, recorded or fake)."""
+
+    def __init__(self, models: Any):
+        """Initialize the client.
+
+        Args:
+            models: Object providing an async generate_content
+        """
+        self.aio = type("FakeAio", (), {})()
+        self.aio.models = models
+
+
+def create_gemini_client(api_key: Optional[str], backend: str = GEMINI_BACKEND) -> Any:
+    """Build the Gemini client for a backend mode.
+
+    Args:
+        api_key: Google API key; only needed for the live and record modes
+        backend: live, fake, record or replay
+
+    Returns:
+        A genai.Client, or a stand-in with the same async models API
+
+    Raises:
+        ValueError: If the mode is unknown or needs an API key that is missing
+    """
+    if backend == "fake":
+        return FakeGeminiClient(FakeGeminiModels())
+    if backend == "replay":
+        latency = os.environ.get("FAKE_GEMINI_LATENCY", "recorded")
+        return FakeGeminiClient(FakeGeminiModels(latency=latency, replay_only=True))
+    if backend not in ("live", "record"):
+        raise ValueError(f"Unknown GEMINI_BACKEND: {backend}. Options are live, fake, record and replay")
+
+    if not api_key:
+        raise ValueError("Google API key not provided and not found in environment (GOOGLE_API_KEY)")
+    client = genai.Client(api_key=api_key)
+    if backend == "record":
+        return FakeGeminiClient(RecordingModels(client.aio.models))
+    return client
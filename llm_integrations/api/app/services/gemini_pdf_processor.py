@@ -1,19 +1,29 @@
 """
 Service for processing PDF documents using Google Gemini directly.
 """
+import asyncio
 import time
 import os
 import json
 import re
 import hashlib
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 import logging
-import base64
 from functools import lru_cache
 
-from google import genai
 from google.genai import types
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+
+from app.models.document_models import DocumentExtractionModel
+from app.services.fake_gemini import create_gemini_client
+from app.services.llm_cache import CacheBackend, create_cache_backend
+from app.services.model_cascade import CASCADE_MODEL, ModelCascade, get_model_cascade
+from app.services.page_relevance import select_relevant_pages
+from app.services.pdf_text import PDF_TEXT_LAYER, PDFTextLayer, extract_pages, extract_text_layer
+from app.services.rate_limiter import PRIORITY_INTERACTIVE, GeminiRateLimiter, get_gemini_limiter
+from app.services.resilience import CircuitOpenError, ResilientCaller, get_gemini_caller
+from app.services.template_registry import TEMPLATE_FAST_PATH, TemplateRegistry
+from app.services.single_flight import SingleFlight
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,19 +39,63 @@ class PDFProcessingState(BaseModel):
     errors: List[str] = []
     options: Dict[str, Any] = {}
     processing_time: float = 0.0
+    # "template", "text", "mixed" (text plus scanned pages as PDF) or "pdf"
+    extraction_path: str = "pdf"
+    page_count: Optional[int] = None
+    # Seconds spent in each stage, e.g. text_extraction and llm
+    timings: Dict[str, float] = {}
+    # Pages and bytes sent to the LLM, and how many were dropped as irrelevant
+    payload: Dict[str, int] = {}
+    # Model whose result was used; None when no LLM was called
+    model_name: Optional[str] = None
+
+
+class CachedResult(BaseModel):
+    """Compact cache record: the LLM result without the PDF it came from."""
+    document_type: str = "unknown"
+    extracted_data: Dict[str, Any] = {}
+    confidence: float = 0.0
+    errors: List[str] = []
+    model_name: str = ""
+    extraction_path: str = "pdf"
+    page_count: Optional[int] = None
+    cached_at: float = 0.0
+
+
+# Upper bound on a single Gemini call
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.environ.get("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+
+# Ask Gemini for JSON matching DocumentExtractionModel instead of free text
+LLM_STRUCTURED_OUTPUT = os.environ.get("LLM_STRUCTURED_OUTPUT", "1") == "1"
+
+# How a response can be parsed, most reliable first; all but "structured" are fallbacks
+PARSE_PATHS = ("structured", "json", "json_block", "json_cleaned", "fields", "failed")
+
+
+# Bump when the prompt or response parsing changes so cached results from
+# earlier versions are ignored; the model name is part of the version too
+LLM_CACHE_VERSION = os.environ.get("LLM_CACHE_VERSION", "3")
 
 
 class LLMCache:
-    """Simple cache for LLM responses."""
+    """Cache for LLM responses, backed by a bounded memory tier over a persistent store."""
     
-    def __init__(self, enabled: bool = True):
+    def __init__(
+        self,
+        enabled: bool = True,
+        backend: Optional[CacheBackend] = None,
+        cascade: Optional[ModelCascade] = None
+    ):
         """Initialize the cache.
         
         Args:
             enabled: Whether the cache is enabled (default: True)
+            backend: Cache backend to use (default: configured by create_cache_backend)
+            cascade: Cascade whose models make up the version of "auto" results (default: shared)
         """
-        self.cache = {}
         self.enabled = enabled
+        self.backend = backend or create_cache_backend()
+        self.cascade = cascade or get_model_cascade()
         logger.info(f"LLM Cache initialized. Enabled: {enabled}")
         
     def get_key(self, pdf_bytes: bytes, options: Dict[str, Any]) -> str:
@@ -55,21 +109,33 @@ class LLMCache:
             Cache key string
         """
         # Create a hash of the PDF content
-        pdf_hash = hashlib.md5(pdf_bytes).hexdigest()
+        pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
         
         # Create a hash of the options
         options_str = json.dumps(options, sort_keys=True)
-        options_hash = hashlib.md5(options_str.encode()).hexdigest()
+        options_hash = hashlib.sha256(options_str.encode()).hexdigest()
         
         # Combine the hashes
         return f"{pdf_hash}_{options_hash}"
     
-    def get(self, pdf_bytes: bytes, options: Dict[str, Any]) -> Optional[PDFProcessingState]:
+    def get_model_version(self, options: Dict[str, Any]) -> str:
+        """Version tag stored with each entry; entries from other versions are misses.
+        
+        Args:
+            options: Processing options
+            
+        Returns:
+            Model version string
+        """
+        return f"{self.cascade.version(options.get('model_name', CASCADE_MODEL))}:{LLM_CACHE_VERSION}"
+    
+    def get(self, pdf_bytes: bytes, options: Dict[str, Any], key: Optional[str] = None) -> Optional[PDFProcessingState]:
         """Get a cached processing state.
         
         Args:
             pdf_bytes: PDF file content
             options: Processing options
+            key: Cache key if already computed by get_key
             
         Returns:
             Cached processing state or None if not found
@@ -80,120 +146,349 @@ class LLMCache:
             return None
         
         # Generate key and look for it in cache    
-        key = self.get_key(pdf_bytes, options)
-        logger.info(f"Checking cache with key: {key[:10]}...")
-        logger.info(f"Cache status: enabled={self.enabled}, items in cache: {len(self.cache)}")
+        key = key or self.get_key(pdf_bytes, options)
+        cached = self.backend.get(key, self.get_model_version(options))
         
-        # List all keys in cache for debugging
-        if self.cache:
-            logger.info(f"Current cache keys: {[k[:10] for k in self.cache.keys()]}")
+        if cached is None:
+            logger.info(f"Cache MISS for key: {key[:10]}...")
+            return None
         
-        if key in self.cache:
-            logger.info(f"Cache HIT for key: {key[:10]}...")
-            
-            # Get the cached state and log its structure in detail
-            cached_state = self.cache[key]
-            
-            # Debug log the full structure of extracted_data
-            if cached_state and cached_state.extracted_data:
-                logger.info(f"Cache HIT extracted_data keys: {list(cached_state.extracted_data.keys())}")
-                
-                # Check for loan_application specifically
-                if "loan_application" in cached_state.extracted_data:
-                    loan_app = cached_state.extracted_data["loan_application"]
-                    logger.info(f"Cache HIT loan_application keys: {list(loan_app.keys() if isinstance(loan_app, dict) else [])}")
-                    
-                    # Check for borrowers specifically
-                    if isinstance(loan_app, dict) and "borrowers" in loan_app:
-                        logger.info(f"Cache HIT borrowers: {loan_app['borrowers']}")
-                    else:
-                        logger.warning("Cache HIT but no borrowers in loan_application")
-                else:
-                    logger.warning("Cache HIT but no loan_application in extracted_data")
-            
-            return cached_state
+        # Every hit decodes a fresh copy, so callers can't modify the cached entry
+        record = CachedResult.model_validate_json(cached)
+        logger.info(f"Cache HIT for key: {key[:10]}...")
+        logger.info(f"Cache HIT extracted_data keys: {list(record.extracted_data.keys())}")
         
-        logger.info(f"Cache MISS for key: {key[:10]}...")
-        return None
+        return PDFProcessingState(
+            pdf_bytes=pdf_bytes,
+            document_type=record.document_type,
+            extracted_data=record.extracted_data,
+            confidence=record.confidence,
+            errors=record.errors,
+            options=options,
+            extraction_path=record.extraction_path,
+            page_count=record.page_count,
+            model_name=record.model_name or None
+        )
     
-    def set(self, pdf_bytes: bytes, options: Dict[str, Any], state: PDFProcessingState) -> None:
+    def set(self, pdf_bytes: bytes, options: Dict[str, Any], state: PDFProcessingState, key: Optional[str] = None) -> None:
         """Set a cache entry.
         
         Args:
             pdf_bytes: PDF file content
             options: Processing options
             state: Processing state to cache
+            key: Cache key if already computed by get_key
         """
         if not self.enabled:
             logger.info("Cache is disabled - not caching result")
             return
         
-        key = self.get_key(pdf_bytes, options)
+        key = key or self.get_key(pdf_bytes, options)
         logger.info(f"Storing result in cache with key: {key[:10]}...")
         
         # Log the content being stored
         logger.info(f"Caching state with document_type: {state.document_type}, extracted_data keys: {list(state.extracted_data.keys() if state.extracted_data else [])}")
         
-        # Always make a deep copy of the state to ensure we preserve all nested structures
-        # This approach works for any nested entity, not just specific ones like borrowers
-        cached_state = PDFProcessingState(
-            pdf_bytes=state.pdf_bytes,
+        # Only the result is kept; the PDF is identified by the content hash in the key
+        record = CachedResult(
             document_type=state.document_type,
-            extracted_data=json.loads(json.dumps(state.extracted_data)) if state.extracted_data else {},  # Deep copy via JSON serialization
+            extracted_data=state.extracted_data or {},
             confidence=state.confidence,
-            errors=state.errors.copy() if state.errors else [],
-            options=state.options.copy() if state.options else {},
-            processing_time=state.processing_time
+            errors=state.errors or [],
+            model_name=state.model_name or options.get("model_name", CASCADE_MODEL),
+            extraction_path=state.extraction_path,
+            page_count=state.page_count,
+            cached_at=time.time()
         )
+        self.backend.set(key, self.get_model_version(options), record.model_dump_json())
+    
+    def clear(self) -> None:
+        """Remove all cached entries from every tier."""
+        self.backend.clear()
+    
+    def stats(self, detail: bool = False) -> Dict[str, Any]:
+        """Get cache statistics, including the memory footprint of each tier.
         
-        self.cache[key] = cached_state
-        logger.info(f"Cache updated - now contains {len(self.cache)} items")
+        Args:
+            detail: Whether to include the size of every entry
+            
+        Returns:
+            Dictionary with the enabled flag and per-tier statistics
+        """
+        return {"enabled": self.enabled, **self.backend.stats(detail)}
 
 
 class GeminiPDFProcessor:
     """Service for processing PDF documents with Google Gemini."""
 
-    def __init__(self, google_api_key: Optional[str] = None):
+    def __init__(
+        self,
+        google_api_key: Optional[str] = None,
+        client: Optional[Any] = None,
+        limiter: Optional[GeminiRateLimiter] = None,
+        resilience: Optional[ResilientCaller] = None,
+        cascade: Optional[ModelCascade] = None
+    ):
         """Initialize the PDF processor with Google Gemini.
         
         Args:
             google_api_key: Google API key. If None, will try to use from environment.
+            client: Gemini client to use instead of the one selected by GEMINI_BACKEND
+            limiter: Admission control for Gemini calls (default: the one shared by the process)
+            resilience: Retries, hedging and circuit breaker for Gemini calls (default: shared)
+            cascade: Models to try for model_name "auto", and their statistics (default: shared)
+            
+        Raises:
+            ValueError: If the live Gemini client needs an API key and none is set
         """
         self.google_api_key = google_api_key or os.environ.get("GOOGLE_API_KEY")
-        if not self.google_api_key:
-            raise ValueError("Google API key not provided and not found in environment (GOOGLE_API_KEY)")
-            
-        # Create a Google Generative AI Client
-        self.client = genai.Client(api_key=self.google_api_key)
         
-        # Initialize cache (enabled by default)
+        # Create a Google Generative AI Client, or an offline stand-in (see fake_gemini)
+        self.client = client or create_gemini_client(self.google_api_key)
+        
+        # Request and token budgets, adaptive concurrency and priority lanes for Gemini calls
+        self.limiter = limiter or get_gemini_limiter()
+        self.resilience = resilience or get_gemini_caller()
+        self.cascade = cascade or get_model_cascade()
+        
+        # Initialize cache (enabled by default); keyed on this processor's cascade
         cache_enabled = os.environ.get("CACHE_LLM_CALLS", "1") == "1"
-        self.cache = LLMCache(enabled=cache_enabled)
+        self.cache = LLMCache(enabled=cache_enabled, cascade=self.cascade)
+        
+        # Concurrent requests for the same PDF and options share one analysis
+        self.in_flight = SingleFlight()
+        
+        # Known document templates, read with rules instead of Gemini
+        self.templates = TemplateRegistry.load()
+        
+        # Responses parsed by each path of _parse_llm_response
+        self.parse_counts = {path: 0 for path in PARSE_PATHS}
+    
+    async def _generate_content(
+        self,
+        priority: str = PRIORITY_INTERACTIVE,
+        estimated_tokens: int = 0,
+        **kwargs
+    ) -> types.GenerateContentResponse:
+        """Call Gemini through the async client, once the limiter admits it, bounded in time.
+        
+        Cancelling the caller cancels the in-flight request, or its place in the queue.
+        
+        Args:
+            priority: Limiter lane to wait in, interactive or batch
+            estimated_tokens: Tokens to take from the per-minute token budget
+            **kwargs: Arguments for generate_content
+            
+        Returns:
+            Gemini response
+            
+        Raises:
+            asyncio.TimeoutError: If the call takes longer than LLM_REQUEST_TIMEOUT_SECONDS
+        """
+        async with self.limiter.acquire(priority, estimated_tokens) as permit:
+            response = await asyncio.wait_for(
+                self.client.aio.models.generate_content(**kwargs),
+                timeout=LLM_REQUEST_TIMEOUT_SECONDS
+            )
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None and usage.total_token_count:
+                permit.actual_tokens = usage.total_token_count
+            return response
+    
+    def _estimate_tokens(
+        self,
+        state: PDFProcessingState,
+        layer: Optional[PDFTextLayer],
+        parts: List[types.Part],
+        instructions: str
+    ) -> int:
+        """Rough input token count of a request, for the token budget.
+        
+        Text runs at about 4 characters per token and Gemini counts 258 tokens
+        per PDF page; the limiter settles the difference once the response
+        reports its usage.
+        """
+        characters = len(instructions) + sum(len(part.text) for part in parts if part.text)
+        if state.extraction_path == "text":
+            pdf_pages = 0
+        elif state.extraction_path == "mixed":
+            pdf_pages = len(layer.scanned_pages)
+        else:
+            pdf_pages = state.page_count or 1
+        return characters // 4 + pdf_pages * 258
+    
+    async def _read_text_layer(self, state: PDFProcessingState) -> Optional[PDFTextLayer]:
+        """Extract the PDF's text layer and mark its relevant pages, in a worker thread.
+        
+        Args:
+            state: Current processing state; its page count and timings are set
+            
+        Returns:
+            The text layer, or None if it is not used or the PDF can't be read
+        """
+        if not (PDF_TEXT_LAYER or TEMPLATE_FAST_PATH):
+            return None
+        
+        started = time.perf_counter()
+        try:
+            layer = await asyncio.to_thread(lambda: select_relevant_pages(extract_text_layer(state.pdf_bytes)))
+        except Exception as e:
+            logger.warning(f"Could not read the PDF text layer, sending the whole PDF: {str(e)}")
+            return None
+        finally:
+            state.timings["text_extraction"] = time.perf_counter() - started
+        
+        state.page_count = layer.page_count
+        return layer
+    
+    async def _extract_with_template(
+        self,
+        state: PDFProcessingState,
+        layer: PDFTextLayer,
+        require_accepted: bool = True
+    ) -> bool:
+        """Read the document with the rules of a known template instead of calling Gemini.
+        
+        Args:
+            state: Current processing state; filled in when the template's result is used
+            layer: Extracted text layer of the document
+            require_accepted: Whether to reject a match missing required fields or below
+                the template's confidence, rather than use whatever it read
+            
+        Returns:
+            Whether the template's result was used
+        """
+        template = self.templates.detect(layer)
+        if template is None:
+            return False
+        
+        started = time.perf_counter()
+        match = await asyncio.to_thread(self.templates.extract, template, layer, state.pdf_bytes)
+        state.timings["template"] = time.perf_counter() - started
+        
+        if not match.accepted and (require_accepted or not match.loan_application):
+            logger.info(
+                f"Template {template.name} matched with confidence {match.confidence:.2f}, "
+                f"missing {match.missing}, errors {match.errors}: falling back to Gemini"
+            )
+            return False
+        
+        logger.info(f"Extracted document with template {template.name} (confidence {match.confidence:.2f})")
+        state.document_type = match.document_type
+        state.confidence = match.confidence
+        state.extraction_path = "template"
+        state.extracted_data = {
+            "loan_application": match.loan_application,
+            "summary": f"{match.document_type} read with the {template.name} template",
+            "template": template.name
+        }
+        if match.missing:
+            state.extracted_data["missing_fields"] = match.missing
+        state.payload = {
+            "pages_total": layer.page_count,
+            "pages_sent": 0,
+            "pages_dropped": layer.page_count,
+            "bytes_original": len(state.pdf_bytes),
+            "bytes_sent": 0,
+            "bytes_dropped": len(state.pdf_bytes)
+        }
+        return True
+    
+    async def _prepare_parts(self, state: PDFProcessingState, layer: Optional[PDFTextLayer]) -> Tuple[List[types.Part], str]:
+        """Choose what to send to Gemini and record its size.
+        
+        Args:
+            state: Current processing state; its extraction path, timings and payload are set
+            layer: Extracted text layer of the document, if available
+            
+        Returns:
+            Content parts for the document and the request to append to the instructions
+        """
+        parts, request = await self._select_parts(state, layer)
+        
+        sent = sum(len(part.text.encode()) if part.text else len(part.inline_data.data) for part in parts)
+        page_count = state.page_count or 0
+        pages_sent = len(layer.selected_pages) if state.extraction_path in ("text", "mixed") else page_count
+        state.payload = {
+            "pages_total": page_count,
+            "pages_sent": pages_sent,
+            "pages_dropped": page_count - pages_sent,
+            "bytes_original": len(state.pdf_bytes),
+            "bytes_sent": sent,
+            "bytes_dropped": max(len(state.pdf_bytes) - sent, 0)
+        }
+        return parts, request
+    
+    async def _select_parts(self, state: PDFProcessingState, layer: Optional[PDFTextLayer]) -> Tuple[List[types.Part], str]:
+        """Choose what to send to Gemini: the PDF's text layer, the whole PDF, or both.
+        
+        Pages with a usable text layer are sent as text, which costs far fewer
+        tokens; pages without one (scans) are sent as a PDF of just those pages.
+        In long documents, text pages unlikely to hold loan details are left out.
+        
+        Args:
+            state: Current processing state; its extraction path and timings are set
+            layer: Extracted text layer of the document, if available
+            
+        Returns:
+            Content parts for the document and the request to append to the instructions
+        """
+        pdf_part = types.Part.from_bytes(data=state.pdf_bytes, mime_type="application/pdf")
+        if not PDF_TEXT_LAYER or layer is None:
+            return [pdf_part], "Please analyze this PDF document."
+        
+        state.extraction_path = layer.extraction_path
+        logger.info(f"PDF has {layer.page_count} pages, {len(layer.scanned_pages)} without a text layer: using the {state.extraction_path} path")
+        
+        if state.extraction_path == "text":
+            return (
+                [types.Part.from_text(text=layer.to_prompt_text())],
+                "Please analyze this document. Its text was extracted from the PDF, page by page, above."
+            )
+        
+        if state.extraction_path == "mixed":
+            started = time.perf_counter()
+            scanned_pdf = await asyncio.to_thread(extract_pages, state.pdf_bytes, layer.scanned_pages)
+            state.timings["page_split"] = time.perf_counter() - started
+            return (
+                [
+                    types.Part.from_text(text=layer.to_prompt_text()),
+                    types.Part.from_bytes(data=scanned_pdf, mime_type="application/pdf")
+                ],
+                "Please analyze this document. The text of its text pages was extracted above; "
+                "the attached PDF holds its scanned pages, in order."
+            )
+        
+        return [pdf_part], "Please analyze this PDF document."
     
-    def _process_document(self, state: PDFProcessingState) -> PDFProcessingState:
+    async def _process_document(
+        self,
+        state: PDFProcessingState,
+        key: Optional[str] = None,
+        priority: str = PRIORITY_INTERACTIVE
+    ) -> PDFProcessingState:
         """Process the document with a single LLM call to detect type and extract data.
         
         Args:
             state: Current processing state
+            key: Cache key if already computed by get_key
+            priority: Limiter lane for the Gemini call, interactive or batch
             
         Returns:
             Updated state with document type and extracted data
         """
-        # Check cache first
-        cached_state = self.cache.get(state.pdf_bytes, state.options)
+        # Check cache first; reading the disk tier happens in a worker thread
+        started = time.perf_counter()
+        cached_state = await asyncio.to_thread(self.cache.get, state.pdf_bytes, state.options, key)
+        state.timings["cache_lookup"] = time.perf_counter() - started
         if (cached_state):
             logger.info("Using cached LLM result")
+            cached_state.timings = state.timings
             return cached_state
             
         try:
-            # Get PDF bytes
-            pdf_bytes = state.pdf_bytes
-            
             # Get model name from options with default to a Google Gemini model
-            model_name = state.options.get("model_name", "gemini-1.5-pro")
-            
-            # Create a temporary file in memory to pass to the API
-            pdf_data = base64.b64encode(pdf_bytes).decode('utf-8')
+            model_name = state.options.get("model_name", CASCADE_MODEL)
             
             # Instructions for document analysis
             instructions = """You are an expert loan document analyst. Analyze the attached PDF document to:
@@ -289,53 +584,100 @@ The resulting JSON must contain ALL of these exact keys, formatted exactly as sh
 
 Important: Your response must be a valid JSON object."""
             
-            # Create the content with PDF data and text instruction
+            # Read the text layer once: it identifies known templates and decides what Gemini gets
+            layer = await self._read_text_layer(state)
+            if layer is not None and TEMPLATE_FAST_PATH and await self._extract_with_template(state, layer):
+                return state
+            
+            # Send the text layer where the PDF has one, the PDF itself otherwise
+            document_parts, request = await self._prepare_parts(state, layer)
+            
+            # Create the content with the document and text instruction
             # We structure this differently depending on the version of the API
             try:
                 # Try the newer approach first for v1+ compatibility
                 contents = [
                     types.Content(
                         parts=[
-                            types.Part.from_bytes(data=pdf_bytes, mime_type="application/pdf"),
-                            types.Part.from_text(text = instructions +"Please analyze this PDF document.")
+                            *document_parts,
+                            types.Part.from_text(text = instructions + request)
                         ]
                     )
                 ]
                 
-                # Configure generation parameters
-                config = types.GenerateContentConfig(
-                    temperature=0,
-                    top_p=1,
-                    top_k=32,
-                    max_output_tokens=8192,
-                )
+                llm_started = time.perf_counter()
+                # The instructions go both as the system instruction and in the prompt
+                estimated_tokens = self._estimate_tokens(state, layer, contents[0].parts, instructions)
                 
-                # Try to add system instruction if supported
-                try:
-                    # Only in v1alpha and newer
-                    response = self.client.models.generate_content(
-                        model=model_name,
-                        contents=contents,
-                        config=types.GenerateContentConfig(
-                            temperature=0,
-                            top_p=1,
-                            top_k=32,
-                            max_output_tokens=8192,
-                            system_instruction=instructions
+                # Fastest model first; a result failing the cascade's checks goes to the next one
+                models = self.cascade.models_for(model_name)
+                attempts = []
+                for tier, tier_model in enumerate(models):
+                    started = time.perf_counter()
+                    try:
+                        # Retried on transient errors, hedged when slow, short-circuited while Gemini is down
+                        response = await self.resilience.call(
+                            lambda: self._generate_content(
+                                priority=priority,
+                                estimated_tokens=estimated_tokens,
+                                model=tier_model,
+                                contents=contents,
+                                config=types.GenerateContentConfig(
+                                    temperature=0,
+                                    top_p=1,
+                                    top_k=32,
+                                    max_output_tokens=8192,
+                                    system_instruction=instructions,
+                                    response_mime_type="application/json" if LLM_STRUCTURED_OUTPUT else None,
+                                    response_schema=DocumentExtractionModel if LLM_STRUCTURED_OUTPUT else None
+                                )
+                            ),
+                            hedge_allowed=self.limiter.has_capacity
                         )
-                    )
-                except (ValueError, TypeError):
-                    logger.error("Error generating content : {str(e)}")
-                    return state
+                        if response.text is None:
+                            # e.g. a reply withheld by the safety filters
+                            raise ValueError(f"{tier_model} returned no text")
+                    except Exception as e:
+                        if not attempts:
+                            raise
+                        # Keep the earlier model's result rather than lose the document
+                        logger.warning(f"Escalation to {tier_model} failed, keeping the {attempts[-1][2]} result: {str(e)}")
+                        break
+                    latency = time.perf_counter() - started
+                    
+                    # Parse the JSON response
+                    result = self._parse_llm_response(response.text)
+                    problems = self.cascade.check(result)
+                    escalate = bool(problems) and tier < len(models) - 1
+                    self.cascade.record(tier_model, latency, problems, escalate)
+                    attempts.append((len(problems), tier, tier_model, result))
+                    if len(models) > 1:
+                        state.timings[f"llm:{tier_model}"] = latency
+                    if not escalate:
+                        break
+                    logger.info(f"Escalating document from {tier_model}: {'; '.join(problems[:5])}")
+                
+                # Fewest problems wins, the later (stronger) model on ties
+                _, _, state.model_name, result = min(attempts, key=lambda attempt: (attempt[0], -attempt[1]))
+                state.timings["llm"] = time.perf_counter() - llm_started
                 
             except (AttributeError, TypeError, ValueError) as e:
                 # Handle older API versions or errors
                 logger.error(f"Error generating content: {str(e)}")
                 state.errors.append(f"Error generating content: {str(e)}")
                 return state
-            
-            # Parse the JSON response
-            result = self._parse_llm_response(response.text)
+            except CircuitOpenError as e:
+                logger.error(str(e))
+                state.errors.append(str(e))
+                # Fall back to what a known template can read, even if incomplete; not cached
+                if layer is not None and await self._extract_with_template(state, layer, require_accepted=False):
+                    state.errors.append("Returned the fields read with the document template instead")
+                return state
+            except asyncio.TimeoutError:
+                error_msg = f"Gemini request timed out after {LLM_REQUEST_TIMEOUT_SECONDS:g} seconds"
+                logger.error(error_msg)
+                state.errors.append(error_msg)
+                return state
             
             # Update state with results
             if "document_type" in result:
@@ -377,7 +719,7 @@ Important: Your response must be a valid JSON object."""
                 state.confidence = min(0.5 + (num_fields * 0.05), 1.0) if num_fields > 0 else 0.0
             
             # Cache the result
-            self.cache.set(state.pdf_bytes, state.options, state)
+            await asyncio.to_thread(self.cache.set, state.pdf_bytes, state.options, state, key)
             
             return state
         except Exception as e:
@@ -389,16 +731,33 @@ Important: Your response must be a valid JSON object."""
     def _parse_llm_response(self, response_text: str) -> Dict[str, Any]:
         """Parse the LLM response to extract JSON data.
         
+        With structured output on, responses validate straight into
+        DocumentExtractionModel; the JSON and regex recovery below is the fallback
+        for anything else, and the only parser with it off. Each path taken is
+        counted in parse_counts.
+        
         Args:
             response_text: Text response from the LLM
             
         Returns:
             Dictionary with parsed data
         """
+        # Without a response schema the model may answer in another shape, e.g.
+        # with extracted_data, which validating against the schema would drop
+        if LLM_STRUCTURED_OUTPUT:
+            try:
+                extraction = DocumentExtractionModel.model_validate_json(response_text)
+                self.parse_counts["structured"] += 1
+                return extraction.model_dump(mode="json", exclude_unset=True)
+            except ValidationError as e:
+                logger.warning(f"Response doesn't match the response schema, falling back to JSON recovery: {str(e)[:200]}")
+        
         try:
             # First attempt: try direct JSON loading if the response is already valid JSON
             try:
-                return json.loads(response_text)
+                result = json.loads(response_text)
+                self.parse_counts["json"] += 1
+                return result
             except json.JSONDecodeError:
                 # Not valid JSON, continue with extraction
                 pass
@@ -408,7 +767,9 @@ Important: Your response must be a valid JSON object."""
             if json_match:
                 json_text = json_match.group(0)
                 try:
-                    return json.loads(json_text)
+                    result = json.loads(json_text)
+                    self.parse_counts["json_block"] += 1
+                    return result
                 except json.JSONDecodeError as e:
                     logger.warning(f"Failed to parse JSON: {str(e)}")
                     # Clean up the JSON text - remove comments and fix trailing commas
@@ -416,7 +777,9 @@ Important: Your response must be a valid JSON object."""
                     cleaned_json = re.sub(r',(\s*[\]}])', r'\1', cleaned_json)  # Remove trailing commas
                     
                     try:
-                        return json.loads(cleaned_json)
+                        result = json.loads(cleaned_json)
+                        self.parse_counts["json_cleaned"] += 1
+                        return result
                     except json.JSONDecodeError:
                         logger.warning("Still failed to parse JSON after cleanup")
             
@@ -478,10 +841,12 @@ Important: Your response must be a valid JSON object."""
             # If we at least have a document type, return what we found
             if result.get("document_type") != "unknown":
                 logger.info(f"Extracted partial information: document_type={result['document_type']}")
+                self.parse_counts["fields"] += 1
                 return result
             
             # If all else fails, return basic empty structure
             logger.warning("Unable to extract meaningful data from response")
+            self.parse_counts["failed"] += 1
             return {
                 "document_type": "unknown",
                 "extracted_data": {},
@@ -489,18 +854,35 @@ Important: Your response must be a valid JSON object."""
             }
         except Exception as e:
             logger.error(f"Error parsing LLM response: {str(e)}")
+            self.parse_counts["failed"] += 1
             return {
                 "document_type": "unknown",
                 "extracted_data": {},
                 "confidence": 0.0
             }
     
-    async def process_pdf(self, pdf_bytes: bytes, options: Dict[str, Any] = None) -> Dict[str, Any]:
+    def parse_stats(self) -> Dict[str, Any]:
+        """Responses parsed by each path, and the share that needed the fallback."""
+        total = sum(self.parse_counts.values())
+        fallback = total - self.parse_counts["structured"]
+        return {
+            "structured_output": LLM_STRUCTURED_OUTPUT,
+            "paths": dict(self.parse_counts),
+            "fallback_rate": fallback / total if total else 0.0
+        }
+    
+    async def process_pdf(
+        self,
+        pdf_bytes: bytes,
+        options: Dict[str, Any] = None,
+        priority: str = PRIORITY_INTERACTIVE
+    ) -> Dict[str, Any]:
         """Process a PDF document and extract structured data.
         
         Args:
             pdf_bytes: The PDF file as bytes
             options: Processing options
+            priority: "interactive" for a reviewer waiting on the result, "batch" for queued work
             
         Returns:
             Dictionary with extracted data and metadata
@@ -510,7 +892,7 @@ Important: Your response must be a valid JSON object."""
         # Set default options if not provided
         if options is None:
             options = {
-                "model_name": "gemini-1.5-pro",  # Default to Google's Gemini model
+                "model_name": CASCADE_MODEL,  # Cheapest Gemini model that passes the checks
                 "extract_tables": True,
                 "extract_forms": True,
                 "summarize": False
@@ -523,8 +905,13 @@ Important: Your response must be a valid JSON object."""
                 options=options
             )
             
-            # Run the processing directly
-            final_state = self._process_document(initial_state)
+            # Hash once, off the event loop: large PDFs take a while
+            key = await asyncio.to_thread(self.cache.get_key, pdf_bytes, options)
+            
+            # Identical requests already in flight share that analysis; each
+            # caller gets its own copy of the result
+            final_state = await self.in_flight.run(key, lambda: self._process_document(initial_state, key, priority))
+            final_state = final_state.model_copy(deep=True)
             
             # Calculate processing time
             processing_time = time.time() - start_time
@@ -537,7 +924,12 @@ Important: Your response must be a valid JSON object."""
                 "document_type": final_state.document_type,
                 "processing_time": final_state.processing_time,
                 "errors": final_state.errors if final_state.errors else None,
-                "provider": "gemini"
+                "provider": "gemini",
+                "extraction_path": final_state.extraction_path,
+                "page_count": final_state.page_count,
+                "timings": final_state.timings,
+                "payload": final_state.payload,
+                "model_name": final_state.model_name
             }
             
         except Exception as e:
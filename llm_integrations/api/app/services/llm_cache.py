@@ -0,0 +1,380 @@
+"""
+Cache backends for LLM results.
+
+Results are cached in tiers: a bounded in-process LRU in front of a SQLite
+file that survives restarts and is shared by every worker process. Values are
+serialized records (JSON text), so their memory footprint is known exactly.
+
+Clearing the cache bumps a generation counter in the SQLite file; every
+process's memory tier checks it every LLM_CACHE_SYNC_SECONDS and drops its
+entries when it has changed, so a clear reaches all workers.
+"""
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "256"))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_MAX_DISK_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_DISK_ENTRIES", "10000"))
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "./llm_cache.sqlite3")
+LLM_CACHE_SYNC_SECONDS = float(os.environ.get("LLM_CACHE_SYNC_SECONDS", "1"))
+
+
+class CacheBackend(ABC):
+    """Interface for LLM result cache backends.
+
+    Entries are stored under a key together with the model version that
+    produced them; a lookup with a different model version is a miss.
+    """
+
+    @abstractmethod
+    def get(self, key: str, model_version: str) -> Optional[str]:
+        """Get a cached value.
+
+        Args:
+            key: Cache key
+            model_version: Model version the caller expects
+
+        Returns:
+            Cached value or None if missing, expired or from another model version
+        """
+
+    @abstractmethod
+    def set(self, key: str, model_version: str, value: str) -> None:
+        """Store a value.
+
+        Args:
+            key: Cache key
+            model_version: Model version that produced the value
+            value: Serialized record to cache
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry."""
+
+    @abstractmethod
+    def stats(self, detail: bool = False) -> Dict[str, Any]:
+        """Describe the backend for the cache status endpoint.
+
+        Args:
+            detail: Whether to include a line per entry
+        """
+
+    def generation(self) -> int:
+        """Counter bumped by every clear, for backends shared between processes."""
+        return 0
+
+
+def entry_size(key: str, value: str) -> int:
+    """Memory held by a cached entry: its key and serialized record."""
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+
+class MemoryLRUCache(CacheBackend):
+    """In-process cache bounded by entry count and total bytes, evicting the least recently used."""
+
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+    ):
+        """Initialize the memory tier.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            max_bytes: Maximum total size of the entries kept in memory
+            ttl_seconds: Seconds an entry stays valid
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # key -> (model version, expiry, value, size in bytes)
+        self._entries: "OrderedDict[str, Tuple[str, float, str, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, key: str) -> None:
+        self._bytes -= self._entries.pop(key)[3]
+
+    def get(self, key: str, model_version: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            version, expires_at, value, _ = entry
+            if version != model_version or expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, model_version: str, value: str) -> None:
+        size = entry_size(key, value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                # Larger than the whole tier; leave it to the disk tier
+                return
+
+            self._entries[key] = (model_version, time.time() + self.ttl_seconds, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self, detail: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            sizes = [entry[3] for entry in self._entries.values()]
+            stats = {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "average_entry_bytes": self._bytes // len(sizes) if sizes else 0,
+                "largest_entry_bytes": max(sizes, default=0),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+            if detail:
+                now = time.time()
+                stats["items"] = [
+                    {
+                        "key": key[:16],
+                        "model_version": version,
+                        "bytes": size,
+                        "expires_in": round(expires_at - now),
+                    }
+                    for key, (version, expires_at, _, size) in self._entries.items()
+                ]
+            return stats
+
+
+class SQLiteCache(CacheBackend):
+    """Persistent cache in a SQLite file, shared by all workers that point at it.
+
+    Each call opens its own connection, so the
+    backend is safe to use from any thread or process; WAL mode lets readers
+    proceed while another worker writes.
+
+    Lookups only read. Hits are noted in memory and written to accessed_at
+    with the next set, which also deletes expired entries; entries from another
+    model version are replaced when the new result is stored.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        max_entries: int = LLM_CACHE_MAX_DISK_ENTRIES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+    ):
+        """Initialize the disk tier, creating the cache table if needed.
+
+        Args:
+            path: SQLite database file
+            max_entries: Maximum number of entries kept on disk
+            ttl_seconds: Seconds an entry stays valid
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        # key -> time of the last hit not yet written to accessed_at
+        self._accessed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, "
+                "model_version TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL, "
+                "value TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO llm_cache_meta (name, value) VALUES ('generation', 0)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection for one transaction, committing on success."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str, model_version: str) -> Optional[str]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT model_version, expires_at, value FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        version, expires_at, value = row
+        if version != model_version or expires_at <= now:
+            self.misses += 1
+            return None
+
+        with self._lock:
+            self._accessed[key] = now
+        self.hits += 1
+        return value
+
+    def set(self, key: str, model_version: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+        with self._connect() as conn:
+            # Write the hits noted since the last set, so eviction sees them
+            conn.executemany(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, accessed_key) for accessed_key, accessed_at in accessed.items()],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model_version, expires_at, accessed_at, value) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model_version, now + self.ttl_seconds, now, value),
+            )
+            # Drop expired entries, then the least recently used beyond the bound
+            conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._accessed.clear()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache")
+            conn.execute("UPDATE llm_cache_meta SET value = value + 1 WHERE name = 'generation'")
+
+    def generation(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT value FROM llm_cache_meta WHERE name = 'generation'").fetchone()[0]
+
+    def stats(self, detail: bool = False) -> Dict[str, Any]:
+        with self._connect() as conn:
+            entries, value_bytes = conn.execute(
+                "SELECT count(*), coalesce(sum(length(CAST(value AS BLOB))), 0) FROM llm_cache"
+            ).fetchone()
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": value_bytes,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class TieredCache(CacheBackend):
+    """Memory tier in front of a persistent tier; disk hits are promoted to memory."""
+
+    def __init__(
+        self,
+        memory: CacheBackend,
+        disk: Optional[CacheBackend] = None,
+        sync_seconds: float = LLM_CACHE_SYNC_SECONDS,
+    ):
+        """Initialize the tiered cache.
+
+        Args:
+            memory: Fast in-process tier
+            disk: Optional persistent tier
+            sync_seconds: How often to check whether another process cleared the persistent tier
+        """
+        self.memory = memory
+        self.disk = disk
+        self.sync_seconds = sync_seconds
+        self._generation = disk.generation() if disk is not None else 0
+        self._synced_at = time.monotonic()
+        self._sync_lock = threading.Lock()
+
+    def _sync(self) -> None:
+        """Drop the memory tier if the persistent tier was cleared since the last check."""
+        if self.disk is None or time.monotonic() - self._synced_at < self.sync_seconds:
+            return
+        with self._sync_lock:
+            self._synced_at = time.monotonic()
+            generation = self.disk.generation()
+            if generation != self._generation:
+                logger.info("LLM cache cleared by another process: dropping the memory tier")
+                self.memory.clear()
+                self._generation = generation
+
+    def get(self, key: str, model_version: str) -> Optional[str]:
+        self._sync()
+        value = self.memory.get(key, model_version)
+        if value is not None or self.disk is None:
+            return value
+
+        value = self.disk.get(key, model_version)
+        if value is not None:
+            self.memory.set(key, model_version, value)
+        return value
+
+    def set(self, key: str, model_version: str, value: str) -> None:
+        self.memory.set(key, model_version, value)
+        if self.disk is not None:
+            self.disk.set(key, model_version, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+            with self._sync_lock:
+                self._generation = self.disk.generation()
+
+    def stats(self, detail: bool = False) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(detail),
+            "disk": self.disk.stats(detail) if self.disk is not None else None,
+        }
+
+
+def create_cache_backend() -> CacheBackend:
+    """Build the configured cache: memory over SQLite, or memory only when LLM_CACHE_PATH is empty."""
+    memory = MemoryLRUCache()
+    if not LLM_CACHE_PATH:
+        return TieredCache(memory)
+    try:
+        return TieredCache(memory, SQLiteCache())
+    except sqlite3.Error as e:
+        logger.error(f"Could not open LLM cache at {LLM_CACHE_PATH}, using memory only: {str(e)}")
+        return TieredCache(memory)
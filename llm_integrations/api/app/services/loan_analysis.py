@@ -0,0 +1,220 @@
+"""
+Service for analyzing all of a loan's documents and consolidating the results.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.models.document_models import (
+    BorrowerModel, FieldProvenance, FieldSource, LoanAnalysisResponse, LoanApplicationModel,
+    LoanDocumentAnalysis, VehicleDetailsModel
+)
+from app.services import document_analysis
+from app.services.document_source import DocumentFetchError, DocumentSource
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Documents fetched and analyzed at once across all batch requests in this process;
+# Gemini calls are further bounded by the processor's rate limiter
+LOAN_ANALYSIS_CONCURRENCY = int(os.environ.get("LOAN_ANALYSIS_CONCURRENCY", "8"))
+
+_document_slots: Optional[asyncio.Semaphore] = None
+
+
+def get_document_slots() -> asyncio.Semaphore:
+    """Shared limit on documents in progress, created on first use inside the event loop."""
+    global _document_slots
+    if _document_slots is None:
+        _document_slots = asyncio.Semaphore(LOAN_ANALYSIS_CONCURRENCY)
+    return _document_slots
+
+
+async def analyze_loan_documents(
+    documents: List[Dict[str, Any]],
+    pdf_processor: Any,
+    document_source: DocumentSource
+) -> AsyncIterator[LoanDocumentAnalysis]:
+    """Analyze documents concurrently, yielding each result as soon as it completes.
+
+    A document that fails is reported with its error instead of stopping the batch.
+    Closing the iterator early cancels the analyses still running.
+
+    Args:
+        documents: Document records from the main API
+        pdf_processor: PDF processing service
+        document_source: Source of the main API's document files
+
+    Yields:
+        Per-document results in completion order
+    """
+    tasks = [
+        asyncio.ensure_future(_analyze_one(document, pdf_processor, document_source))
+        for document in documents
+    ]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _analyze_one(document: Dict[str, Any], pdf_processor: Any, document_source: DocumentSource) -> LoanDocumentAnalysis:
+    result = LoanDocumentAnalysis(document_id=str(document["id"]), document_name=document.get("name"))
+
+    # Documents uploaded before file_name was recorded only have their stored path;
+    # name is a display label such as "Pay Stubs" and says nothing about the format
+    file_name = document.get("file_name") or document.get("file_path") or ""
+    if not file_name.lower().endswith(".pdf"):
+        result.error = "Only PDF documents can be analyzed"
+        return result
+
+    try:
+        async with get_document_slots():
+            result.analysis = await document_analysis.analyze_document(
+                result.document_id, pdf_processor, document_source
+            )
+    except DocumentFetchError as e:
+        result.error = e.detail
+    except Exception as e:
+        logger.error(f"Error analyzing document {result.document_id}: {str(e)}")
+        result.error = f"Error processing document: {str(e)}"
+    return result
+
+
+def build_loan_analysis(loan_id: str, results: List[LoanDocumentAnalysis], processing_time: float) -> LoanAnalysisResponse:
+    """Consolidate per-document results into one loan analysis.
+
+    Args:
+        loan_id: ID or application number of the loan
+        results: Per-document results
+        processing_time: Time taken so far in seconds
+
+    Returns:
+        Loan analysis with the merged loan application and its provenance
+    """
+    loan_application, provenance = merge_loan_applications(results)
+    return LoanAnalysisResponse(
+        loan_id=loan_id,
+        documents=results,
+        loan_application=loan_application,
+        provenance=provenance,
+        complete=all(result.error is None for result in results),
+        processing_time=processing_time
+    )
+
+
+def merge_loan_applications(
+    results: List[LoanDocumentAnalysis]
+) -> Tuple[Optional[LoanApplicationModel], Dict[str, FieldProvenance]]:
+    """Merge the loan applications extracted from several documents.
+
+    Each field takes the value from the most confident document that has one;
+    documents with a different value are listed as conflicts. Borrowers are
+    matched by role (borrower or co-borrower) and order within the document.
+
+    Args:
+        results: Per-document results
+
+    Returns:
+        The merged loan application (None if no document had one) and the
+        provenance of each field, keyed by path such as "vehicle_details.vin"
+        or "borrowers[0].full_name"
+    """
+    loan_fields: Dict[str, List[FieldSource]] = {}
+    vehicle_fields: Dict[str, List[FieldSource]] = {}
+    # (is co-borrower, position within role) -> field -> candidate values
+    borrower_fields: Dict[Tuple[bool, int], Dict[str, List[FieldSource]]] = {}
+
+    for result in results:
+        if result.analysis is None or result.analysis.loan_application is None:
+            continue
+
+        def source(value: Any) -> FieldSource:
+            return FieldSource(
+                document_id=result.document_id,
+                document_name=result.document_name,
+                document_type=result.analysis.document_type,
+                confidence=result.analysis.confidence,
+                value=value
+            )
+
+        # Only the fields the document actually provided
+        data = result.analysis.loan_application.model_dump(mode="json", exclude_unset=True, exclude_none=True)
+        for key, value in (data.pop("vehicle_details", None) or {}).items():
+            vehicle_fields.setdefault(key, []).append(source(value))
+
+        positions = {False: 0, True: 0}
+        for borrower in data.pop("borrowers", None) or []:
+            role = bool(borrower.pop("is_co_borrower", False))
+            fields = borrower_fields.setdefault((role, positions[role]), {})
+            positions[role] += 1
+            for key, value in borrower.items():
+                fields.setdefault(key, []).append(source(value))
+
+        for key, value in data.items():
+            loan_fields.setdefault(key, []).append(source(value))
+
+    if not (loan_fields or vehicle_fields or borrower_fields):
+        return None, {}
+
+    provenance: Dict[str, FieldProvenance] = {}
+
+    def choose(path: str, sources: List[FieldSource]) -> Any:
+        best = max(sources, key=lambda candidate: candidate.confidence)
+        conflicts = [
+            candidate for candidate in sources
+            if _normalize(candidate.value) != _normalize(best.value)
+        ]
+        provenance[path] = FieldProvenance(source=best, conflicts=conflicts)
+        return best.value
+
+    loan_data = {key: choose(key, sources) for key, sources in loan_fields.items()}
+
+    if vehicle_fields:
+        loan_data["vehicle_details"] = VehicleDetailsModel(**{
+            key: choose(f"vehicle_details.{key}", sources) for key, sources in vehicle_fields.items()
+        })
+
+    # Borrowers first, then co-borrowers, each in document order
+    borrowers = []
+    for index, slot in enumerate(sorted(borrower_fields)):
+        borrowers.append(BorrowerModel(is_co_borrower=slot[0], **{
+            key: choose(f"borrowers[{index}].{key}", sources) for key, sources in borrower_fields[slot].items()
+        }))
+    if borrowers:
+        loan_data["borrowers"] = borrowers
+
+    return LoanApplicationModel(**loan_data), provenance
+
+
+def _normalize(value: Any) -> Any:
+    """Compare strings without regard to case or surrounding whitespace."""
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    return value
+
+
+async def analyze_loan(
+    loan_id: str,
+    documents: List[Dict[str, Any]],
+    pdf_processor: Any,
+    document_source: DocumentSource
+) -> LoanAnalysisResponse:
+    """Analyze all documents of a loan and return the consolidated result.
+
+    Args:
+        loan_id: ID or application number of the loan
+        documents: The loan's document records from the main API
+        pdf_processor: PDF processing service
+        document_source: Source of the main API's document files
+
+    Returns:
+        Consolidated loan analysis
+    """
+    started = time.time()
+    results = [result async for result in analyze_loan_documents(documents, pdf_processor, document_source)]
+    return build_loan_analysis(loan_id, results, time.time() - started)
@@ -0,0 +1,152 @@
+"""
+Model cascade: try the fastest model first and escalate only results that fail checks.
+
+With model_name "auto", a document goes to the first model of
+LLM_MODEL_CASCADE. Its result is checked: the document type must have been
+read, and a loan application, where the document has one, must fit
+LoanApplicationModel and come with a confidence of at least
+LLM_CASCADE_MIN_CONFIDENCE. Documents without loan details, such as pay stubs
+or IDs, only need the document type. A result that fails is sent to the next,
+slower model; the result with the fewest problems is kept, the later one on ties.
+
+Configuration (environment):
+    LLM_MODEL_CASCADE            comma-separated models, fastest first
+    LLM_CASCADE_MIN_CONFIDENCE   confidence a result needs to stop the cascade
+"""
+import logging
+import os
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from app.models.document_models import LoanApplicationModel
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Model name selecting the cascade instead of a single model
+CASCADE_MODEL = "auto"
+
+LLM_MODEL_CASCADE = [
+    model.strip()
+    for model in os.environ.get("LLM_MODEL_CASCADE", "gemini-2.0-flash,gemini-2.5-pro").split(",")
+    if model.strip()
+]
+LLM_CASCADE_MIN_CONFIDENCE = float(os.environ.get("LLM_CASCADE_MIN_CONFIDENCE", "0.8"))
+
+# Latencies kept per model for the percentiles in stats()
+LATENCY_SAMPLES = 500
+
+
+class ModelCascade:
+    """Cascade configuration, result checks and per-model statistics."""
+
+    def __init__(self, models: List[str] = LLM_MODEL_CASCADE, min_confidence: float = LLM_CASCADE_MIN_CONFIDENCE):
+        """Initialize the cascade.
+
+        Args:
+            models: Models to try, fastest first
+            min_confidence: Confidence a result needs to stop the cascade
+
+        Raises:
+            ValueError: If no model is configured
+        """
+        if not models:
+            raise ValueError("LLM_MODEL_CASCADE must name at least one model")
+        self.models = list(models)
+        self.min_confidence = min_confidence
+        self.tiers: Dict[str, Dict[str, Any]] = {}
+
+    def models_for(self, model_name: str) -> List[str]:
+        """Models to try for a requested model name: the cascade for "auto", else just that model."""
+        return self.models if model_name == CASCADE_MODEL else [model_name]
+
+    def version(self, model_name: str) -> str:
+        """Name for cache versioning, so changing the cascade invalidates its results."""
+        if model_name == CASCADE_MODEL:
+            return f"{CASCADE_MODEL}({','.join(self.models)})"
+        return model_name
+
+    def check(self, result: Dict[str, Any]) -> List[str]:
+        """Find why a parsed LLM result should be escalated.
+
+        Args:
+            result: Parsed LLM response
+
+        Returns:
+            Problems found, such as failing fields; empty if the result is good enough
+        """
+        problems = []
+        if result.get("document_type", "unknown") == "unknown":
+            problems.append("document_type missing")
+
+        # Not every document carries loan details; only check the ones that do
+        loan_data = result.get("loan_application")
+        if not loan_data:
+            return problems
+        if not isinstance(loan_data, dict):
+            problems.append("loan_application is not an object")
+            return problems
+
+        try:
+            LoanApplicationModel(**loan_data)
+        except ValidationError as e:
+            for error in e.errors():
+                path = ".".join(str(part) for part in error["loc"])
+                problems.append(f"loan_application.{path}: {error['msg']}")
+        except TypeError as e:
+            problems.append(f"loan_application: {str(e)}")
+
+        try:
+            confidence = float(result.get("confidence", 0.0))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        if confidence < self.min_confidence:
+            problems.append(f"confidence {confidence:.2f} below {self.min_confidence:g}")
+        return problems
+
+    def record(self, model: str, latency: float, problems: List[str], escalated: bool) -> None:
+        """Record one model's attempt at a document.
+
+        Args:
+            model: Model called
+            latency: Seconds the call took
+            problems: Problems found in its result
+            escalated: Whether the document was sent on to the next model
+        """
+        tier = self.tiers.setdefault(model, {
+            "calls": 0, "accepted": 0, "escalated": 0, "latencies": deque(maxlen=LATENCY_SAMPLES)
+        })
+        tier["calls"] += 1
+        if not problems:
+            tier["accepted"] += 1
+        if escalated:
+            tier["escalated"] += 1
+        tier["latencies"].append(latency)
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, acceptance rate, escalations and latency per model."""
+        tiers = {}
+        for model, tier in self.tiers.items():
+            latencies = sorted(tier["latencies"])
+            tiers[model] = {
+                "calls": tier["calls"],
+                "accepted": tier["accepted"],
+                "escalated": tier["escalated"],
+                "hit_rate": tier["accepted"] / tier["calls"] if tier["calls"] else 0.0,
+                "latency_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+                "latency_p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            }
+        return {"models": self.models, "min_confidence": self.min_confidence, "tiers": tiers}
+
+
+_cascade: Optional[ModelCascade] = None
+
+
+def get_model_cascade() -> ModelCascade:
+    """The cascade shared by every Gemini processor in this process."""
+    global _cascade
+    if _cascade is None:
+        _cascade = ModelCascade()
+    return _cascade
@@ -0,0 +1,120 @@
+"""
+Keyword scoring of PDF pages, to send the LLM only the pages with loan details.
+
+Dealer packets run to dozens of pages of disclosures and terms, while the
+borrower, vehicle and loan terms sit on a few. Pages are scored on their text
+layer; pages without one can't be judged and are always kept.
+"""
+import logging
+import os
+import re
+from typing import Dict, List
+
+from app.services.pdf_text import PDFTextLayer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Whether to drop pages unlikely to hold loan details
+PDF_PAGE_FILTER = os.environ.get("PDF_PAGE_FILTER", "1") == "1"
+
+# Documents this short are sent whole
+PDF_PAGE_FILTER_MIN_PAGES = int(os.environ.get("PDF_PAGE_FILTER_MIN_PAGES", "5"))
+
+# Most pages sent from a longer document, highest scoring first
+PDF_PAGE_FILTER_MAX_PAGES = int(os.environ.get("PDF_PAGE_FILTER_MAX_PAGES", "10"))
+
+# Score a page needs to be kept
+PAGE_RELEVANCE_THRESHOLD = 4.0
+
+# Phrases that mark the fields the loan application is built from
+KEYWORDS: Dict[str, List[str]] = {
+    "borrower": [
+        "borrower", "co-borrower", "buyer", "co-buyer", "applicant", "co-applicant",
+        "date of birth", "social security", "employer", "employment", "annual income",
+        "monthly income", "credit score", "phone", "email",
+    ],
+    "vehicle": [
+        "vin", "vehicle identification", "make", "model", "year", "odometer",
+        "mileage", "vehicle", "trade-in", "new/used",
+    ],
+    "loan": [
+        "amount financed", "annual percentage rate", "apr", "finance charge",
+        "total of payments", "monthly payment", "down payment", "term",
+        "interest rate", "loan amount", "cash price", "number of payments",
+    ],
+}
+
+# Filled-in values, as opposed to boilerplate describing them
+VIN_PATTERN = re.compile(r"\b[A-HJ-NPR-Z0-9]{17}\b")
+AMOUNT_PATTERN = re.compile(r"\$\s?\d[\d,]*(?:\.\d{2})?")
+
+# All phrases in one pattern, so each page is scanned once; longest first so
+# "co-borrower" is not matched as "borrower"
+KEYWORD_PATTERN = re.compile(
+    r"\b(" + "|".join(
+        re.escape(phrase) for phrase in sorted(
+            {phrase for phrases in KEYWORDS.values() for phrase in phrases}, key=len, reverse=True
+        )
+    ) + r")\b",
+    re.IGNORECASE
+)
+
+
+def score_page(text: str) -> float:
+    """Score how likely a page is to hold borrower, vehicle or loan details.
+
+    Each category counts its distinct phrases on the page (up to 4). A VIN and
+    dollar amounts add to the score, since they show values rather than terms.
+
+    Args:
+        text: Text layer of the page
+
+    Returns:
+        Relevance score; 0 for a page with no matches
+    """
+    found = {match.lower() for match in KEYWORD_PATTERN.findall(text)}
+    score = 0.0
+    for phrases in KEYWORDS.values():
+        score += min(sum(1 for phrase in phrases if phrase in found), 4)
+    if VIN_PATTERN.search(text):
+        score += 3
+    score += min(len(AMOUNT_PATTERN.findall(text)), 6) * 0.5
+    return score
+
+
+def select_relevant_pages(layer: PDFTextLayer) -> PDFTextLayer:
+    """Mark which pages of a long document to send to the LLM.
+
+    The first page (which usually says what the document is), pages without a
+    text layer and the highest scoring pages above the threshold are kept,
+    up to PDF_PAGE_FILTER_MAX_PAGES text pages. If no page scores, nothing
+    is dropped.
+
+    Args:
+        layer: Extracted text layer; its pages' relevance and selected flags are set
+
+    Returns:
+        The same text layer
+    """
+    for page in layer.pages:
+        page.relevance = score_page(page.text) if page.has_text_layer else 0.0
+
+    if not PDF_PAGE_FILTER or layer.page_count < PDF_PAGE_FILTER_MIN_PAGES:
+        return layer
+
+    candidates = [
+        page for page in layer.pages
+        if page.has_text_layer and page.number > 0 and page.relevance >= PAGE_RELEVANCE_THRESHOLD
+    ]
+    if not candidates:
+        logger.info(f"No page of {layer.page_count} scored as relevant; sending them all")
+        return layer
+
+    candidates.sort(key=lambda page: page.relevance, reverse=True)
+    keep = {page.number for page in candidates[:PDF_PAGE_FILTER_MAX_PAGES - 1]}
+    for page in layer.pages:
+        page.selected = page.number == 0 or not page.has_text_layer or page.number in keep
+
+    logger.info(f"Selected {len(layer.selected_pages)} of {layer.page_count} pages as relevant")
+    return layer
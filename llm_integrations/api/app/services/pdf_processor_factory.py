@@ -5,6 +5,7 @@ import os
 import logging
 from typing import Any, Dict
 
+from app.services.fake_gemini import GEMINI_BACKEND, FakeGeminiClient, FakeGeminiModels
 from app.services.gemini_pdf_processor import GeminiPDFProcessor
 
 # Configure logging
@@ -21,7 +22,7 @@ class PDFProcessorFactory:
         """Get a processor instance based on the provider.
         
         Args:
-            provider: The LLM provider to use. Options: "gemini"
+            provider: The LLM provider to use. Options: "gemini", "fake"
             
         Returns:
             PDF processor instance
@@ -39,11 +40,15 @@ class PDFProcessorFactory:
         
         if provider == "gemini":
             google_api_key = os.environ.get("GOOGLE_API_KEY")
-            if not google_api_key:
+            if not google_api_key and GEMINI_BACKEND in ("live", "record"):
                 raise ValueError("Google API key not configured (GOOGLE_API_KEY)")
                 
-            # Create and store the instance
+            # Create and store the instance; GEMINI_BACKEND can swap in an offline client
             cls._instances[provider] = GeminiPDFProcessor(google_api_key=google_api_key)
             return cls._instances[provider]
+        elif provider == "fake":
+            # Offline stand-in for load tests, configured by the FAKE_GEMINI_* settings
+            cls._instances[provider] = GeminiPDFProcessor(client=FakeGeminiClient(FakeGeminiModels()))
+            return cls._instances[provider]
         else:
-            raise ValueError(f"Unsupported provider: {provider}. Supported option is 'gemini'")
\ No newline at end of file
+            raise ValueError(f"Unsupported provider: {provider}. Supported options are 'gemini' and 'fake'")
\ No newline at end of file
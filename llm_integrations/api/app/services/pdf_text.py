@@ -0,0 +1,133 @@
+"""
+Local extraction of a PDF's text layer and form fields with PyMuPDF.
+
+Machine-generated PDFs carry their text, so the LLM can be given that text
+instead of the whole file. Pages without a usable text layer (scans, photos)
+are kept as PDF for the model to read visually.
+"""
+import logging
+import os
+from typing import Dict, List
+
+import pymupdf
+from pydantic import BaseModel
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Whether to try the text layer before sending the whole PDF to the LLM
+PDF_TEXT_LAYER = os.environ.get("PDF_TEXT_LAYER", "1") == "1"
+
+# A page needs at least this much text, mostly readable, to skip the visual path
+PDF_TEXT_MIN_CHARS_PER_PAGE = int(os.environ.get("PDF_TEXT_MIN_CHARS_PER_PAGE", "200"))
+PDF_TEXT_MIN_READABLE_RATIO = 0.9
+READABLE_PUNCTUATION = set("$%.,:;!?-/()[]#&'\"@+*=_")
+
+
+class PageText(BaseModel):
+    """Text layer of one page."""
+    number: int
+    text: str
+    has_text_layer: bool
+    # Set by page relevance filtering; unselected pages are not sent to the LLM
+    relevance: float = 0.0
+    selected: bool = True
+
+
+class PDFTextLayer(BaseModel):
+    """Text, page count and form fields extracted from a PDF."""
+    page_count: int
+    pages: List[PageText] = []
+    form_fields: Dict[str, str] = {}
+
+    @property
+    def selected_pages(self) -> List[int]:
+        """Zero-based numbers of the pages to send to the LLM."""
+        return [page.number for page in self.pages if page.selected]
+
+    @property
+    def scanned_pages(self) -> List[int]:
+        """Zero-based numbers of the selected pages without a usable text layer."""
+        return [page.number for page in self.pages if page.selected and not page.has_text_layer]
+
+    @property
+    def extraction_path(self) -> str:
+        """How the document should go to the LLM: "text", "mixed" or "pdf"."""
+        scanned = len(self.scanned_pages)
+        selected = len(self.selected_pages)
+        if scanned == 0 and selected > 0:
+            return "text"
+        if scanned < selected:
+            return "mixed"
+        return "pdf"
+
+    def to_prompt_text(self) -> str:
+        """Render the selected text pages and the form fields for the LLM prompt."""
+        sections = []
+        for page in self.pages:
+            if not page.selected:
+                continue
+            if page.has_text_layer:
+                sections.append(f"--- Page {page.number + 1} of {self.page_count} ---\n{page.text}")
+            else:
+                sections.append(f"--- Page {page.number + 1} of {self.page_count}: scanned, see attached PDF ---")
+
+        omitted = self.page_count - len(self.selected_pages)
+        if omitted:
+            sections.append(f"--- {omitted} pages without loan details omitted ---")
+
+        if self.form_fields:
+            fields = "\n".join(f"{name}: {value}" for name, value in self.form_fields.items())
+            sections.append(f"--- Form fields ---\n{fields}")
+        return "\n\n".join(sections)
+
+
+def is_readable(text: str) -> bool:
+    """Whether text looks like a real text layer rather than a few stray or garbled glyphs."""
+    stripped = "".join(text.split())
+    if len(stripped) < PDF_TEXT_MIN_CHARS_PER_PAGE:
+        return False
+    # Broken font encodings come out as replacement characters or symbol soup
+    readable = sum(1 for char in stripped if char.isalnum() or char in READABLE_PUNCTUATION)
+    return readable / len(stripped) >= PDF_TEXT_MIN_READABLE_RATIO
+
+
+def extract_text_layer(pdf_bytes: bytes) -> PDFTextLayer:
+    """Extract the text of every page and the filled-in form fields.
+
+    CPU-bound; call it from a worker thread.
+
+    Args:
+        pdf_bytes: PDF file content
+
+    Returns:
+        The extracted text layer
+
+    Raises:
+        RuntimeError: If the PDF can't be opened (pymupdf raises subclasses of it)
+    """
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as document:
+        layer = PDFTextLayer(page_count=document.page_count)
+        for page in document:
+            text = page.get_text("text").strip()
+            layer.pages.append(PageText(number=page.number, text=text, has_text_layer=is_readable(text)))
+
+            for widget in page.widgets() or []:
+                if widget.field_name and widget.field_value not in (None, "", "Off"):
+                    layer.form_fields[widget.field_name] = str(widget.field_value)
+        return layer
+
+
+def extract_pages(pdf_bytes: bytes, page_numbers: List[int]) -> bytes:
+    """Build a PDF holding only the given pages, for the visual path.
+
+    Args:
+        pdf_bytes: PDF file content
+        page_numbers: Zero-based numbers of the pages to keep
+
+    Returns:
+        The smaller PDF
+    """
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as document:
+        document.select(page_numbers)
+        return document.tobytes(garbage=3, deflate=True)
@@ -0,0 +1,291 @@
+"""
+Admission control for Gemini calls: request and token budgets, adaptive
+concurrency and priority lanes.
+
+Every call waits for a permit. A permit needs a free concurrency slot, one
+request from the requests-per-minute bucket and the call's estimated tokens
+from the tokens-per-minute bucket. Waiting calls are admitted interactive
+lane first, then batch, each in arrival order.
+
+The concurrency limit adapts AIMD-style: each successful call raises it by
+1/limit (about one slot per limit calls), and a 429, 5xx or timeout halves
+it, at most once per cooldown so one burst of failures counts once.
+
+Configuration (environment):
+    GEMINI_RPM                   requests per minute; 0 for no budget
+    GEMINI_TPM                   tokens per minute; 0 for no budget
+    LLM_MAX_CONCURRENCY          highest concurrency limit
+    LLM_MIN_CONCURRENCY          lowest concurrency limit
+    LLM_CONCURRENCY_COOLDOWN     seconds between two decreases of the limit
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from google.genai import errors
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+GEMINI_RPM = int(os.environ.get("GEMINI_RPM", "0"))
+GEMINI_TPM = int(os.environ.get("GEMINI_TPM", "0"))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+LLM_MIN_CONCURRENCY = int(os.environ.get("LLM_MIN_CONCURRENCY", "1"))
+LLM_CONCURRENCY_COOLDOWN = float(os.environ.get("LLM_CONCURRENCY_COOLDOWN", "2"))
+
+# Lanes in admission order: a reviewer waiting on a document comes before queued jobs
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+# Wait times kept per lane for the percentiles in stats()
+WAIT_SAMPLES = 1000
+
+
+class TokenBucket:
+    """Budget refilled continuously at a per-minute rate, up to one minute's worth."""
+
+    def __init__(self, per_minute: int):
+        """Initialize a full bucket.
+
+        Args:
+            per_minute: Budget per minute; 0 for no budget
+        """
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def refill(self, now: float) -> None:
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available; amounts over capacity only need a full bucket."""
+        if self.unlimited:
+            return 0.0
+        needed = min(amount, self.capacity) - self.level
+        return max(needed, 0.0) / self.rate
+
+    def take(self, amount: float) -> None:
+        """Spend amount; the level may go negative, delaying the calls after it."""
+        if not self.unlimited:
+            self.level -= amount
+
+
+class GeminiRateLimiter:
+    """Shared admission control in front of the Gemini client."""
+
+    def __init__(
+        self,
+        requests_per_minute: int = GEMINI_RPM,
+        tokens_per_minute: int = GEMINI_TPM,
+        min_concurrency: int = LLM_MIN_CONCURRENCY,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        cooldown: float = LLM_CONCURRENCY_COOLDOWN,
+    ):
+        """Initialize the limiter at its highest concurrency.
+
+        Args:
+            requests_per_minute: Requests per minute; 0 for no budget
+            tokens_per_minute: Tokens per minute; 0 for no budget
+            min_concurrency: Lowest concurrency limit
+            max_concurrency: Highest concurrency limit
+            cooldown: Seconds between two decreases of the limit
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.min_concurrency = max(min_concurrency, 1)
+        self.max_concurrency = max(max_concurrency, self.min_concurrency)
+        self.cooldown = cooldown
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+
+        # Waiters as (lane index, arrival order, future, tokens, priority)
+        self._waiters: List[Any] = []
+        self._order = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.admitted = {priority: 0 for priority in PRIORITIES}
+        self.waits: Dict[str, Deque[float]] = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITIES}
+        self.outcomes = {"success": 0, "rate_limited": 0, "server_error": 0, "timeout": 0, "other_error": 0}
+        self.decreases = 0
+
+    @asynccontextmanager
+    async def acquire(self, priority: str = PRIORITY_INTERACTIVE, tokens: int = 0) -> AsyncIterator["Permit"]:
+        """Wait for a permit to call Gemini, and release it when the call ends.
+
+        The outcome of the call adjusts the concurrency limit: an exception
+        leaving the block is classified, anything else counts as a success.
+
+        Args:
+            priority: Lane to wait in, interactive or batch
+            tokens: Estimated tokens of the call, taken from the token budget
+
+        Yields:
+            Permit on which the call's actual token count can be recorded
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}. Options are {', '.join(PRIORITIES)}")
+
+        enqueued = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.index(priority), next(self._order), future, tokens, priority))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Admitted just as the caller was cancelled: hand the slot back
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        self.waits[priority].append(time.monotonic() - enqueued)
+
+        permit = Permit(tokens)
+        try:
+            yield permit
+        except BaseException as e:
+            self._record(e)
+            raise
+        else:
+            self._record(None)
+            # Settle the estimate against the tokens actually used
+            if permit.actual_tokens is not None:
+                self.tokens.take(permit.actual_tokens - tokens)
+        finally:
+            self._release()
+
+    def has_capacity(self) -> bool:
+        """Whether a call would be admitted now without waiting for a slot."""
+        return not self._waiters and self.in_flight < int(self.limit)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit waiters in priority order while a slot and the budgets allow."""
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+
+        while self._waiters:
+            _, _, future, tokens, priority = self._waiters[0]
+            if future.done():
+                # Cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= int(self.limit):
+                return
+
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait > 0:
+                self._schedule(wait)
+                return
+
+            heapq.heappop(self._waiters)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            self.admitted[priority] += 1
+            future.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        """Run _dispatch again once the budgets have refilled."""
+        loop = asyncio.get_running_loop()
+        if self._timer is not None:
+            if self._timer.when() <= loop.time() + delay:
+                return
+            self._timer.cancel()
+
+        def wake() -> None:
+            self._timer = None
+            self._dispatch()
+
+        self._timer = loop.call_later(delay, wake)
+
+    def _record(self, error: Optional[BaseException]) -> None:
+        """Adjust the concurrency limit for a call's outcome."""
+        if error is None:
+            self.outcomes["success"] += 1
+            self.limit = min(self.limit + 1 / self.limit, float(self.max_concurrency))
+            return
+
+        if isinstance(error, errors.APIError) and error.code == 429:
+            self.outcomes["rate_limited"] += 1
+        elif isinstance(error, errors.ServerError):
+            self.outcomes["server_error"] += 1
+        elif isinstance(error, asyncio.TimeoutError):
+            self.outcomes["timeout"] += 1
+        else:
+            # Bad requests and cancellations say nothing about provider load
+            if not isinstance(error, asyncio.CancelledError):
+                self.outcomes["other_error"] += 1
+            return
+
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self._last_decrease = now
+            self.limit = max(self.limit / 2, float(self.min_concurrency))
+            self.decreases += 1
+            logger.warning(f"Gemini overloaded ({type(error).__name__}): concurrency limit lowered to {int(self.limit)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Concurrency limit, queue depth, wait times and call outcomes."""
+        queued = {priority: 0 for priority in PRIORITIES}
+        for _, _, future, _, priority in self._waiters:
+            if not future.done():
+                queued[priority] += 1
+
+        lanes = {}
+        for priority in PRIORITIES:
+            waits = sorted(self.waits[priority])
+            lanes[priority] = {
+                "queued": queued[priority],
+                "admitted": self.admitted[priority],
+                "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+                "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                "wait_max": waits[-1] if waits else 0.0,
+            }
+
+        return {
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "limit_decreases": self.decreases,
+            "requests_available": None if self.requests.unlimited else int(self.requests.level),
+            "tokens_available": None if self.tokens.unlimited else int(self.tokens.level),
+            "lanes": lanes,
+            "outcomes": dict(self.outcomes),
+        }
+
+
+class Permit:
+    """Admission for one Gemini call."""
+
+    def __init__(self, estimated_tokens: int):
+        self.estimated_tokens = estimated_tokens
+        # Set from the response's usage metadata when it reports one
+        self.actual_tokens: Optional[int] = None
+
+
+_limiter: Optional[GeminiRateLimiter] = None
+
+
+def get_gemini_limiter() -> GeminiRateLimiter:
+    """The limiter shared by every Gemini processor in this process."""
+    global _limiter
+    if _limiter is None:
+        _limiter = GeminiRateLimiter()
+    return _limiter
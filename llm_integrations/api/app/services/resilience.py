@@ -0,0 +1,294 @@
+"""
+Retries, hedged requests and a circuit breaker for Gemini calls.
+
+A call that fails with a retryable error (429, 5xx or a timeout) is retried
+after a jittered exponential backoff, or after the delay a 429 asks for.
+With hedging on, a call still running after the p95 latency of recent calls
+gets a second copy, and whichever answers first wins.
+
+The circuit breaker opens after a run of consecutive retryable failures.
+While open, calls fail fast with CircuitOpenError instead of queueing up
+behind a degraded provider; after a pause one probe call is let through,
+and its success closes the circuit again.
+
+Configuration (environment):
+    LLM_RETRY_ATTEMPTS          attempts per call, including the first
+    LLM_RETRY_BASE_DELAY        seconds before the first retry, doubled each time
+    LLM_RETRY_MAX_DELAY         longest wait between attempts
+    LLM_HEDGE                   1 to hedge slow calls
+    LLM_HEDGE_MIN_SAMPLES       latencies needed before hedging starts
+    LLM_BREAKER_FAILURES        consecutive failures that open the circuit
+    LLM_BREAKER_RESET_SECONDS   how long the circuit stays open before a probe
+"""
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from google.genai import errors
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+LLM_RETRY_ATTEMPTS = int(os.environ.get("LLM_RETRY_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "1"))
+LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "20"))
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# Latencies of recent successful calls, for the hedging threshold
+LATENCY_SAMPLES = 200
+
+RETRY_DELAY_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)s$")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider that is failing."""
+
+    def __init__(self, retry_in: float):
+        self.retry_in = retry_in
+        super().__init__(f"Gemini is unavailable after repeated failures; retrying in {retry_in:.0f} seconds")
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error is a transient provider failure worth another attempt."""
+    if isinstance(error, errors.APIError):
+        return error.code == 429 or isinstance(error, errors.ServerError)
+    return isinstance(error, asyncio.TimeoutError)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Delay a rate-limit error asks for, from its google.rpc.RetryInfo detail."""
+    details = getattr(error, "details", None)
+    if not isinstance(details, dict):
+        return None
+    for detail in details.get("error", {}).get("details", None) or []:
+        if isinstance(detail, dict) and detail.get("@type", "").endswith("RetryInfo"):
+            found = RETRY_DELAY_PATTERN.match(str(detail.get("retryDelay", "")))
+            if found:
+                return float(found.group(1))
+    return None
+
+
+class CircuitBreaker:
+    """Closed, open or half-open state of the provider."""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        """Initialize a closed circuit.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_seconds: How long the circuit stays open before a probe
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    def check(self) -> None:
+        """Let a call through, or raise CircuitOpenError.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe already running
+        """
+        if self.state == "closed":
+            return
+        retry_in = self.opened_at + self.reset_seconds - time.monotonic()
+        if self.state == "open" and retry_in <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return
+        self.short_circuited += 1
+        raise CircuitOpenError(max(retry_in, 0.0))
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Gemini probe succeeded: circuit closed")
+        self.state = "closed"
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"Gemini failed {self.failures} times in a row: circuit open for {self.reset_seconds:g}s")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Free the half-open probe slot after a call that neither succeeded nor failed."""
+        self.probing = False
+
+
+class ResilientCaller:
+    """Runs calls with retries, optional hedging and a circuit breaker."""
+
+    def __init__(
+        self,
+        attempts: int = LLM_RETRY_ATTEMPTS,
+        base_delay: float = LLM_RETRY_BASE_DELAY,
+        max_delay: float = LLM_RETRY_MAX_DELAY,
+        hedge: bool = LLM_HEDGE,
+        hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        """Initialize the caller.
+
+        Args:
+            attempts: Attempts per call, including the first
+            base_delay: Seconds before the first retry, doubled each time
+            max_delay: Longest wait between attempts
+            hedge: Whether to hedge calls slower than the p95 latency
+            hedge_min_samples: Latencies needed before hedging starts
+            breaker: Circuit breaker (default: a new one)
+        """
+        self.attempts = max(attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.counts = {
+            "calls": 0, "attempts": 0, "retries": 0, "succeeded": 0, "failed": 0,
+            "hedges": 0, "hedges_won": 0,
+        }
+
+    def hedge_delay(self) -> Optional[float]:
+        """p95 of recent latencies, or None while hedging is off or has too few samples."""
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95)]
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """Full-jitter exponential delay before the next attempt, at least what a 429 asks for."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        requested = retry_after(error)
+        if requested is not None:
+            delay = max(delay, min(requested, self.max_delay))
+        return delay
+
+    async def call(
+        self,
+        make_call: Callable[[], Awaitable[Any]],
+        hedge_allowed: Optional[Callable[[], bool]] = None
+    ) -> Any:
+        """Run a call with retries, hedging and the circuit breaker.
+
+        Args:
+            make_call: Coroutine function making one attempt
+            hedge_allowed: Whether a hedge may be sent now, e.g. if the rate limiter has room
+
+        Returns:
+            The first successful attempt's result
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            Exception: The last attempt's error once retries are used up, or a non-retryable error
+        """
+        self.counts["calls"] += 1
+        attempt = 0
+        while True:
+            try:
+                self.breaker.check()
+            except CircuitOpenError:
+                if attempt:
+                    self.counts["failed"] += 1
+                raise
+            try:
+                result = await self._attempt(make_call, hedge_allowed)
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release_probe()
+                    self.counts["failed"] += 1
+                    raise
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt >= self.attempts:
+                    self.counts["failed"] += 1
+                    raise
+                delay = self.backoff(attempt - 1, e)
+                self.counts["retries"] += 1
+                logger.warning(f"Gemini call failed ({str(e)[:100]}); retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self.counts["succeeded"] += 1
+            return result
+
+    async def _attempt(self, make_call: Callable[[], Awaitable[Any]], hedge_allowed: Optional[Callable[[], bool]]) -> Any:
+        """One attempt, hedged with a second copy if it runs past the p95 latency."""
+        self.counts["attempts"] += 1
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(make_call())
+        tasks = [primary]
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and (hedge_allowed is None or hedge_allowed()):
+                    self.counts["hedges"] += 1
+                    logger.info(f"Gemini call slower than p95 ({delay:.1f}s): sending a hedged request")
+                    tasks.append(asyncio.ensure_future(make_call()))
+
+            # First success wins; an attempt that fails leaves the other to finish
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.counts["hedges_won"] += 1
+                        self.latencies.append(time.perf_counter() - started)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Call counts, hedging threshold and circuit state."""
+        delay = self.hedge_delay()
+        return {
+            **self.counts,
+            "hedge_enabled": self.hedge,
+            "hedge_delay": delay,
+            "circuit": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.failures,
+                "times_opened": self.breaker.times_opened,
+                "short_circuited": self.breaker.short_circuited,
+            },
+        }
+
+
+_caller: Optional[ResilientCaller] = None
+
+
+def get_gemini_caller() -> ResilientCaller:
+    """The caller shared by every Gemini processor in this process, so they share one circuit."""
+    global _caller
+    if _caller is None:
+        _caller = ResilientCaller()
+    return _caller
@@ -0,0 +1,70 @@
+"""
+In-flight deduplication of identical async work.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result.
+
+    The work runs in its own task, so a caller that is cancelled does not
+    cancel it for the others. It is only cancelled once every caller waiting
+    on it has gone.
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        # key -> [shared task, number of callers waiting on it]
+        self._calls: Dict[str, List[Any]] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Await work() for key, joining a call already in flight for the same key.
+
+        Args:
+            key: Identity of the work; equal keys must produce equal results
+            work: Coroutine function doing the work
+
+        Returns:
+            The result of the shared call
+        """
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(work())
+            call = [task, 0]
+            self._calls[key] = call
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+            logger.info(f"Joining in-flight call for key: {key[:10]}...")
+
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and call[1] == 1:
+                task.cancel()
+            raise
+        finally:
+            call[1] -= 1
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        call = self._calls.get(key)
+        if call is not None and call[0] is task:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Counts of executed and coalesced calls, and calls currently in flight."""
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+        }
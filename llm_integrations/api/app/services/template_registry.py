@@ -0,0 +1,216 @@
+"""
+Registry of known document templates, extracted with rules instead of the LLM.
+
+A template is recognized by phrases in its text layer (its fingerprint) and
+its fields are read with regex rules, optionally limited to a region of a
+page. Templates are JSON files in TEMPLATE_DIR, for example:
+
+    {
+      "name": "dealer_sales_contract",
+      "document_type": "Sales Contract",
+      "fingerprint": ["retail installment sale contract", "amount financed"],
+      "fields": {
+        "loan_amount": {"pattern": "Amount Financed\\s*\\$?([\\d,]+\\.\\d{2})", "type": "money", "required": true},
+        "vehicle_details.vin": {"page": 0, "rect": [40, 120, 300, 140], "pattern": "([A-HJ-NPR-Z0-9]{17})"},
+        "borrowers[0].full_name": {"pattern": "Buyer Name:\\s*(.+)", "required": true}
+      }
+    }
+
+Field names are paths into the loan application: top-level fields, then
+"vehicle_details.<field>" and "borrowers[<n>].<field>"; borrowers after
+the first are co-borrowers.
+"""
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pymupdf
+from pydantic import BaseModel, ValidationError
+
+from app.models.document_models import LoanApplicationModel
+from app.services.pdf_text import PDFTextLayer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Whether to try known templates before calling the LLM
+TEMPLATE_FAST_PATH = os.environ.get("TEMPLATE_FAST_PATH", "1") == "1"
+TEMPLATE_DIR = os.environ.get("TEMPLATE_DIR", str(Path(__file__).resolve().parents[2] / "templates"))
+
+BORROWER_PATH = re.compile(r"borrowers\[(\d+)\]\.(\w+)$")
+
+
+class FieldRule(BaseModel):
+    """How to read one field of a template."""
+    # Regex whose first group (or whole match) is the value; by default the
+    # first non-empty line, which suits rules limited to a region
+    pattern: str = r"(\S.*)"
+    # Zero-based page to read; every page when not set
+    page: Optional[int] = None
+    # Region of the page to read, as x0, y0, x1, y1 in points
+    rect: Optional[List[float]] = None
+    # str, int, float, money or percent
+    type: str = "str"
+    # Turn off for patterns like VINs, where case tells values from words
+    ignore_case: bool = True
+    # A template match missing a required field goes to the LLM
+    required: bool = False
+
+
+class DocumentTemplate(BaseModel):
+    """A known document layout and the rules to read it."""
+    name: str
+    document_type: str
+    fingerprint: List[str]
+    fields: Dict[str, FieldRule]
+    # Share of fields that must be read for the result to be used
+    min_confidence: float = 0.8
+
+
+class TemplateMatch(BaseModel):
+    """Fields read from a document with a template's rules."""
+    template: str
+    document_type: str
+    loan_application: Dict[str, Any] = {}
+    confidence: float = 0.0
+    missing: List[str] = []
+    errors: List[str] = []
+    accepted: bool = False
+
+
+def parse_value(raw: str, value_type: str) -> Any:
+    """Convert text read by a rule to the field's type.
+
+    Raises:
+        ValueError: If the text is not a valid value of that type
+    """
+    text = " ".join(raw.split())
+    if value_type in ("money", "float", "percent"):
+        return float(text.replace("$", "").replace(",", "").replace("%", "").strip())
+    if value_type == "int":
+        return int(text.replace(",", "").strip())
+    if not text:
+        raise ValueError("empty value")
+    return text
+
+
+def set_path(data: Dict[str, Any], path: str, value: Any) -> None:
+    """Set a field of a loan application dict by its template path."""
+    borrower = BORROWER_PATH.match(path)
+    if borrower:
+        index, field = int(borrower.group(1)), borrower.group(2)
+        borrowers = data.setdefault("borrowers", [])
+        while len(borrowers) <= index:
+            borrowers.append({"is_co_borrower": len(borrowers) > 0})
+        borrowers[index][field] = value
+    elif path.startswith("vehicle_details."):
+        data.setdefault("vehicle_details", {})[path.split(".", 1)[1]] = value
+    else:
+        data[path] = value
+
+
+class TemplateRegistry:
+    """Known templates, matched against a document's text layer."""
+
+    def __init__(self, templates: List[DocumentTemplate]):
+        """Initialize the registry.
+
+        Args:
+            templates: Templates to match, tried in order
+        """
+        self.templates = templates
+
+    @classmethod
+    def load(cls, directory: str = TEMPLATE_DIR) -> "TemplateRegistry":
+        """Load every *.json template in a directory; invalid files are logged and skipped."""
+        templates = []
+        for path in sorted(Path(directory).glob("*.json")):
+            try:
+                templates.append(DocumentTemplate.model_validate_json(path.read_text()))
+            except (OSError, ValidationError) as e:
+                logger.error(f"Skipping invalid template {path}: {str(e)}")
+        logger.info(f"Loaded {len(templates)} document templates from {directory}")
+        return cls(templates)
+
+    def detect(self, layer: PDFTextLayer) -> Optional[DocumentTemplate]:
+        """Find the template whose fingerprint phrases all appear in the document.
+
+        Args:
+            layer: Extracted text layer of the document
+
+        Returns:
+            The matching template, or None for an unknown layout
+        """
+        text = " ".join(" ".join(page.text for page in layer.pages).split()).lower()
+        for template in self.templates:
+            if all(phrase.lower() in text for phrase in template.fingerprint):
+                return template
+        return None
+
+    def extract(self, template: DocumentTemplate, layer: PDFTextLayer, pdf_bytes: bytes) -> TemplateMatch:
+        """Read a document's fields with a template's rules.
+
+        CPU-bound; call it from a worker thread.
+
+        Args:
+            template: Template detected for the document
+            layer: Extracted text layer of the document
+            pdf_bytes: PDF file content, read for rules limited to a region
+
+        Returns:
+            The fields read, with the share of fields found as confidence
+        """
+        match = TemplateMatch(template=template.name, document_type=template.document_type)
+        document = None
+        try:
+            for path, rule in template.fields.items():
+                if rule.rect is not None:
+                    document = document or pymupdf.open(stream=pdf_bytes, filetype="pdf")
+                    page_number = rule.page or 0
+                    texts = (
+                        [document[page_number].get_text("text", clip=pymupdf.Rect(*rule.rect))]
+                        if page_number < document.page_count else []
+                    )
+                elif rule.page is not None:
+                    texts = [layer.pages[rule.page].text] if rule.page < len(layer.pages) else []
+                else:
+                    texts = [page.text for page in layer.pages]
+
+                value = None
+                for text in texts:
+                    flags = re.MULTILINE | (re.IGNORECASE if rule.ignore_case else 0)
+                    found = re.search(rule.pattern, text, flags)
+                    if found:
+                        try:
+                            value = parse_value(found.group(1) if found.groups() else found.group(0), rule.type)
+                        except ValueError:
+                            match.errors.append(f"Unreadable value for {path}: {found.group(0)!r}")
+                        break
+
+                if value is None:
+                    match.missing.append(path)
+                else:
+                    set_path(match.loan_application, path, value)
+        finally:
+            if document is not None:
+                document.close()
+
+        match.confidence = 1 - len(match.missing) / len(template.fields) if template.fields else 0.0
+
+        # Check the fields fit the loan application model the LLM path produces
+        try:
+            match.loan_application = LoanApplicationModel(**match.loan_application).model_dump(
+                mode="json", exclude_unset=True
+            )
+        except ValidationError as e:
+            match.errors.append(f"Template fields don't fit the loan application: {str(e)}")
+
+        required_missing = [path for path in match.missing if template.fields[path].required]
+        match.accepted = (
+            not required_missing
+            and not match.errors
+            and match.confidence >= template.min_confidence
+        )
+        return match
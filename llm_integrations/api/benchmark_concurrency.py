@@ -0,0 +1,146 @@
+"""
+Benchmark concurrent document analyses through GeminiPDFProcessor.
+
+Runs N analyses at once and reports wall-clock time against the sum and the
+maximum of the individual latencies, plus the worst event loop stall seen by
+a heartbeat task. With non-blocking Gemini calls the wall time tracks the
+slowest analysis rather than the sum of all of them.
+
+By default Gemini is replaced by the offline fake backend (see
+app/services/fake_gemini.py), so the benchmark needs no API key. --latency
+takes a fixed latency in seconds or a distribution spec, and a share of calls
+can be made to fail with 500 or 429 errors. --blocking simulates the old
+synchronous client for comparison. Pass --live with a PDF to measure real
+calls instead; run it with GEMINI_BACKEND=record to save the responses, then
+--replay them for repeatable runs without the API.
+
+    python benchmark_concurrency.py --concurrency 8 --latency 2
+    python benchmark_concurrency.py --concurrency 8 --latency 2 --blocking
+    python benchmark_concurrency.py --concurrency 50 --latency lognormal:1500:0.5 --rate-limit-rate 0.05
+    GEMINI_BACKEND=record python benchmark_concurrency.py --live --pdf contract.pdf --concurrency 5
+    python benchmark_concurrency.py --replay ./gemini_recordings --pdf contract.pdf --concurrency 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+# The benchmark measures Gemini latency, not the cache
+os.environ["CACHE_LLM_CALLS"] = "0"
+
+from app.services.fake_gemini import CANNED_RESPONSE, FakeGeminiClient, FakeGeminiModels, FakeResponse
+from app.services.gemini_pdf_processor import GeminiPDFProcessor
+
+
+class BlockingModels(FakeGeminiModels):
+    """Fake backend that blocks the event loop, as a synchronous SDK call inside a coroutine does."""
+
+    async def generate_content(self, *, model, contents, config=None):
+        self.calls += 1
+        self.max_in_flight = 1
+        time.sleep(self.latency.sample() or 0.0)
+        return FakeResponse(json.dumps(CANNED_RESPONSE))
+
+
+async def heartbeat(interval: float, stalls: list, stop: asyncio.Event):
+    """Record how late the event loop wakes this task up"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        stalls.append(max(0.0, time.perf_counter() - expected))
+
+
+async def timed_analysis(processor: GeminiPDFProcessor, pdf_bytes: bytes, index: int) -> tuple:
+    # Distinct options per call so every analysis reaches Gemini
+    options = {"model_name": "gemini-2.0-flash", "benchmark_run": index}
+    started = time.perf_counter()
+    result = await processor.process_pdf(pdf_bytes, options)
+    return time.perf_counter() - started, bool(result["errors"])
+
+
+async def run_benchmark(processor: GeminiPDFProcessor, pdf_bytes: bytes, concurrency: int) -> dict:
+    stalls = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(heartbeat(0.05, stalls, stop))
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*[
+        timed_analysis(processor, pdf_bytes, index) for index in range(concurrency)
+    ])
+    wall = time.perf_counter() - started
+
+    stop.set()
+    await monitor
+    latencies = sorted(latency for latency, _ in outcomes)
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "concurrency": concurrency,
+        "wall": wall,
+        "sum": sum(latencies),
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+        "max": latencies[-1],
+        "failed": sum(1 for _, failed in outcomes if failed),
+        "max_loop_stall": max(stalls, default=0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent LLM document analyses")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of simultaneous analyses (default: 8)")
+    parser.add_argument("--latency", default="2",
+                        help="Simulated Gemini latency: seconds, or a spec such as lognormal:1500:0.5 (default: 2)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of simulated calls failing with a 500 error")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of simulated calls failing with a 429 error")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for simulated latencies and errors (default: 0)")
+    parser.add_argument("--blocking", action="store_true", help="Simulate a synchronous Gemini client")
+    parser.add_argument("--replay", metavar="DIR", help="Answer from recorded responses, with their recorded latencies")
+    parser.add_argument("--live", action="store_true", help="Call the real Gemini API (needs GOOGLE_API_KEY)")
+    parser.add_argument("--pdf", help="PDF file to analyze (required with --live and --replay)")
+    args = parser.parse_args()
+
+    latency = args.latency if ":" in args.latency else f"fixed:{float(args.latency) * 1000:g}"
+    if args.live:
+        if not args.pdf:
+            parser.error("--live requires --pdf")
+        processor = GeminiPDFProcessor()
+    elif args.replay:
+        if not args.pdf:
+            parser.error("--replay requires --pdf")
+        models = FakeGeminiModels(latency="recorded", recordings_dir=args.replay, replay_only=True, seed=args.seed)
+        processor = GeminiPDFProcessor(client=FakeGeminiClient(models))
+    else:
+        model_class = BlockingModels if args.blocking else FakeGeminiModels
+        models = model_class(
+            latency=latency,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            recordings_dir=None,
+            seed=args.seed,
+        )
+        processor = GeminiPDFProcessor(client=FakeGeminiClient(models))
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            pdf_bytes = f.read()
+    else:
+        pdf_bytes = b"%PDF-1.4 simulated"
+
+    results = asyncio.run(run_benchmark(processor, pdf_bytes, args.concurrency))
+    print(f"{results['concurrency']} concurrent analyses")
+    print(f"wall time      {results['wall']:8.2f}s")
+    print(f"sum of calls   {results['sum']:8.2f}s")
+    print(f"median call    {results['p50']:8.2f}s")
+    print(f"p95 call       {results['p95']:8.2f}s")
+    print(f"slowest call   {results['max']:8.2f}s")
+    print(f"failed         {results['failed']:8d}")
+    print(f"max loop stall {results['max_loop_stall']:8.2f}s")
+    models = processor.client.aio.models
+    if isinstance(models, FakeGeminiModels):
+        print(f"max in flight  {models.stats()['max_in_flight']:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Tests for the persistent analysis job queue.
+"""
+import asyncio
+import sqlite3
+
+from app.models.document_models import DocumentAnalysisResponse, JobStatus
+from app.services import analysis_jobs
+from app.services.analysis_jobs import JobQueue, JobStore
+
+
+async def fake_analysis(job, report_stage):
+    await report_stage("analyzing")
+    return DocumentAnalysisResponse(document_type="Pay Stub", confidence=0.9, processing_time=0.1)
+
+
+def test_worker_survives_a_database_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_jobs, "run_analysis_job", fake_analysis)
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    first = store.submit("1", "gemini")
+    second = store.submit("2", "gemini")
+
+    complete = store.complete
+
+    def complete_once_locked(job_id, attempt, result):
+        if job_id == first:
+            raise sqlite3.OperationalError("database is locked")
+        return complete(job_id, attempt, result)
+
+    monkeypatch.setattr(store, "complete", complete_once_locked)
+
+    async def run():
+        queue = JobQueue(store, workers=1)
+        queue.start()
+        try:
+            for _ in range(100):
+                if store.get(second)["status"] == JobStatus.SUCCEEDED.value:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+
+    assert store.get(second)["status"] == JobStatus.SUCCEEDED.value
+    # The failed write leaves the first job to be reclaimed once its lease expires
+    assert store.get(first)["status"] == JobStatus.RUNNING.value
@@ -0,0 +1,19 @@
+"""
+Tests for the tiered LLM result cache.
+"""
+from app.services.llm_cache import MemoryLRUCache, SQLiteCache, TieredCache
+
+
+def test_clear_reaches_other_processes_memory_tier(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    # Two worker processes, each with its own memory tier over the shared file
+    first = TieredCache(MemoryLRUCache(), SQLiteCache(path), sync_seconds=0)
+    second = TieredCache(MemoryLRUCache(), SQLiteCache(path), sync_seconds=0)
+
+    first.set("key", "v1", "result")
+    assert second.get("key", "v1") == "result"
+
+    first.clear()
+
+    assert second.get("key", "v1") is None
+    assert second.memory.stats()["entries"] == 0
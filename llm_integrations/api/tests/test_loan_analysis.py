@@ -0,0 +1,52 @@
+"""
+Tests for analyzing all of a loan's documents.
+"""
+import asyncio
+
+from app.services.loan_analysis import _analyze_one
+
+PDF_RESULT = {
+    "document_type": "Pay Stub",
+    "confidence": 0.9,
+    "processing_time": 0.1,
+    "extracted_data": {"summary": "Pay stub", "content": ""},
+}
+
+
+class FakeSource:
+    """Document source returning fixed bytes for any document."""
+
+    async def fetch(self, document_id):
+        return b"%PDF-1.4"
+
+
+class FakeProcessor:
+    """PDF processor returning a fixed result."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def process_pdf(self, pdf_bytes, options=None):
+        self.calls += 1
+        return dict(PDF_RESULT)
+
+
+def test_legacy_document_without_file_name_is_analyzed():
+    processor = FakeProcessor()
+    document = {"id": 7, "name": "Pay Stubs", "file_name": None, "file_path": "uploads/Pay_Stubs_20240101_120000_stub.pdf"}
+
+    result = asyncio.run(_analyze_one(document, processor, FakeSource()))
+
+    assert result.error is None
+    assert result.analysis.document_type == "Pay Stub"
+    assert processor.calls == 1
+
+
+def test_non_pdf_document_is_skipped():
+    processor = FakeProcessor()
+    document = {"id": 8, "name": "Driver License", "file_name": "license.png", "file_path": "uploads/blobs/ab/cd/abcd"}
+
+    result = asyncio.run(_analyze_one(document, processor, FakeSource()))
+
+    assert result.error == "Only PDF documents can be analyzed"
+    assert processor.calls == 0